@@ -24,10 +24,17 @@ datas = [
 if Path('test_img').exists():
     datas.append(('test_img', 'test_img'))
 
+# ONNX模型（model.backend 为 onnx 时使用）
+if Path('models').exists():
+    datas.extend((str(p), 'models') for p in Path('models').glob('*.onnx'))
+
 hiddenimports = [
     'main_window', 'config', 'config_manager',
     'plc_manager', 'camera_worker', 'vision_detector',
     'mock_plc', 'mock_camera', 'hikvision_camera', 'logger_config',
+    'camera_watchdog', 'camera_profile', 'frame_archive', 'synthetic_camera',
+    'frame_ring', 'detection_engine', 'background_model',
+    'onnx_obb_detector', 'detector_factory', 'cascade_detector', 'result_cache', 'stage_timer', 'onnxruntime',
     'PyQt5', 'PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets',
     'PyQt5.QtPrintSupport', 'PyQt5.QtNetwork', 'sip',
     'cv2', 'numpy',
@@ -0,0 +1,178 @@
+"""
+背景模型
+BackgroundModel: 每台相机标定一张背景参考（逐像素均值和方差），
+检测时与参考逐像素比较得到前景掩膜，代替“高斯模糊 + Otsu”的全局阈值。
+
+光照不均匀（边缘暗、反光）时全局Otsu阈值会把背景暗角分成前景，
+逐像素阈值只看该像素相对自身背景的变化，不受影响；每帧只需一次inRange，
+不需要模糊和求直方图。
+
+标定文件: <background_dir>/<相机IP>_<宽>x<高>.npz，相机ROI变化后自动对应新文件。
+"""
+
+import time
+import logging
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from config_manager import get_exe_dir
+
+logger = logging.getLogger('BetelNutVision.background_model')
+
+
+def get_background_dir(detector_config: dict) -> Path:
+    """背景标定目录，默认exe同目录下的backgrounds"""
+    background_dir = Path(detector_config.get('background_dir') or 'backgrounds')
+    if not background_dir.is_absolute():
+        background_dir = get_exe_dir() / background_dir
+    return background_dir
+
+
+def background_path(detector_config: dict, camera_ip: str, shape: Tuple[int, int]) -> Path:
+    """标定文件路径: <background_dir>/<相机IP>_<宽>x<高>.npz"""
+    h, w = shape[:2]
+    return get_background_dir(detector_config) / f"{camera_ip.replace('.', '_')}_{w}x{h}.npz"
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+class BackgroundModel:
+    """
+    逐像素背景模型
+
+    像素与背景均值之差超过 max(k × 标准差, min_diff) 即为前景。阈值预先换算成
+    uint8 的上下界图像，分割时只做一次 cv2.inRange（落在区间内为背景）再取反。
+    """
+
+    def __init__(self, mean: np.ndarray, var: np.ndarray, k: float = 4.0, min_diff: float = 20.0,
+                 created: Optional[float] = None):
+        """
+        Args:
+            mean: 背景灰度均值 (H, W) float32
+            var: 背景灰度方差 (H, W) float32
+            k: 标准差倍数
+            min_diff: 最小灰度差（噪声极小的像素也至少要差这么多才算前景）
+            created: 标定时刻（time.time()）
+        """
+        self.mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self.var = np.ascontiguousarray(var, dtype=np.float32)
+        self.k = float(k)
+        self.min_diff = float(min_diff)
+        self.created = time.time() if created is None else float(created)
+        self.updates = 0
+        self._lower = np.empty(self.mean.shape, dtype=np.uint8)
+        self._upper = np.empty(self.mean.shape, dtype=np.uint8)
+        self._rebuild_bounds()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.mean.shape
+
+    # ------------------------------------------------------------ 标定 / 存取
+
+    @classmethod
+    def calibrate(cls, frames: Iterable[np.ndarray], k: float = 4.0, min_diff: float = 20.0) -> 'BackgroundModel':
+        """
+        用若干张空背景帧（视野内没有槟榔）标定
+
+        逐帧累加和与平方和（float64），不需要把所有帧同时放在内存里。
+        """
+        total = total_sq = None
+        count = 0
+        for frame in frames:
+            gray = _to_gray(frame)
+            if total is None:
+                total = np.zeros(gray.shape, dtype=np.float64)
+                total_sq = np.zeros(gray.shape, dtype=np.float64)
+            elif gray.shape != total.shape:
+                raise ValueError(f'背景帧尺寸不一致: {gray.shape} != {total.shape}')
+            cv2.accumulate(gray, total)
+            cv2.accumulateSquare(gray, total_sq)
+            count += 1
+        if count < 2:
+            raise ValueError('背景标定至少需要2帧')
+
+        mean = total / count
+        var = np.maximum(total_sq / count - mean * mean, 0.0)
+        logger.info(f'背景标定完成: {count} 帧 {mean.shape[1]}x{mean.shape[0]}, '
+                    f'平均灰度 {mean.mean():.1f}, 平均标准差 {np.sqrt(var).mean():.2f}')
+        return cls(mean, var, k=k, min_diff=min_diff)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，检测进程读取时不会读到半个文件
+        tmp = path.with_suffix('.tmp.npz')
+        np.savez(tmp, mean=self.mean, var=self.var, k=self.k, min_diff=self.min_diff, created=self.created)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path, k: Optional[float] = None, min_diff: Optional[float] = None) -> 'BackgroundModel':
+        """读取标定文件，k / min_diff 给出时覆盖文件中的值（配置修改后不必重新标定）"""
+        with np.load(path) as data:
+            return cls(data['mean'], data['var'],
+                       k=float(data['k']) if k is None else k,
+                       min_diff=float(data['min_diff']) if min_diff is None else min_diff,
+                       created=float(data['created']))
+
+    # ------------------------------------------------------------ 分割
+
+    def _rebuild_bounds(self):
+        diff = np.maximum(self.k * np.sqrt(self.var), self.min_diff)
+        self._lower[...] = np.clip(np.rint(self.mean - diff), 0, 255)
+        self._upper[...] = np.clip(np.rint(self.mean + diff), 0, 255)
+
+    def foreground(self, gray: np.ndarray, origin: Tuple[int, int] = (0, 0),
+                   dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        前景掩膜（前景255，背景0）
+
+        Args:
+            gray: 灰度图或其中一块区域
+            origin: 区域左上角在整幅图中的位置 (x, y)
+            dst: 输出缓冲区，尺寸与gray相同
+        """
+        x0, y0 = origin
+        h, w = gray.shape[:2]
+        lower = self._lower[y0:y0 + h, x0:x0 + w]
+        upper = self._upper[y0:y0 + h, x0:x0 + w]
+        mask = cv2.inRange(gray, lower, upper, dst=dst)
+        return cv2.bitwise_not(mask, dst=mask)
+
+    # ------------------------------------------------------------ 刷新
+
+    def update(self, image: np.ndarray, alpha: float = 0.05, max_foreground: float = 0.002) -> bool:
+        """
+        空闲时用一帧刷新背景（指数滑动平均），跟随光源老化、环境光的缓慢变化
+
+        视野内有物体（前景比例超过max_foreground）时不刷新；前景比例超过一半说明
+        光照发生了突变，需要重新标定。
+
+        Returns:
+            bool: 是否刷新
+        """
+        gray = _to_gray(image)
+        if gray.shape != self.shape:
+            return False
+        fraction = cv2.countNonZero(self.foreground(gray)) / float(gray.size)
+        if fraction > max_foreground:
+            if fraction > 0.5:
+                logger.warning(f'背景变化 {fraction:.0%} 超出刷新范围，光照可能已改变，请重新标定背景')
+            else:
+                logger.debug(f'视野内有物体（前景 {fraction:.2%}），跳过背景刷新')
+            return False
+
+        frame = gray.astype(np.float32)
+        delta = frame - self.mean
+        # 指数加权的均值/方差递推
+        self.mean += alpha * delta
+        self.var += alpha * delta * delta
+        self.var *= (1.0 - alpha)
+        self._rebuild_bounds()
+        self.updates += 1
+        return True
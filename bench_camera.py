@@ -0,0 +1,119 @@
+"""
+相机取图性能测试（无需相机和海康SDK）
+
+用 fake_mv_camera 替换 MvCamera，运行真实的 HikvisionCamera.connect()/capture()，
+统计每帧取图耗时，可选用cProfile分析缓冲区分配和像素格式转换的开销。
+
+用法:
+    python bench_camera.py --format BayerRG8 --frames 200
+    python bench_camera.py --format RGB8 --width 1280 --height 1024 --profile
+    python bench_camera.py --free-run --fps 60 --frames 300
+"""
+
+import argparse
+import cProfile
+import logging
+import pstats
+import tempfile
+import time
+
+import numpy as np
+
+import fake_mv_camera
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='相机取图性能测试（模拟SDK）')
+    parser.add_argument('--ip', default='192.168.1.101', help='模拟相机IP')
+    parser.add_argument('--images', default='test_img', help='图片文件夹')
+    parser.add_argument('--format', default='BayerRG8', choices=list(fake_mv_camera.PIXEL_FORMATS),
+                        help='像素格式')
+    parser.add_argument('--sensor', default='2448x2048', help='传感器分辨率，如 2448x2048')
+    parser.add_argument('--width', type=int, default=0, help='ROI宽度，0为整幅')
+    parser.add_argument('--height', type=int, default=0, help='ROI高度，0为整幅')
+    parser.add_argument('--binning', type=int, default=1, choices=[1, 2, 4])
+    parser.add_argument('--exposure', type=float, default=5000, help='曝光时间(us)')
+    parser.add_argument('--mbps', type=float, default=1000, help='模拟链路带宽(Mbps)')
+    parser.add_argument('--latency-ms', type=float, default=1.0, help='每帧固定延时(ms)')
+    parser.add_argument('--free-run', action='store_true', help='连续采集模式')
+    parser.add_argument('--fps', type=float, default=30, help='连续采集帧率')
+    parser.add_argument('--frames', type=int, default=100, help='取图次数')
+    parser.add_argument('--warmup', type=int, default=5, help='预热次数（不计入统计）')
+    parser.add_argument('--profile', action='store_true', help='用cProfile分析取图调用')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    sensor_w, sensor_h = (int(v) for v in args.sensor.lower().split('x'))
+
+    fake_mv_camera.install(
+        [args.ip],
+        image_folder=args.images,
+        pixel_format=args.format,
+        sensor_size=(sensor_w, sensor_h),
+        transfer_mbps=args.mbps,
+        latency_ms=args.latency_ms,
+    )
+    from hikvision_camera import HikvisionCamera
+
+    # 参数快照写到临时目录，避免污染正式的camera_profiles
+    profile_dir = tempfile.mkdtemp(prefix='bench_camera_')
+    camera_params = {
+        'exposure': args.exposure,
+        'gain': 0,
+        'width': args.width,
+        'height': args.height,
+        'binning': args.binning,
+        'timeout': 3000,
+        'trigger_source': 'software',
+        'free_run': args.free_run,
+        'free_run_fps': args.fps if args.free_run else 0,
+        'max_frame_age_ms': 1000,
+        'profile_dir': profile_dir,
+    }
+
+    camera = HikvisionCamera(args.ip, camera_params)
+    if not camera.connect():
+        print('连接模拟相机失败')
+        return 1
+
+    for _ in range(args.warmup):
+        camera.capture()
+
+    profiler = cProfile.Profile() if args.profile else None
+    durations = []
+    failures = 0
+    shape = None
+    if profiler:
+        profiler.enable()
+    for _ in range(args.frames):
+        start = time.perf_counter()
+        image = camera.capture()
+        durations.append((time.perf_counter() - start) * 1000)
+        if image is None:
+            failures += 1
+        else:
+            shape = image.shape
+    if profiler:
+        profiler.disable()
+
+    camera.disconnect()
+
+    durations = np.array(durations)
+    print('=' * 60)
+    print(f'像素格式: {args.format}  输出图像: {shape}  模式: {"free-run" if args.free_run else "软触发"}')
+    print(f'取图 {args.frames} 次，失败 {failures} 次')
+    print(f'耗时(ms): 平均 {durations.mean():.2f}  P50 {np.percentile(durations, 50):.2f}  '
+          f'P99 {np.percentile(durations, 99):.2f}  最大 {durations.max():.2f}')
+    print(f'吞吐: {1000.0 / durations.mean():.1f} 帧/秒')
+    print('=' * 60)
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+"""
+相机参数快照
+通过 MV_CC_FeatureSave / MV_CC_FeatureLoad 把相机GenICam参数保存为特征文件，
+下次连接或切换配方时一次性导入，代替逐项写入几十个节点。
+"""
+
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable
+
+from config_manager import get_exe_dir
+
+logger = logging.getLogger('BetelNutVision.camera_profile')
+
+# 写入相机GenICam节点的参数；SDK层设置（重发、GVCP超时、取流策略）不在快照内，每次连接都会设置
+FEATURE_KEYS = (
+    'exposure', 'gain',
+    'width', 'height', 'offset_x', 'offset_y', 'binning', 'decimation',
+    'trigger_source', 'trigger_activation', 'free_run', 'free_run_fps',
+    'gige_packet_delay', 'gige_packet_delay_stagger',
+)
+
+
+def profile_params(camera_params: dict, stagger_index: int = 0) -> dict:
+    """
+    提取影响相机特征节点的参数
+
+    Args:
+        camera_params: 完整相机参数
+        stagger_index: 相机序号（包间延时按序号错开，因此也属于快照内容）
+
+    Returns:
+        dict: 参与快照哈希的参数
+    """
+    params = {key: camera_params.get(key) for key in FEATURE_KEYS}
+    params['stagger_index'] = stagger_index
+    return params
+
+
+def profile_hash(params: dict) -> str:
+    """计算参数哈希（键排序后的JSON的SHA1前12位）"""
+    text = json.dumps(params, sort_keys=True, ensure_ascii=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def get_profile_dir(camera_params: dict) -> Path:
+    """快照目录，默认exe同目录下的camera_profiles"""
+    profile_dir = Path(camera_params.get('profile_dir') or 'camera_profiles')
+    if not profile_dir.is_absolute():
+        profile_dir = get_exe_dir() / profile_dir
+    return profile_dir
+
+
+def snapshot_path(camera_params: dict, camera_ip: str, params_hash: str) -> Path:
+    """
+    特征文件路径: <profile_dir>/<相机IP>_<参数哈希>.mfs
+
+    参数不变时哈希不变，直接导入已有快照；参数一变就生成新文件。
+    """
+    return get_profile_dir(camera_params) / f"{camera_ip.replace('.', '_')}_{params_hash}.mfs"
+
+
+def apply_recipe(workers: Iterable, overrides: dict, max_workers: int = 8) -> Dict[str, bool]:
+    """
+    批量切换配方（如更换光源或产品），所有相机并行导入参数快照
+
+    Args:
+        workers: 实现了 apply_camera_profile(overrides) 的对象（CameraWorker）
+        overrides: 覆盖到各相机参数上的配方参数
+        max_workers: 并行线程数
+
+    Returns:
+        dict: 相机名称 -> 是否成功
+    """
+    workers = list(workers)
+    if not workers:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            getattr(worker, 'camera_name', str(i)): executor.submit(worker.apply_camera_profile, overrides)
+            for i, worker in enumerate(workers)
+        }
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = bool(future.result())
+            except Exception as e:
+                logger.error(f"[{name}] 切换配方异常: {e}")
+                results[name] = False
+
+    ok = sum(results.values())
+    logger.info(f"配方切换完成: {ok}/{len(results)} 台相机成功")
+    return results
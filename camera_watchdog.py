@@ -0,0 +1,163 @@
+"""
+相机看门狗
+CameraWatchdog: 后台检测相机掉线并自动重连，统计相机可用率
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger('BetelNutVision.camera_watchdog')
+
+
+class CameraWatchdog:
+    """
+    相机看门狗 - 在独立线程中周期检查相机状态
+
+    相机需实现 is_alive() 和 reconnect()（见 HikvisionCamera）。
+    掉线后按指数退避在后台重连，工作线程通过 available 判断是否可以取图，
+    重连期间触发处理不会被阻塞。
+
+    使用方法：
+    1. watchdog = CameraWatchdog(camera, "Camera 1")
+    2. watchdog.start()
+    3. if watchdog.available: camera.capture()
+    4. watchdog.stop()
+    """
+
+    def __init__(self, camera, name: str,
+                 check_interval: float = 1.0,
+                 retry_interval: float = 2.0,
+                 max_retry_interval: float = 30.0,
+                 on_state_change: Optional[Callable[[bool], None]] = None):
+        """
+        Args:
+            camera: 相机实例
+            name: 相机名称（用于日志）
+            check_interval: 在线检查间隔（秒）
+            retry_interval: 首次重连间隔（秒），之后每次失败翻倍
+            max_retry_interval: 重连间隔上限（秒）
+            on_state_change: 在线状态变化回调，参数为是否可用（在看门狗线程中调用）
+        """
+        self.camera = camera
+        self.name = name
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.on_state_change = on_state_change
+
+        self.available = True
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # 可用率统计
+        self._start_time = None
+        self._state_since = None
+        self._uptime = 0.0
+        self._downtime = 0.0
+        self.disconnect_count = 0
+        self.reconnect_count = 0
+        self.reconnect_attempts = 0
+        self.last_disconnect_time = None
+
+    def start(self):
+        """启动看门狗线程"""
+        if self._thread is not None:
+            return
+        now = time.monotonic()
+        self._start_time = now
+        self._state_since = now
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"CameraWatchdog-{self.name}", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"[{self.name}] 相机看门狗已启动")
+
+    def stop(self):
+        """停止看门狗线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 5)
+            self._thread = None
+        logger.info(f"[{self.name}] 相机看门狗已停止")
+
+    def metrics(self) -> dict:
+        """
+        获取可用率统计
+
+        Returns:
+            dict: available / availability / uptime_s / downtime_s /
+                  disconnects / reconnects / reconnect_attempts / last_disconnect
+        """
+        with self._lock:
+            uptime, downtime = self._uptime, self._downtime
+            if self._state_since is not None:
+                elapsed = time.monotonic() - self._state_since
+                if self.available:
+                    uptime += elapsed
+                else:
+                    downtime += elapsed
+            total = uptime + downtime
+            return {
+                'available': self.available,
+                'availability': uptime / total if total > 0 else 1.0,
+                'uptime_s': uptime,
+                'downtime_s': downtime,
+                'disconnects': self.disconnect_count,
+                'reconnects': self.reconnect_count,
+                'reconnect_attempts': self.reconnect_attempts,
+                'last_disconnect': self.last_disconnect_time,
+            }
+
+    def _set_available(self, available: bool):
+        """切换在线状态并累计时长"""
+        with self._lock:
+            if available == self.available:
+                return
+            now = time.monotonic()
+            if self.available:
+                self._uptime += now - self._state_since
+                self.disconnect_count += 1
+                self.last_disconnect_time = time.time()
+            else:
+                self._downtime += now - self._state_since
+                self.reconnect_count += 1
+            self._state_since = now
+            self.available = available
+
+        if self.on_state_change is not None:
+            try:
+                self.on_state_change(available)
+            except Exception as e:
+                logger.error(f"[{self.name}] 状态回调异常: {e}")
+
+    def _run(self):
+        """看门狗主循环"""
+        retry_interval = self.retry_interval
+        while not self._stop_event.is_set():
+            if self.available:
+                if not self.camera.is_alive():
+                    logger.error(f"[{self.name}] 检测到相机掉线，开始后台重连")
+                    self._set_available(False)
+                    retry_interval = self.retry_interval
+                    continue
+                self._stop_event.wait(self.check_interval)
+                continue
+
+            self.reconnect_attempts += 1
+            try:
+                ok = self.camera.reconnect()
+            except Exception as e:
+                logger.error(f"[{self.name}] 重连异常: {e}")
+                ok = False
+
+            if ok:
+                logger.info(f"[{self.name}] 相机重连成功")
+                self._set_available(True)
+            else:
+                logger.warning(f"[{self.name}] 相机重连失败，{retry_interval:.0f}秒后重试")
+                self._stop_event.wait(retry_interval)
+                retry_interval = min(retry_interval * 2, self.max_retry_interval)
@@ -7,12 +7,20 @@ import time
 import logging
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
+from dataclasses import replace
 from typing import Optional
 
-from config import TRIGGER_VALUES, CLASS_VALUES, POLL_INTERVAL, CAMERA_PARAMS
+from config import TRIGGER_VALUES, CLASS_VALUES, POLL_INTERVAL, CAMERA_PARAMS, DETECTOR_CONFIG, MODEL_CONFIG
 from plc_manager import PlcManager
-from vision_detector import VisionDetector, DetectionResult
+from vision_detector import DetectionResult
+from detector_factory import create_detector
 from hikvision_camera import HikvisionCamera, ImageFolderCamera, HIKVISION_SDK_AVAILABLE
+from camera_watchdog import CameraWatchdog
+from frame_archive import ArchiveReplayCamera
+from synthetic_camera import SyntheticNutCamera
+from background_model import BackgroundModel, background_path
+from result_cache import get_shared_cache, detector_version
+from stage_timer import StageHistogram
 
 # 获取logger
 logger = logging.getLogger('BetelNutVision.camera_worker')
@@ -26,18 +34,20 @@ class CameraWorker(QThread):
     
     # 信号定义
     status_changed = pyqtSignal(str)           # 状态更新信号: "待机"/"拍照"/"计算"
-    image_captured = pyqtSignal(np.ndarray)    # 图片捕获信号
+    image_captured = pyqtSignal(np.ndarray)    # 显示图信号（按显示区域缩小并已绘制结果）
     result_computed = pyqtSignal(object)       # 结果计算信号 (DetectionResult)
     log_message = pyqtSignal(str)              # 日志消息信号
     error_occurred = pyqtSignal(str)           # 错误信号
+    stats_updated = pyqtSignal(dict)           # 网络统计信号（丢包/重发/带宽）
     
-    def __init__(self, camera_config: dict, plc_manager: PlcManager):
+    def __init__(self, camera_config: dict, plc_manager: PlcManager, engine=None):
         """
         初始化相机工作线程
         
         Args:
             camera_config: 相机配置字典（来自config.CAMERA_CONFIGS）
             plc_manager: PLC管理器实例（共享）
+            engine: 检测进程池（DetectionEngine），None时在本线程中检测
         """
         super().__init__()
         
@@ -47,15 +57,54 @@ class CameraWorker(QThread):
         self.camera_ip = camera_config['ip']
         self.registers = camera_config['registers']
         self.pixel_to_mm = camera_config.get('pixel_to_mm', 0.1)  # 读取相机标定参数，默认0.1
+        # 相机参数：全局camera_params，可被单相机配置中的camera_params覆盖
+        self.camera_params = {**CAMERA_PARAMS, **camera_config.get('camera_params', {})}
         
         self.plc = plc_manager
-        self.detector = VisionDetector(
-            pixel_to_mm=self.pixel_to_mm
-        )
+        self.detector = create_detector(self.pixel_to_mm, DETECTOR_CONFIG, MODEL_CONFIG)
+        # 检测进程池：帧提交到子进程检测，进程池不可用时退回本线程的检测器
+        self.engine = engine
+        self.engine_timeout = float(DETECTOR_CONFIG.get('engine_timeout_ms', 2000)) / 1000.0
+        if self.engine is not None:
+            self.engine.register_camera(self.camera_id, self.pixel_to_mm)
         
         self.camera = None
+        self.watchdog = None
         self.is_running = False
         self.is_camera_connected = False
+        # 看门狗重连或配方切换后置位，由工作线程在下一次拍照前重新应用ROI（检测器不在其他线程中修改）
+        self._roi_refresh = False
+        
+        # 界面显示：结果写完PLC后按显示区域大小绘制缩略图，最小间隔display_interval_s秒
+        self.display_size = (320, 180)
+        self.display_interval = float(self.camera_params.get('display_interval_s', 0.2))
+        self._last_display_time = 0.0
+        self._pending_display = None
+        
+        # 网络统计刷新间隔（秒），0表示不统计
+        self.stats_interval = float(self.camera_params.get('stats_interval_s', 5.0))
+        self._last_stats_time = 0.0
+        
+        # 背景模型：按图像尺寸加载标定文件，空闲时刷新
+        self.use_background = bool(DETECTOR_CONFIG.get('background_model', False))
+        self.background = None
+        self._background_shape = None
+        self._background_request = False
+        self._last_trigger_mono = time.monotonic()
+        self._last_background_refresh = time.monotonic()
+        
+        # 多目标：一帧中检出的所有槟榔按切割优先级排序，第一颗写入原有寄存器，
+        # 其余写入 extra_targets 起始的寄存器块（未配置时只写第一颗）
+        self.multi_nut = bool(DETECTOR_CONFIG.get('multi_nut', False))
+        
+        # 分阶段计时：检测结果带各阶段耗时时汇总最近N帧，随网络统计周期输出
+        self.stage_stats = (StageHistogram(int(DETECTOR_CONFIG.get('stage_timing_window', 500)))
+                            if DETECTOR_CONFIG.get('stage_timing', False) else None)
+        self._stage_frames_reported = 0
+        
+        # 结果缓存：图片测试/归档回放模式下按帧内容缓存检测结果（camera_params.result_cache）
+        self.result_cache = None
+        self._cache_version = None
         
     def run(self):
         """
@@ -79,8 +128,14 @@ class CameraWorker(QThread):
                 
                 if trigger_value == TRIGGER_VALUES['READY']:
                     # 2. 检测到触发信号 (10)
+                    trigger_time = time.time()
                     self.log_message.emit(f"[{self.camera_name}] ✓ 检测到触发信号 D{self.registers['trigger']}={trigger_value}")
-                    self._process_trigger()
+                    self._process_trigger(trigger_time)
+                    self._last_trigger_mono = time.monotonic()
+                
+                self._update_network_stats()
+                self._service_background()
+                self._flush_display()
                 
                 # 轮询间隔
                 time.sleep(POLL_INTERVAL)
@@ -96,14 +151,17 @@ class CameraWorker(QThread):
         self._disconnect_camera()
         self.log_message.emit(f"{self.camera_name} 工作线程停止")
     
-    def _process_trigger(self):
+    def _process_trigger(self, trigger_time: Optional[float] = None):
         """
         处理触发流程：
         1. 写入处理中状态 (127)
-        2. 拍照
+        2. 拍照（硬触发模式下为取出与本次触发匹配的帧）
         3. 写入图片就绪状态 (128)
         4. 识别计算
         5. 回写结果
+        
+        Args:
+            trigger_time: 检测到PLC触发信号的时刻（time.time()）
         """
         try:
             # Step 1: 写入"正在处理"状态
@@ -115,14 +173,14 @@ class CameraWorker(QThread):
             
             # Step 2: 拍照
             self.log_message.emit(f"[{self.camera_name}] 步骤2/5: 拍照...")
-            image = self._capture_image()
+            image = self._capture_image(trigger_time)
             if image is None:
                 self.error_occurred.emit(f"[{self.camera_name}] ✗ 拍照失败")
                 self._write_error_result()
                 return
             
-            self.image_captured.emit(image)
             self.log_message.emit(f"[{self.camera_name}] ✓ 拍照成功 {image.shape[1]}x{image.shape[0]}")
+            self._log_frame_timing(trigger_time)
             
             # Step 3: 写入"图片就绪"状态
             self.log_message.emit(f"[{self.camera_name}] 步骤3/5: 写入图片就绪状态...")
@@ -133,17 +191,21 @@ class CameraWorker(QThread):
             # Step 4: 视觉识别
             self.log_message.emit(f"[{self.camera_name}] 步骤4/5: 计算检测结果...")
             self.status_changed.emit("计算中")
-            result, display_image = self.detector.detect_and_draw(image)
-            self.log_message.emit(f"[{self.camera_name}] ✓ 检测完成 分类={result.classification}")
+            results, contours = self._detect(image)
+            result = results[0] if results else DetectionResult(0, 0, 0, 0, 0, 0, CLASS_VALUES['UNKNOWN'], 0.0)
+            self.log_message.emit(f"[{self.camera_name}] ✓ 检测完成 分类={result.classification}"
+                                  + (f" 目标数={len(results)}" if self.multi_nut else ""))
             self.result_computed.emit(result)
             
-            # 发送绘制后的图片（带有检测框和切割线）
-            self.image_captured.emit(display_image)
-            
             # Step 5: 回写结果到PLC
             self.log_message.emit(f"[{self.camera_name}] 步骤5/5: 写入PLC结果...")
+            if self.multi_nut:
+                self._write_extra_targets(results)
             self._write_result_to_plc(result)
             
+            # 结果写完后再为界面绘制缩略图（不占用回写时间）
+            self._emit_display(image, results, contours)
+            
             # 回到待机状态
             self.status_changed.emit("待机")
             self.log_message.emit(f"[{self.camera_name}] ✓ 完整流程处理完成")
@@ -168,26 +230,64 @@ class CameraWorker(QThread):
         try:
             # ============ 1. 尝试连接真实海康相机 ============
             if HIKVISION_SDK_AVAILABLE:
-                self.camera = HikvisionCamera(self.camera_ip)
+                self.camera = HikvisionCamera(self.camera_ip, self.camera_params,
+                                              stagger_index=self.camera_id - 1)
                 self.is_camera_connected = self.camera.connect()
                 
                 if self.is_camera_connected:
                     self.log_message.emit(f"{self.camera_name} 海康相机连接成功")
+                    self._apply_camera_roi()
+                    self._start_watchdog()
                     return True
                 else:
                     self.log_message.emit(f"{self.camera_name} 海康相机连接失败，尝试图片测试模式")
             else:
                 self.log_message.emit(f"{self.camera_name} 海康SDK未安装")
             
-            # ============ 2. 尝试使用图片测试模式 ============
             import os
+            
+            # ============ 2. 配置了合成图像时使用合成相机 ============
+            if self.camera_params.get('synthetic_camera'):
+                width, height = self.camera_params.get('synthetic_size', [1280, 1024])
+                self.camera = SyntheticNutCamera(
+                    self.camera_ip, width, height,
+                    fps=float(self.camera_params.get('synthetic_fps', 0)),
+                    pixel_to_mm=self.detector.pixel_to_mm,
+                    fixed_lighting=self.use_background
+                )
+                self.is_camera_connected = self.camera.connect()
+                self.log_message.emit(f"{self.camera_name} 合成图像模式连接成功")
+                return True
+            
+            # ============ 3. 配置了归档文件时回放归档 ============
+            replay_archive = self.camera_params.get('replay_archive')
+            if replay_archive and os.path.isfile(replay_archive):
+                self.camera = ArchiveReplayCamera(
+                    self.camera_ip, replay_archive, camera_id=self.camera_id,
+                    realtime=bool(self.camera_params.get('replay_realtime', False))
+                )
+                self.is_camera_connected = self.camera.connect()
+                
+                if self.is_camera_connected:
+                    self.log_message.emit(f"{self.camera_name} 归档回放模式连接成功")
+                    self._enable_result_cache()
+                    return True
+                else:
+                    self.log_message.emit(f"{self.camera_name} 归档回放模式加载失败，尝试图片测试模式")
+            
+            # ============ 4. 尝试使用图片测试模式 ============
             test_img_folder = "test_img"
             if os.path.exists(test_img_folder) and os.path.isdir(test_img_folder):
-                self.camera = ImageFolderCamera(self.camera_ip, test_img_folder)
+                self.camera = ImageFolderCamera(
+                    self.camera_ip, test_img_folder,
+                    cache_mb=int(self.camera_params.get('image_cache_mb', 0)),
+                    warm_cache=bool(self.camera_params.get('image_cache_warm', False))
+                )
                 self.is_camera_connected = self.camera.connect()
                 
                 if self.is_camera_connected:
                     self.log_message.emit(f"{self.camera_name} 图片测试模式连接成功")
+                    self._enable_result_cache()
                     return True
                 else:
                     self.log_message.emit(f"{self.camera_name} 图片测试模式加载失败")
@@ -200,8 +300,267 @@ class CameraWorker(QThread):
             self.error_occurred.emit(f"{self.camera_name} 相机连接异常: {str(e)}")
             return False
     
+    def _apply_camera_roi(self):
+        """把相机实际生效的ROI告知检测器，偏移量保持为全传感器坐标"""
+        roi = getattr(self.camera, 'roi', None)
+        if roi:
+            roi_args = (roi['offset_x'], roi['offset_y'], roi['sensor_width'], roi['sensor_height'], roi['scale'])
+            self.detector.set_roi(*roi_args)
+            if self.engine is not None:
+                self.engine.set_roi(self.camera_id, *roi_args)
+    
+    def _enable_result_cache(self):
+        """图片测试/归档回放模式：按配置启用结果缓存（真实相机和合成图像不缓存）"""
+        if not self.camera_params.get('result_cache', False):
+            return
+        self.result_cache = get_shared_cache(self.camera_params)
+        self._cache_version = detector_version(self.pixel_to_mm, DETECTOR_CONFIG, MODEL_CONFIG)
+        self.log_message.emit(f"{self.camera_name} 结果缓存已启用（配置版本 {self._cache_version}）")
+    
+    def _cache_context(self) -> str:
+        """缓存键中除帧内容外影响结果的状态：配置版本、单/多目标、相机ROI、背景模型"""
+        background = self.background
+        background_token = (background.created, background.updates) if background is not None else None
+        return (f"{self._cache_version}|{'multi' if self.multi_nut else 'single'}|"
+                f"{self.detector.roi_origin}|{self.detector.sensor_size}|{self.detector.pixel_scale}|"
+                f"{background_token}")
+    
+    def _detect(self, image: np.ndarray):
+        """
+        检测：启用结果缓存时先按帧内容查缓存，未命中再检测并写入缓存
+        
+        Returns:
+            (结果列表, 轮廓列表)；单目标时列表只有一个结果（未检出时分类为1），
+            多目标时按切割优先级排序（未检出时为空）
+        """
+        if self.use_background:
+            self._ensure_background(image.shape)
+        if self.result_cache is None:
+            results, contours = self._detect_frame(image)
+            self._record_stage_timings(results)
+            return results, contours
+        
+        key = self.result_cache.frame_key(image, self._cache_context())
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            results, contours = cached
+            logger.debug(f"[{self.camera_name}] 结果缓存命中")
+            return self._copy_results(results), list(contours)
+        results, contours = self._detect_frame(image)
+        self._record_stage_timings(results)
+        self.result_cache.put(key, (self._copy_results(results), list(contours)))
+        return results, contours
+    
+    @staticmethod
+    def _copy_results(results):
+        """
+        复制结果对象（含 timings 字典）：缓存中的结果不与调用方共用，
+        绘制时追加的 'draw' 等就地修改不会写回缓存
+        """
+        return [replace(r, timings=dict(r.timings) if r.timings else None) for r in results]
+    
+    def _record_stage_timings(self, results):
+        """实际检测的帧（不含缓存命中）计入分阶段耗时统计，多目标只计第一个结果"""
+        if self.stage_stats is not None and results:
+            self.stage_stats.add(results[0].timings)
+    
+    def _detect_frame(self, image: np.ndarray):
+        """检测一帧：配置了检测进程池时提交到子进程，帧环已满、超时或子进程异常时在本线程中检测"""
+        if self.engine is not None:
+            future = self.engine.submit(self.camera_id, image, multi=self.multi_nut)
+            if future is not None:
+                try:
+                    result, contour = future.result(timeout=self.engine_timeout)
+                    return (result, contour) if self.multi_nut else ([result], [contour])
+                except Exception as e:
+                    logger.warning(f"[{self.camera_name}] 检测进程未返回结果({type(e).__name__}: {e})，改为本线程检测")
+            else:
+                logger.debug(f"[{self.camera_name}] 检测进程池繁忙，本线程检测")
+        if self.multi_nut:
+            return self.detector.detect_all(image), list(self.detector._last_contours)
+        return [self.detector.detect_betel_nut(image)], [self.detector._last_contour]
+    
+    # ------------------------------------------------------------ 界面显示
+    
+    def set_display(self, size: Optional[tuple]):
+        """
+        设置界面显示区域 (宽, 高)，None 表示当前没有人看（窗口最小化等），不再绘制显示图
+        （界面线程调用）
+        """
+        self.display_size = tuple(size) if size else None
+    
+    def _emit_display(self, image: np.ndarray, results, contours):
+        """记下最新一帧的显示内容，未到刷新间隔时由轮询循环稍后绘制（只画最新的一帧）"""
+        if self.display_size is None:
+            self._pending_display = None
+            return
+        self._pending_display = (image, results, contours)
+        self._flush_display()
+    
+    def _flush_display(self):
+        """按显示区域大小缩小后绘制结果并发出image_captured"""
+        pending = self._pending_display
+        if pending is None or self.display_size is None:
+            return
+        now = time.monotonic()
+        if now - self._last_display_time < self.display_interval:
+            return
+        self._pending_display = None
+        self._last_display_time = now
+        image, results, contours = pending
+        try:
+            thumbnail = self.detector.draw_thumbnail(image, results, contours, self.display_size)
+            self.image_captured.emit(thumbnail)
+            if self.stage_stats is not None and results and results[0].timings:
+                self.stage_stats.record('draw', results[0].timings.get('draw', 0.0))
+        except Exception as e:
+            logger.warning(f"[{self.camera_name}] 绘制显示图失败: {type(e).__name__}: {e}")
+    
+    # ------------------------------------------------------------ 背景模型
+    
+    def request_background_calibration(self):
+        """请求标定背景（界面线程调用），由工作线程在下一次轮询空闲时执行；标定时视野内不能有槟榔"""
+        self._background_request = True
+    
+    def _background_file(self, shape):
+        return background_path(DETECTOR_CONFIG, self.camera_ip, shape)
+    
+    def _ensure_background(self, shape):
+        """图像尺寸变化（首帧、切换配方）时加载对应的背景标定文件"""
+        shape = tuple(shape[:2])
+        if shape == self._background_shape:
+            return
+        self._background_shape = shape
+        path = self._background_file(shape)
+        model = None
+        if path.is_file():
+            try:
+                model = BackgroundModel.load(path, k=DETECTOR_CONFIG.get('background_k'),
+                                             min_diff=DETECTOR_CONFIG.get('background_min_diff'))
+                self.log_message.emit(f"[{self.camera_name}] 已加载背景模型 {path.name}")
+            except Exception as e:
+                self.error_occurred.emit(f"[{self.camera_name}] ✗ 背景模型读取失败: {e}")
+        else:
+            self.log_message.emit(f"[{self.camera_name}] 没有 {shape[1]}x{shape[0]} 的背景标定，使用Otsu分割")
+        self._set_background(model, path if model is not None else None)
+    
+    def _set_background(self, model: Optional[BackgroundModel], path=None):
+        """把背景模型交给本线程的检测器和检测进程（进程按文件重新加载）"""
+        self.background = model
+        self.detector.set_background(model)
+        if self.engine is not None:
+            self.engine.set_background(self.camera_id, str(path) if path else None)
+    
+    def _service_background(self):
+        """轮询空闲时处理背景标定请求，并按background_refresh_s周期刷新背景"""
+        if not self.use_background or not self.is_camera_connected:
+            return
+        if getattr(self.camera, 'hardware_trigger', False):
+            # 硬触发相机没有PLC触发不出图，不能主动取背景
+            if self._background_request:
+                self._background_request = False
+                self.error_occurred.emit(f"[{self.camera_name}] ✗ 硬触发模式下无法标定背景，请临时切换为软触发")
+            return
+        
+        if self._background_request:
+            self._background_request = False
+            self._calibrate_background()
+            return
+        
+        refresh_s = float(DETECTOR_CONFIG.get('background_refresh_s', 0) or 0)
+        idle_s = float(DETECTOR_CONFIG.get('background_idle_s', 10))
+        now = time.monotonic()
+        if (self.background is None or refresh_s <= 0 or now - self._last_trigger_mono < idle_s
+                or now - self._last_background_refresh < refresh_s):
+            return
+        self._last_background_refresh = now
+        
+        image = self._capture_image()
+        if image is None or image.shape[:2] != self.background.shape:
+            return
+        if self.background.update(image, alpha=float(DETECTOR_CONFIG.get('background_alpha', 0.05))):
+            path = self._background_file(image.shape)
+            self.background.save(path)
+            if self.engine is not None:
+                self.engine.set_background(self.camera_id, str(path))
+            logger.info(f"[{self.camera_name}] 背景已刷新（第{self.background.updates}次）")
+    
+    def _calibrate_background(self):
+        """连续取background_frames帧空背景标定并保存"""
+        count = max(2, int(DETECTOR_CONFIG.get('background_frames', 20)))
+        self.status_changed.emit("标定背景")
+        self.log_message.emit(f"[{self.camera_name}] 开始标定背景（{count}帧，视野内不能有槟榔）...")
+        try:
+            # 合成相机直接渲染空背景，其他相机取实际画面
+            render_background = getattr(self.camera, 'render_background', None)
+            capture = render_background if render_background else self._capture_image
+            frames = (capture() for _ in range(count))
+            model = BackgroundModel.calibrate(
+                (f for f in frames if f is not None),
+                k=float(DETECTOR_CONFIG.get('background_k', 4.0)),
+                min_diff=float(DETECTOR_CONFIG.get('background_min_diff', 20)),
+            )
+            path = self._background_file(model.shape)
+            model.save(path)
+            self._background_shape = model.shape
+            self._set_background(model, path)
+            self._last_background_refresh = time.monotonic()
+            self.log_message.emit(f"[{self.camera_name}] ✓ 背景标定完成 {path.name}")
+        except Exception as e:
+            self.error_occurred.emit(f"[{self.camera_name}] ✗ 背景标定失败: {type(e).__name__}: {e}")
+        finally:
+            self.status_changed.emit("待机")
+    
+    def apply_camera_profile(self, overrides: dict) -> bool:
+        """
+        切换相机参数配方（由camera_profile.apply_recipe在后台线程中并行调用）
+        
+        Args:
+            overrides: 覆盖到本相机参数上的配方参数
+        
+        Returns:
+            bool: 成功返回True；非海康相机直接返回False
+        """
+        if not isinstance(self.camera, HikvisionCamera) or not self.is_camera_connected:
+            return False
+        
+        ok = self.camera.apply_profile({**self.camera_params, **overrides})
+        if ok:
+            # 本方法在配方线程池中执行，ROI由工作线程在下一次拍照前应用
+            self._roi_refresh = True
+            self.log_message.emit(f"[{self.camera_name}] ✓ 相机参数已切换 ({self.camera.applied_profile_hash})")
+        else:
+            self.error_occurred.emit(f"[{self.camera_name}] ✗ 相机参数切换失败")
+        return ok
+    
+    def _start_watchdog(self):
+        """启动相机看门狗：掉线后在后台重连，不阻塞触发处理"""
+        self.watchdog = CameraWatchdog(
+            self.camera,
+            self.camera_name,
+            check_interval=float(self.camera_params.get('watchdog_interval_s', 1.0)),
+            retry_interval=float(self.camera_params.get('reconnect_interval_s', 2.0)),
+            max_retry_interval=float(self.camera_params.get('reconnect_max_interval_s', 30.0)),
+            on_state_change=self._on_camera_state_change
+        )
+        self.watchdog.start()
+    
+    def _on_camera_state_change(self, available: bool):
+        """看门狗状态回调（在看门狗线程中执行，只发信号和置标志，ROI由工作线程在下一次拍照前应用）"""
+        if available:
+            self._roi_refresh = True
+            self.log_message.emit(f"[{self.camera_name}] ✓ 相机已重新连接")
+            self.status_changed.emit("待机")
+        else:
+            self.error_occurred.emit(f"[{self.camera_name}] ✗ 相机掉线，后台重连中")
+            self.status_changed.emit("离线")
+    
     def _disconnect_camera(self):
         """断开相机连接"""
+        if self.watchdog:
+            self.watchdog.stop()
+            self.watchdog = None
+        
         if self.camera and self.is_camera_connected:
             try:
                 self.camera.disconnect()
@@ -209,18 +568,33 @@ class CameraWorker(QThread):
             except Exception as e:
                 self.error_occurred.emit(f"{self.camera_name} 相机断开异常: {str(e)}")
     
-    def _capture_image(self) -> Optional[np.ndarray]:
+    def _capture_image(self, trigger_time: Optional[float] = None) -> Optional[np.ndarray]:
         """
         拍照并返回图像
         
+        Args:
+            trigger_time: PLC触发时刻，硬触发模式下用于匹配对应的帧
+        
         Returns:
             np.ndarray: 图像数据 (BGR格式)，失败返回None
         """
         if not self.is_camera_connected:
             return None
         
+        if self.watchdog and not self.watchdog.available:
+            # 相机离线时立即返回，由调用方回写UNKNOWN，不等待重连
+            self.error_occurred.emit(f"[{self.camera_name}] ✗ 相机离线，跳过拍照")
+            return None
+        
+        if self._roi_refresh:
+            # 重连后相机ROI可能已按快照重新设置，检测前同步给检测器
+            self._roi_refresh = False
+            self._apply_camera_roi()
+        
         try:
-            # 所有相机类都实现了capture()方法
+            # 所有相机类都实现了capture()方法；硬触发/连续采集相机额外接收触发时刻
+            if getattr(self.camera, 'hardware_trigger', False) or getattr(self.camera, 'free_run', False):
+                return self.camera.capture(trigger_time=trigger_time)
             image = self.camera.capture()
             return image
             
@@ -228,6 +602,70 @@ class CameraWorker(QThread):
             self.error_occurred.emit(f"{self.camera_name} 拍照异常: {str(e)}")
             return None
     
+    def _update_network_stats(self):
+        """按stats_interval周期读取相机网络统计、可用率和ROI命中率，发出stats_updated信号"""
+        if self.stats_interval <= 0:
+            return
+        
+        now = time.monotonic()
+        if now - self._last_stats_time < self.stats_interval:
+            return
+        self._last_stats_time = now
+        
+        stats = {}
+        if hasattr(self.camera, 'get_network_stats'):
+            stats = self.camera.get_network_stats() or {}
+        if self.watchdog:
+            stats.update(self.watchdog.metrics())
+        if self.engine is not None:
+            stats.update(self.engine.roi_stats(self.camera_id))
+        else:
+            stats.update(self.detector.roi_stats())
+        if self.stage_stats is not None and self.stage_stats.frames > self._stage_frames_reported:
+            self._stage_frames_reported = self.stage_stats.frames
+            stats['stage_timing'] = self.stage_stats.summary()
+            logger.info(f"[{self.camera_name}] 检测分阶段耗时 p50/p95(ms): {self.stage_stats.format()}")
+        if not stats:
+            return
+        
+        if stats.get('lost_packets') or stats.get('lost_frames'):
+            logger.warning(
+                f"[{self.camera_name}] 网络统计: 丢帧={stats['lost_frames']} 丢包={stats['lost_packets']} "
+                f"重发={stats['resent_packets']}/{stats['resend_requested']} 带宽={stats['bandwidth_mbps']:.1f}Mbps"
+            )
+        self.stats_updated.emit(stats)
+    
+    def _log_frame_timing(self, trigger_time: Optional[float]):
+        """记录相机帧时间戳（硬触发模式下即实际曝光时刻）与PLC触发的时间差"""
+        frame_info = getattr(self.camera, 'last_frame_info', None)
+        if not frame_info:
+            return
+        
+        message = f"[{self.camera_name}] 帧#{frame_info['frame_num']} 设备时间戳={frame_info['device_timestamp']}"
+        if frame_info.get('device_time_s') is not None:
+            message += f" ({frame_info['device_time_s']:.6f}s)"
+        if trigger_time is not None and frame_info.get('host_timestamp_ms'):
+            delta_ms = frame_info['host_timestamp_ms'] - trigger_time * 1000.0
+            message += f" 相对PLC触发 {delta_ms:+.1f}ms"
+        if frame_info.get('age_ms') is not None:
+            message += f" 帧龄 {frame_info['age_ms']:.1f}ms"
+        logger.info(message)
+    
+    @staticmethod
+    def _result_values(result: DetectionResult) -> list:
+        """x_offset ~ length 六个寄存器的值（长度/角度×10，限制在int16范围）"""
+        def clamp_int16(value):
+            return max(-32768, min(32767, value))
+
+        return [
+            clamp_int16(int(result.x_offset * 10)),
+            clamp_int16(int(result.y_offset * 10)),
+            clamp_int16(int(result.r_angle * 10)),
+            clamp_int16(int(result.height * 10)),
+            int(result.head_direction),
+            clamp_int16(int(result.length * 10)),
+        ]
+    
     def _write_result_to_plc(self, result: DetectionResult):
         """
         将识别结果写入PLC
@@ -248,18 +686,8 @@ class CameraWorker(QThread):
                 return
 
             if result.classification == CLASS_VALUES['CUTTABLE']:
-                def clamp_int16(value):
-                    return max(-32768, min(32767, value))
-
-                x_int = clamp_int16(int(result.x_offset * 10))
-                y_int = clamp_int16(int(result.y_offset * 10))
-                r_int = clamp_int16(int(result.r_angle * 10))
-                h_int = clamp_int16(int(result.height * 10))
-                head_int = int(result.head_direction)
-                l_int = clamp_int16(int(result.length * 10))
-
                 # x_offset ~ length 寄存器连续: 102,103,104,105,106,107
-                values = [x_int, y_int, r_int, h_int, head_int, l_int]
+                values = self._result_values(result)
                 logger.info(
                     f"[{self.camera_name}] 原始值: X={result.x_offset:.2f}, Y={result.y_offset:.2f}, "
                     f"R={result.r_angle:.2f}, H={result.height:.2f}, "
@@ -285,6 +713,45 @@ class CameraWorker(QThread):
             self.error_occurred.emit(f"[{self.camera_name}] ❌ 写入结果异常: {type(e).__name__}: {str(e)}")
             logger.error(f"[{self.camera_name}] 写入结果详细错误:\n{traceback.format_exc()}")
     
+    def _write_extra_targets(self, results):
+        """
+        多目标时在写第一颗（原有寄存器）之前写目标数和其余目标，PLC看到第一颗结果时其余已就绪
+
+        寄存器（相机registers中配置，未配置则跳过）:
+            target_count    本帧写出的目标数（0~1+额外槽位数）
+            extra_targets   额外目标起始地址，每个目标7个寄存器:
+                            class, x_offset, y_offset, r_angle, height, head_direction, length
+                            （×10规则与第一颗相同），槽位数为 max_targets-1，空槽位 class=1、其余为0
+        """
+        slots = max(0, int(DETECTOR_CONFIG.get('max_targets', 3)) - 1)
+        base = self.registers.get('extra_targets')
+        if base is None:
+            slots = 0
+        written = min(len(results), 1 + slots)
+        if len(results) > written:
+            logger.warning(f"[{self.camera_name}] 检出 {len(results)} 颗槟榔，只有 {written} 个目标位置，"
+                           f"其余需重新上料")
+        try:
+            if slots:
+                extras = results[1:1 + slots]
+                values = []
+                for result in extras:
+                    if result.classification == CLASS_VALUES['CUTTABLE']:
+                        values += [result.classification, *self._result_values(result)]
+                    else:
+                        values += [result.classification, 0, 0, 0, 0, 0, 0]
+                values += [CLASS_VALUES['UNKNOWN'], 0, 0, 0, 0, 0, 0] * (slots - len(extras))
+                if not self.plc.write_multiple_registers(base, values):
+                    self.error_occurred.emit(f"[{self.camera_name}] ❌ 写入额外目标失败 D{base}")
+            if 'target_count' in self.registers:
+                if not self.plc.write_holding_register(self.registers['target_count'], written):
+                    self.error_occurred.emit(
+                        f"[{self.camera_name}] ❌ 写入目标数失败 D{self.registers['target_count']}")
+        except Exception as e:
+            import traceback
+            self.error_occurred.emit(f"[{self.camera_name}] ❌ 写入额外目标异常: {type(e).__name__}: {str(e)}")
+            logger.error(f"[{self.camera_name}] 写入额外目标详细错误:\n{traceback.format_exc()}")
+    
     def _write_error_result(self):
         """写入错误结果（分类=1，表示异常）"""
         try:
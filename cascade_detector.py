@@ -0,0 +1,209 @@
+"""
+级联检测器
+CascadeDetector: 先走传统CV快速路径，置信度低于阈值或尖头朝向无法判断时，
+同一帧再交给重检测器（ONNX OBB模型或整幅精细分割）复检。
+
+大多数帧只走快速路径，平均耗时接近传统CV；难判断的帧（粘连、阴影、朝向不明）
+才付出重检测器的耗时。复检比例通过 roi_stats() 随ROI统计一起送到界面。
+"""
+
+import time
+import logging
+from dataclasses import replace
+from typing import List, Optional
+
+import numpy as np
+
+from vision_detector import VisionDetector, DetectionResult
+
+logger = logging.getLogger(__name__)
+
+
+class CascadeDetector(VisionDetector):
+    """
+    级联检测器 — 自身即快速路径（VisionDetector，可开启多分辨率分割和ROI预测），
+    heavy 为复检用的重检测器
+
+    复检条件:
+        - 快速路径置信度（轮廓与拟合椭圆的面积比）低于 min_confidence，含未检出（置信度0）
+        - 尖头朝向为0（无法判断），escalate_on_no_head 为 True 时
+    复检检出槟榔时采用复检结果；复检朝向仍为0而快速路径有朝向时保留快速路径的朝向。
+    开启 stage_timing 时，复检帧的 timings 为快速路径各阶段 + 'heavy_' 前缀的复检各阶段。
+    """
+
+    def __init__(self, heavy: VisionDetector, pixel_to_mm: float = 0.1, cascade_min_confidence: float = 0.85,
+                 cascade_on_no_head: bool = True, **kwargs):
+        """
+        Args:
+            heavy: 重检测器（OnnxObbDetector 或精细分割的 VisionDetector）
+            pixel_to_mm: 像素到毫米的转换比例
+            cascade_min_confidence: 快速路径置信度低于此值时复检
+            cascade_on_no_head: 尖头朝向无法判断时复检
+            **kwargs: 快速路径的 VisionDetector 参数
+        """
+        super().__init__(pixel_to_mm=pixel_to_mm, **kwargs)
+        self.heavy = heavy
+        self.min_confidence = float(cascade_min_confidence)
+        self.escalate_on_no_head = bool(cascade_on_no_head)
+
+        self.frames = 0
+        self.escalations = 0
+        self.low_confidence = 0
+        self.no_head = 0
+        self.heavy_found = 0
+        self._fast_seconds = 0.0
+        self._heavy_seconds = 0.0
+        logger.info(f"CascadeDetector: 复检器 {type(heavy).__name__}, min_confidence={self.min_confidence}, "
+                    f"on_no_head={self.escalate_on_no_head}")
+
+    def set_roi(self, offset_x: int, offset_y: int,
+                sensor_width: int, sensor_height: int, scale: int = 1):
+        super().set_roi(offset_x, offset_y, sensor_width, sensor_height, scale)
+        self.heavy.set_roi(offset_x, offset_y, sensor_width, sensor_height, scale)
+
+    def set_background(self, model):
+        super().set_background(model)
+        self.heavy.set_background(model)
+
+    # ------------------------------------------------------------------ detect
+    def _escalation_reason(self, result: DetectionResult) -> Optional[str]:
+        if result.confidence < self.min_confidence:
+            return 'low_confidence'
+        if self.escalate_on_no_head and result.head_direction == 0:
+            return 'no_head'
+        return None
+
+    def _count_escalation(self, reason: str):
+        self.escalations += 1
+        if reason == 'low_confidence':
+            self.low_confidence += 1
+        else:
+            self.no_head += 1
+
+    @staticmethod
+    def _merge_timings(fast: Optional[dict], heavy: Optional[dict]) -> Optional[dict]:
+        """快速路径与复检的分阶段耗时合并，复检阶段加 'heavy_' 前缀，total 为两者之和"""
+        if fast is None or heavy is None:
+            return fast
+        timings = dict(fast)
+        for stage, ms in heavy.items():
+            if stage != 'total':
+                timings[f'heavy_{stage}'] = ms
+        timings['total'] = fast.get('total', 0.0) + heavy.get('total', 0.0)
+        return timings
+
+    def _escalate(self, image: np.ndarray, fast: DetectionResult, fast_contour, reason: str) -> DetectionResult:
+        """用重检测器复检一帧，返回采用的结果并设置 self._last_contour"""
+        self._count_escalation(reason)
+
+        start = time.perf_counter()
+        result = self.heavy.detect_betel_nut(image)
+        self._heavy_seconds += time.perf_counter() - start
+        logger.debug(f"复检({reason}): 快速路径 conf={fast.confidence:.2f} head={fast.head_direction} → "
+                     f"复检 class={result.classification} conf={result.confidence:.2f} "
+                     f"head={result.head_direction}")
+        timings = self._merge_timings(fast.timings, result.timings)
+
+        if result.classification != 2:
+            self._last_contour = fast_contour
+            fast.timings = timings
+            return fast
+        self.heavy_found += 1
+        if result.head_direction == 0 and fast.classification == 2 and fast.head_direction != 0:
+            result = replace(result, head_direction=fast.head_direction)
+        result.timings = timings
+        self._last_contour = self.heavy._last_contour
+        return result
+
+    def detect_betel_nut(self, image: np.ndarray) -> DetectionResult:
+        """
+        检测图像中的槟榔：快速路径结果可信时直接返回，否则复检。
+        检测后 self._last_contour 保存所采用结果的轮廓。
+        """
+        start = time.perf_counter()
+        result = super().detect_betel_nut(image)
+        self._fast_seconds += time.perf_counter() - start
+        self.frames += 1
+
+        reason = self._escalation_reason(result)
+        if reason is None:
+            return result
+        return self._escalate(image, result, self._last_contour, reason)
+
+    def detect_batch(self, frames) -> List[DetectionResult]:
+        """快速路径按批检测（见 VisionDetector.detect_batch），需要复检的帧再逐帧复检"""
+        start = time.perf_counter()
+        results = super().detect_batch(frames)
+        self._fast_seconds += time.perf_counter() - start
+        self.frames += len(results)
+
+        # 只有最后一帧的轮廓需要保留（与 VisionDetector.detect_batch 一致）
+        last = len(results) - 1
+        last_contour = self._last_contour
+        for i, result in enumerate(results):
+            reason = self._escalation_reason(result)
+            if reason is None:
+                continue
+            results[i] = self._escalate(frames[i], result, last_contour if i == last else None, reason)
+            if i == last:
+                last_contour = self._last_contour
+        self._last_contour = last_contour
+        return results
+
+    def detect_all(self, image: np.ndarray) -> List[DetectionResult]:
+        """
+        多目标检测：快速路径（VisionDetector.detect_all）未检出或任一目标需要复检时，
+        整帧交给重检测器的 detect_all，复检检出时采用复检结果
+        """
+        start = time.perf_counter()
+        results = super().detect_all(image)
+        self._fast_seconds += time.perf_counter() - start
+        self.frames += 1
+
+        reasons = [self._escalation_reason(r) for r in results] or ['low_confidence']
+        reason = next((r for r in reasons if r is not None), None)
+        if reason is None:
+            return results
+
+        self._count_escalation(reason)
+        start = time.perf_counter()
+        heavy_results = self.heavy.detect_all(image)
+        self._heavy_seconds += time.perf_counter() - start
+        # 快速路径未检出时没有结果带耗时，复检结果保留自身的耗时
+        timings = self._merge_timings(results[0].timings if results else None,
+                                      heavy_results[0].timings if heavy_results else None)
+        if timings is not None:
+            for r in heavy_results or results:
+                r.timings = dict(timings)
+        if not heavy_results:
+            return results
+        self.heavy_found += 1
+        self._last_contours = list(self.heavy._last_contours)
+        self._last_contour = self._last_contours[0]
+        return heavy_results
+
+    # ------------------------------------------------------------------ stats
+    def cascade_stats(self) -> dict:
+        """复检统计：复检比例、各原因次数、两条路径的平均耗时"""
+        frames = self.frames
+        return {
+            'cascade_frames': frames,
+            'cascade_rate': self.escalations / frames if frames else 0.0,
+            'cascade_low_confidence': self.low_confidence,
+            'cascade_no_head': self.no_head,
+            'cascade_heavy_found': self.heavy_found,
+            'cascade_fast_ms': self._fast_seconds * 1000 / frames if frames else 0.0,
+            'cascade_heavy_ms': self._heavy_seconds * 1000 / self.escalations if self.escalations else 0.0,
+            # 每帧平均耗时（快速路径 + 按比例摊到每帧的复检）
+            'cascade_mean_ms': (self._fast_seconds + self._heavy_seconds) * 1000 / frames if frames else 0.0,
+        }
+
+    def roi_stats(self) -> dict:
+        """ROI预测统计，附带复检统计（经同一路径送到界面和检测进程池）"""
+        stats = super().roi_stats()
+        stats.update(self.cascade_stats())
+        return stats
+
+    def release(self):
+        self.heavy.release()
+        logger.info(f"CascadeDetector released: {self.cascade_stats()}")
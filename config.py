@@ -14,6 +14,8 @@ from config_manager import (
     TRIGGER_VALUES,
     CLASS_VALUES,
     CAMERA_PARAMS,
+    CAMERA_RECIPES,
+    DETECTOR_CONFIG,
     MODEL_CONFIG,
     POLL_INTERVAL,
     LOG_CONFIG,
@@ -32,6 +34,8 @@ __all__ = [
     'TRIGGER_VALUES',
     'CLASS_VALUES',
     'CAMERA_PARAMS',
+    'CAMERA_RECIPES',
+    'DETECTOR_CONFIG',
     'MODEL_CONFIG',
     'POLL_INTERVAL',
     'LOG_CONFIG',
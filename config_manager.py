@@ -82,13 +82,88 @@ def get_default_config() -> Dict[str, Any]:
         "camera_params": {
             "exposure": 5000,
             "gain": 10,
-            "width": 1920,
-            "height": 1080,
-            "timeout": 5000
+            "width": 0,
+            "height": 0,
+            "offset_x": 0,
+            "offset_y": 0,
+            "binning": 1,
+            "decimation": 1,
+            "timeout": 5000,
+            "trigger_source": "software",
+            "trigger_activation": "RisingEdge",
+            "trigger_match_window_ms": 500,
+            "free_run": False,
+            "free_run_fps": 0,
+            "max_frame_age_ms": 100,
+            "gige_resend": True,
+            "gige_max_resend_percent": 10,
+            "gige_resend_timeout_ms": 50,
+            "gige_gvcp_timeout_ms": 500,
+            "gige_packet_delay": 0,
+            "gige_packet_delay_stagger": 0,
+            "stats_interval_s": 5.0,
+            "display_interval_s": 0.2,
+            "watchdog_interval_s": 1.0,
+            "reconnect_interval_s": 2.0,
+            "reconnect_max_interval_s": 30.0,
+            "profile_dir": "camera_profiles",
+            "image_cache_mb": 512,
+            "image_cache_warm": True,
+            "replay_archive": "",
+            "replay_realtime": False,
+            "result_cache": False,
+            "result_cache_entries": 2048,
+            "result_cache_path": "cache/results.sqlite",
+            "result_cache_stride": 4,
+            "synthetic_camera": False,
+            "synthetic_size": [1280, 1024],
+            "synthetic_fps": 0
+        },
+        "camera_recipes": {},
+        "detector": {
+            "pyramid_scale": 0,
+            "pyramid_margin": 32,
+            "pyramid_verify_every": 0,
+            "pyramid_tolerance_px": 2.0,
+            "pyramid_tolerance_deg": 1.0,
+            "roi_tracking": False,
+            "roi_history": 20,
+            "roi_margin": 0.15,
+            "roi_refresh_every": 50,
+            "head_slices": 5,
+            "engine_processes": 0,
+            "engine_slots": 0,
+            "engine_max_frame_mb": 16,
+            "engine_timeout_ms": 2000,
+            "background_model": False,
+            "background_dir": "backgrounds",
+            "background_k": 4.0,
+            "background_min_diff": 20,
+            "background_frames": 20,
+            "background_refresh_s": 60,
+            "background_idle_s": 10,
+            "background_alpha": 0.05,
+            "cascade": False,
+            "cascade_backend": "onnx",
+            "cascade_min_confidence": 0.85,
+            "cascade_on_no_head": True,
+            "cascade_head_slices": 9,
+            "multi_nut": False,
+            "max_targets": 3,
+            "target_order": "center",
+            "target_min_area": 0.3,
+            "stage_timing": False,
+            "stage_timing_window": 500
         },
         "model": {
             "model_path": "models/obb_best_m.pt",
-            "device": "auto"
+            "device": "auto",
+            "backend": "cv",
+            "onnx_path": "models/obb_best_m.onnx",
+            "conf_threshold": 0.25,
+            "iou_threshold": 0.45,
+            "imgsz": 640,
+            "intra_op_threads": 0
         },
         "poll_interval": 0.1,
         "log": {
@@ -189,6 +264,8 @@ def _load_legacy_vars():
         'TRIGGER_VALUES': cfg['trigger_values'],
         'CLASS_VALUES': cfg['class_values'],
         'CAMERA_PARAMS': cfg['camera_params'],
+        'CAMERA_RECIPES': cfg.get('camera_recipes', {}),
+        'DETECTOR_CONFIG': cfg.get('detector', {}),
         'MODEL_CONFIG': cfg['model'],
         'POLL_INTERVAL': cfg['poll_interval'],
         'LOG_CONFIG': cfg['log']
@@ -203,6 +280,8 @@ CAMERA_CONFIGS = _legacy_vars['CAMERA_CONFIGS']
 TRIGGER_VALUES = _legacy_vars['TRIGGER_VALUES']
 CLASS_VALUES = _legacy_vars['CLASS_VALUES']
 CAMERA_PARAMS = _legacy_vars['CAMERA_PARAMS']
+CAMERA_RECIPES = _legacy_vars['CAMERA_RECIPES']
+DETECTOR_CONFIG = _legacy_vars['DETECTOR_CONFIG']
 MODEL_CONFIG = _legacy_vars['MODEL_CONFIG']
 POLL_INTERVAL = _legacy_vars['POLL_INTERVAL']
 LOG_CONFIG = _legacy_vars['LOG_CONFIG']
@@ -0,0 +1,306 @@
+"""
+检测进程池
+DetectionEngine: 在多个子进程中运行检测器（VisionDetector或OnnxObbDetector），绕开GIL。
+
+8台相机同时触发时，各CameraWorker线程中的检测（numpy运算和轮廓处理的Python部分）
+会在GIL上排队。检测引擎启动若干个常驻子进程，每个子进程为分配给它的相机各保留
+一个检测器（ROI预测等状态跨帧保留），图像通过SharedFrameRing传递，队列中只传槽位序号。
+
+用法:
+    engine = DetectionEngine(processes=4, detector_config=DETECTOR_CONFIG)
+    engine.start()
+    engine.register_camera(1, pixel_to_mm=0.1)
+    future = engine.submit(1, image)        # 槽位已满时返回None，由调用方在本线程检测
+    result, contour = future.result(timeout=2.0)
+    ...
+    engine.shutdown()
+
+子进程以spawn方式启动（与Windows一致，也避免fork带上Qt线程），
+启动脚本必须有 if __name__ == "__main__" 保护并调用 multiprocessing.freeze_support()。
+"""
+
+import os
+import itertools
+import logging
+import logging.handlers
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+from frame_ring import SharedFrameRing
+
+logger = logging.getLogger('BetelNutVision.detection_engine')
+
+
+class _ResultQueueHandler(logging.handlers.QueueHandler):
+    """子进程日志通过结果队列送回主进程，由主进程的日志配置统一输出"""
+
+    def enqueue(self, record):
+        self.queue.put(('log', record))
+
+
+def _worker_main(index: int, ring_name: str, tasks, results, detector_config: dict, model_config: dict,
+                 log_level: int):
+    """
+    检测子进程入口
+
+    任务:
+        ('camera', camera_id, pixel_to_mm)       为相机创建检测器
+        ('roi', camera_id, roi_args)             更新相机ROI（VisionDetector.set_roi参数）
+        ('background', camera_id, path)          加载背景模型文件，path为None时取消
+        ('detect', request_id, slot, camera_id, multi)  检测槽位中的帧，完成后归还槽位；
+                                                 multi为True时用detect_all检测所有槟榔
+        None                                     退出
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [_ResultQueueHandler(results)]
+    root.setLevel(log_level)
+
+    from detector_factory import create_detector
+    from background_model import BackgroundModel
+
+    ring = SharedFrameRing.attach(ring_name)
+    detectors = {}
+    logger.info(f'检测进程 {index} 已启动 (pid={os.getpid()})')
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            kind = task[0]
+
+            if kind == 'camera':
+                _, camera_id, pixel_to_mm = task
+                detectors[camera_id] = create_detector(pixel_to_mm, detector_config, model_config)
+            elif kind == 'roi':
+                _, camera_id, roi_args = task
+                detectors[camera_id].set_roi(*roi_args)
+            elif kind == 'background':
+                _, camera_id, path = task
+                try:
+                    model = BackgroundModel.load(path, k=detector_config.get('background_k'),
+                                                 min_diff=detector_config.get('background_min_diff')) if path else None
+                except Exception as e:
+                    logger.error(f'检测进程 {index} 读取背景模型 {path} 失败: {e}')
+                    model = None
+                detectors[camera_id].set_background(model)
+            elif kind == 'detect':
+                _, request_id, slot, camera_id, multi = task
+                try:
+                    detector = detectors[camera_id]
+                    read = ring.read(slot)
+                    if read is None:
+                        raise RuntimeError(f'槽位 {slot} 未就绪')
+                    _, frame = read
+                    if multi:
+                        result, contour = detector.detect_all(frame), detector._last_contours
+                    else:
+                        result, contour = detector.detect_betel_nut(frame), detector._last_contour
+                    results.put(('result', request_id, result, contour, detector.roi_stats()))
+                except Exception as e:
+                    results.put(('error', request_id, f'{type(e).__name__}: {e}', traceback.format_exc()))
+                finally:
+                    frame = None
+                    ring.release(slot)
+    finally:
+        ring.close()
+        logger.info(f'检测进程 {index} 退出')
+
+
+class DetectionEngine:
+    """
+    检测进程池
+
+    每台相机固定分配给一个子进程（按注册顺序轮流分配），同一相机的帧按提交顺序检测，
+    检测器状态（ROI预测、多分辨率校验计数）与在CameraWorker线程中检测时相同。
+    进程数超过相机数没有意义。
+    """
+
+    def __init__(self, processes: int = 0, slots: int = 0, max_frame_bytes: int = 2448 * 2048 * 3,
+                 detector_config: Optional[dict] = None, model_config: Optional[dict] = None):
+        """
+        Args:
+            processes: 子进程数，0 表示取CPU核数
+            slots: 帧环槽位数，0 表示进程数×2
+            max_frame_bytes: 单帧最大字节数，超过时submit返回None
+            detector_config: VisionDetector参数（除pixel_to_mm外）
+            model_config: 检测后端配置（MODEL_CONFIG，见detector_factory）
+        """
+        self.processes = int(processes) or (os.cpu_count() or 1)
+        self.slots = int(slots) or self.processes * 2
+        self.max_frame_bytes = int(max_frame_bytes)
+        self.detector_config = {k: v for k, v in (detector_config or {}).items()
+                                if not k.startswith('engine_')}
+        self.model_config = dict(model_config or {})
+
+        self._ring = None
+        self._workers = []
+        self._tasks = []
+        self._results = None
+        self._result_thread = None
+        self._assignment = {}
+        self._pending = {}
+        self._roi_stats = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self.submitted = 0
+        self.fallbacks = 0
+
+    @property
+    def running(self) -> bool:
+        return self._ring is not None
+
+    def start(self):
+        """创建帧环并启动子进程（每个子进程导入numpy/OpenCV约需1~2秒）"""
+        if self.running:
+            return
+        context = multiprocessing.get_context('spawn')
+        # 写入方都在本进程的相机线程中，槽位分配用线程锁即可
+        self._ring = SharedFrameRing.create(None, self.slots, self.max_frame_bytes, lock=threading.Lock())
+        self._results = context.Queue()
+        log_level = logging.getLogger('BetelNutVision').getEffectiveLevel()
+
+        for index in range(self.processes):
+            tasks = context.Queue()
+            worker = context.Process(
+                target=_worker_main,
+                args=(index, self._ring.name, tasks, self._results, self.detector_config, self.model_config,
+                      log_level),
+                name=f'DetectionWorker-{index}',
+                daemon=True,
+            )
+            worker.start()
+            self._tasks.append(tasks)
+            self._workers.append(worker)
+
+        self._result_thread = threading.Thread(target=self._collect_results, name='DetectionResults',
+                                               daemon=True)
+        self._result_thread.start()
+        logger.info(f'检测进程池启动: {self.processes} 个进程, {self.slots} 个帧槽位')
+
+    def register_camera(self, camera_id: int, pixel_to_mm: float):
+        """为相机在其分配的子进程中创建检测器（重复注册会重建检测器）"""
+        if camera_id not in self._assignment:
+            self._assignment[camera_id] = len(self._assignment) % self.processes
+        self._tasks[self._assignment[camera_id]].put(('camera', camera_id, pixel_to_mm))
+
+    def set_roi(self, camera_id: int, offset_x: int, offset_y: int,
+                sensor_width: int, sensor_height: int, scale: int = 1):
+        """同 VisionDetector.set_roi"""
+        self._tasks[self._assignment[camera_id]].put(
+            ('roi', camera_id, (offset_x, offset_y, sensor_width, sensor_height, scale)))
+
+    def set_background(self, camera_id: int, path: Optional[str]):
+        """让子进程加载背景模型文件（BackgroundModel.save保存的.npz），None 表示不用背景模型"""
+        self._tasks[self._assignment[camera_id]].put(('background', camera_id, path))
+
+    def submit(self, camera_id: int, image: np.ndarray, multi: bool = False) -> Optional[Future]:
+        """
+        提交一帧检测
+
+        Args:
+            multi: 检测所有槟榔（detect_all）
+
+        Returns:
+            Future，结果为 (DetectionResult, 轮廓)，multi时为 (结果列表, 轮廓列表)；
+            帧环已满或帧超过槽位大小时返回None
+        """
+        if not self.running or camera_id not in self._assignment:
+            return None
+        if image.nbytes > self._ring.slot_bytes:
+            self.fallbacks += 1
+            return None
+        slot = self._ring.write(image, camera_id)
+        if slot is None:
+            self.fallbacks += 1
+            return None
+
+        request_id = next(self._request_ids)
+        future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = (future, camera_id)
+        self._tasks[self._assignment[camera_id]].put(('detect', request_id, slot, camera_id, bool(multi)))
+        self.submitted += 1
+        return future
+
+    def roi_stats(self, camera_id: int) -> dict:
+        """子进程中该相机检测器最近一次返回的ROI预测统计"""
+        return self._roi_stats.get(camera_id, {})
+
+    def stats(self) -> dict:
+        stats = {
+            'processes': self.processes,
+            'alive': sum(1 for w in self._workers if w.is_alive()),
+            'submitted': self.submitted,
+            'fallbacks': self.fallbacks,
+            'pending': len(self._pending),
+        }
+        if self._ring is not None:
+            stats.update({f'ring_{k}': v for k, v in self._ring.stats().items()})
+        return stats
+
+    def _collect_results(self):
+        """结果线程：把子进程返回的结果交给对应的Future，转发子进程日志"""
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            kind = item[0]
+            if kind == 'log':
+                record = item[1]
+                logging.getLogger(record.name).handle(record)
+                continue
+
+            request_id = item[1]
+            with self._pending_lock:
+                future, camera_id = self._pending.pop(request_id, (None, None))
+            if future is None:
+                continue
+            if kind == 'result':
+                _, _, result, contour, roi_stats = item
+                if roi_stats:
+                    self._roi_stats[camera_id] = roi_stats
+                future.set_result((result, contour))
+            else:
+                _, _, message, detail = item
+                logger.error(f'检测进程异常: {message}\n{detail}')
+                future.set_exception(RuntimeError(message))
+
+    def shutdown(self, timeout: float = 5.0):
+        """通知子进程退出并释放帧环，未完成的Future以异常结束"""
+        if not self.running:
+            return
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning(f'{worker.name} 未按时退出，强制结束')
+                worker.terminate()
+                worker.join(1.0)
+
+        self._results.put(None)
+        self._result_thread.join(timeout)
+
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            future.set_exception(RuntimeError('检测进程池已关闭'))
+
+        self._ring.close()
+        self._ring = None
+        self._workers.clear()
+        self._tasks.clear()
+        logger.info('检测进程池已关闭')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
@@ -0,0 +1,94 @@
+"""
+检测器选择
+create_detector: 按 model.backend 配置创建检测器
+    'cv'    传统CV（VisionDetector），默认
+    'onnx'  ONNX Runtime OBB模型（OnnxObbDetector），onnxruntime或模型文件缺失时退回传统CV
+detector.cascade 为 true 时改为级联检测（CascadeDetector）
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from config_manager import get_exe_dir
+from vision_detector import VisionDetector
+
+logger = logging.getLogger('BetelNutVision.detector_factory')
+
+
+def resolve_model_path(path: str) -> Path:
+    """模型路径，相对路径按exe同目录解析"""
+    model_path = Path(path)
+    if not model_path.is_absolute():
+        model_path = get_exe_dir() / model_path
+    return model_path
+
+
+def _create_onnx(pixel_to_mm: float, detector_config: dict, model_config: dict) -> Optional[VisionDetector]:
+    """创建ONNX OBB检测器，onnxruntime或模型文件缺失时返回None"""
+    from onnx_obb_detector import OnnxObbDetector, ONNXRUNTIME_AVAILABLE
+
+    onnx_path = resolve_model_path(model_config.get('onnx_path', 'models/obb_best_m.onnx'))
+    if not ONNXRUNTIME_AVAILABLE:
+        logger.warning('onnxruntime 未安装，改用传统CV检测')
+        return None
+    if not onnx_path.exists():
+        logger.warning(f'ONNX模型不存在: {onnx_path}，改用传统CV检测')
+        return None
+    return OnnxObbDetector(
+        onnx_path,
+        pixel_to_mm=pixel_to_mm,
+        conf_threshold=model_config.get('conf_threshold', 0.25),
+        iou_threshold=model_config.get('iou_threshold', 0.45),
+        imgsz=model_config.get('imgsz', 640),
+        intra_op_threads=model_config.get('intra_op_threads', 0),
+        **detector_config
+    )
+
+
+def _create_fine_cv(pixel_to_mm: float, detector_config: dict) -> VisionDetector:
+    """精细分割的传统CV检测器：整幅全分辨率分割，不用ROI预测，头尾判断切片更多"""
+    config = dict(detector_config)
+    config.update(pyramid_scale=0, pyramid_verify_every=0, roi_tracking=False,
+                  head_slices=detector_config.get('cascade_head_slices', 9))
+    return VisionDetector(pixel_to_mm=pixel_to_mm, **config)
+
+
+def create_detector(pixel_to_mm: float, detector_config: Optional[dict] = None,
+                    model_config: Optional[dict] = None) -> VisionDetector:
+    """
+    创建检测器
+
+    detector.cascade 为 true 时创建级联检测器：传统CV快速路径 + 按 detector.cascade_backend
+    创建的复检器（'onnx' 不可用时退回 'cv' 精细分割），此时忽略 model.backend。
+
+    Args:
+        pixel_to_mm: 像素到毫米的转换比例
+        detector_config: DETECTOR_CONFIG（检测参数）
+        model_config: MODEL_CONFIG（backend、onnx_path等）
+
+    Returns:
+        VisionDetector 或其子类 OnnxObbDetector / CascadeDetector
+    """
+    detector_config = detector_config or {}
+    model_config = model_config or {}
+
+    if detector_config.get('cascade'):
+        from cascade_detector import CascadeDetector
+
+        heavy = None
+        if str(detector_config.get('cascade_backend', 'onnx')).lower() == 'onnx':
+            heavy = _create_onnx(pixel_to_mm, detector_config, model_config)
+        if heavy is None:
+            heavy = _create_fine_cv(pixel_to_mm, detector_config)
+        return CascadeDetector(heavy, pixel_to_mm=pixel_to_mm, **detector_config)
+
+    backend = str(model_config.get('backend', 'cv')).lower()
+    if backend == 'onnx':
+        detector = _create_onnx(pixel_to_mm, detector_config, model_config)
+        if detector is not None:
+            return detector
+    elif backend != 'cv':
+        logger.warning(f'未知的检测后端 {backend}，使用传统CV检测')
+
+    return VisionDetector(pixel_to_mm=pixel_to_mm, **detector_config)
@@ -0,0 +1,622 @@
+"""
+海康MVS SDK的纯Python替身
+FakeMvCamera: 按MvCamera的接口（ctypes结构体/返回码）模拟GigE相机，用于无相机、无DLL时
+运行和性能分析真实的 HikvisionCamera 取图代码（缓冲区处理、像素格式转换等）
+
+用法:
+    import fake_mv_camera
+    fake_mv_camera.install(['192.168.1.101'], image_folder='test_img', pixel_format='BayerRG8')
+    from hikvision_camera import HikvisionCamera   # 之后HikvisionCamera使用的就是FakeMvCamera
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from ctypes import *
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import cv2
+
+from MvImport.CameraParams_const import *
+from MvImport.CameraParams_header import *
+from MvImport.MvErrorDefine_const import *
+from MvImport.PixelType_header import *
+
+logger = logging.getLogger('BetelNutVision.fake_mv_camera')
+
+# 像素格式名称 → (SDK枚举值, 每像素字节数)
+PIXEL_FORMATS = {
+    'Mono8': (PixelType_Gvsp_Mono8, 1),
+    'BayerRG8': (PixelType_Gvsp_BayerRG8, 1),
+    'BayerGR8': (PixelType_Gvsp_BayerGR8, 1),
+    'BayerGB8': (PixelType_Gvsp_BayerGB8, 1),
+    'BayerBG8': (PixelType_Gvsp_BayerBG8, 1),
+    'RGB8': (PixelType_Gvsp_RGB8_Packed, 3),
+    'BGR8': (PixelType_Gvsp_BGR8_Packed, 3),
+}
+
+# Bayer马赛克中R、B所在位置 (行, 列)，G占其余两个位置
+_BAYER_LAYOUT = {
+    'BayerRG8': ((0, 0), (1, 1)),
+    'BayerGR8': ((0, 1), (1, 0)),
+    'BayerGB8': ((1, 0), (0, 1)),
+    'BayerBG8': ((1, 1), (0, 0)),
+}
+
+_TICK_HZ = 1_000_000_000
+
+# 已注册的模拟设备: IP → 设备配置
+_devices = {}
+# 供EnumDevices返回的设备信息结构体（需保持引用，否则指针失效）
+_device_infos = []
+# 已打开的设备: IP → FakeMvCamera
+_opened = {}
+_registry_lock = threading.Lock()
+
+
+def _ip_to_int(ip: str) -> int:
+    a, b, c, d = (int(x) for x in ip.split('.'))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def _int_to_ip(value: int) -> str:
+    return f"{(value >> 24) & 0xff}.{(value >> 16) & 0xff}.{(value >> 8) & 0xff}.{value & 0xff}"
+
+
+def add_device(ip: str, image_folder: str = "test_img", pixel_format: str = "BayerRG8",
+               sensor_size: tuple = (2448, 2048), transfer_mbps: float = 1000.0,
+               latency_ms: float = 1.0, lost_packet_rate: float = 0.0):
+    """
+    注册一台模拟相机
+
+    Args:
+        ip: 相机IP
+        image_folder: 图片文件夹，帧内容从这里的图片依次读取
+        pixel_format: 输出像素格式，见PIXEL_FORMATS
+        sensor_size: 传感器分辨率 (宽, 高)，图片会缩放到该尺寸
+        transfer_mbps: 模拟链路带宽，决定每帧的传输耗时
+        latency_ms: 每帧固定延时（触发响应 + 协议开销）
+        lost_packet_rate: 每帧报告丢包的概率
+    """
+    if pixel_format not in PIXEL_FORMATS:
+        raise ValueError(f"不支持的像素格式: {pixel_format}，可选: {', '.join(PIXEL_FORMATS)}")
+
+    folder = Path(image_folder)
+    images = []
+    if folder.is_dir():
+        for ext in ('*.bmp', '*.jpg', '*.jpeg', '*.png'):
+            images.extend(p for p in folder.glob(ext) if p.is_file())
+    images.sort()
+
+    with _registry_lock:
+        _devices[ip] = {
+            'images': images,
+            'pixel_format': pixel_format,
+            'sensor_size': (int(sensor_size[0]), int(sensor_size[1])),
+            'transfer_mbps': float(transfer_mbps),
+            'latency_ms': float(latency_ms),
+            'lost_packet_rate': float(lost_packet_rate),
+        }
+    logger.info(f"模拟相机 {ip}: {len(images)} 张图片, {pixel_format}, "
+                f"{sensor_size[0]}x{sensor_size[1]}, {transfer_mbps}Mbps")
+
+
+def install(ips, **device_options):
+    """
+    注册模拟相机并把 hikvision_camera 模块中的 MvCamera 替换为 FakeMvCamera
+
+    只补充SDK未加载时缺失的常量和结构体，不覆盖已有定义。
+
+    Args:
+        ips: 相机IP列表
+        **device_options: 传给add_device的参数
+    """
+    import sys
+    import hikvision_camera
+
+    for ip in ips:
+        add_device(ip, **device_options)
+
+    namespace = vars(hikvision_camera)
+    for name, value in globals().items():
+        if (name.startswith(('MV_', 'MVCC_', 'PixelType_', '_MV'))
+                or isinstance(value, type) and issubclass(value, Structure)):
+            namespace.setdefault(name, value)
+    hikvision_camera.MvCamera = FakeMvCamera
+    hikvision_camera.HIKVISION_SDK_AVAILABLE = True
+
+    # camera_worker按值导入了SDK可用标志，已导入时一并修改
+    camera_worker = sys.modules.get('camera_worker')
+    if camera_worker is not None:
+        camera_worker.HIKVISION_SDK_AVAILABLE = True
+
+
+def simulate_disconnect(ip: str):
+    """模拟相机掉线：触发异常回调，之后IsDeviceConnected返回False"""
+    cam = _opened.get(ip)
+    if cam is not None:
+        cam._lose_device()
+
+
+def fire_line_trigger(ip: str):
+    """模拟IO线上的硬触发脉冲"""
+    cam = _opened.get(ip)
+    if cam is not None:
+        cam._trigger(hardware=True)
+
+
+class FakeMvCamera:
+    """
+    模拟MvCamera：方法名、参数和返回码与MvCameraControl_class.MvCamera一致
+
+    图像在调用方传入的缓冲区里按所设像素格式（Bayer马赛克/Mono8/RGB8/BGR8）填充，
+    取图按曝光时间 + 固定延时 + 帧大小/带宽 模拟传输耗时。
+    """
+
+    def __init__(self):
+        self.ip = None
+        self.device = None
+        self.opened = False
+        self.grabbing = False
+        self.lost = False
+        self._exception_callback = None
+        self._exception_user = None
+
+        self._lock = threading.Condition()
+        self._pending = deque()         # 待输出的触发帧: (就绪时刻, 触发序号)
+        self._frame_num = 0
+        self._trigger_index = 0
+        self._grab_start = 0.0
+        self._last_free_run_index = -1
+        self._frame_buffer = None       # GetImageBuffer使用的内部缓存
+        self._raw_cache = {}            # (图片, ROI, 格式) → 原始帧字节
+        self._source_cache = {}         # 图片路径 → 缩放到传感器尺寸的BGR图像
+
+        self.grab_strategy = MV_GrabStrategy_OneByOne
+        self.output_queue_size = 1
+        self.resend = (1, 10, 50)
+        self.gvcp_timeout_ms = 500
+        self.net_stats = {'bytes': 0, 'frames': 0, 'lost_frames': 0}
+
+        self.int_nodes = {}
+        self.enum_nodes = {}
+        self.float_nodes = {}
+        self.bool_nodes = {}
+
+    # ---------- 设备枚举与打开 ----------
+
+    @staticmethod
+    def MV_CC_EnumDevices(nTLayerType, stDevList):
+        with _registry_lock:
+            _device_infos.clear()
+            if not nTLayerType & MV_GIGE_DEVICE:
+                stDevList.nDeviceNum = 0
+                return 0
+            for i, ip in enumerate(_devices):
+                info = MV_CC_DEVICE_INFO()
+                memset(byref(info), 0, sizeof(info))
+                info.nTLayerType = MV_GIGE_DEVICE
+                info.SpecialInfo.stGigEInfo.nCurrentIp = _ip_to_int(ip)
+                _device_infos.append(info)
+                stDevList.pDeviceInfo[i] = pointer(info)
+            stDevList.nDeviceNum = len(_device_infos)
+        return 0
+
+    def MV_CC_CreateHandle(self, stDevInfo):
+        ip = _int_to_ip(stDevInfo.SpecialInfo.stGigEInfo.nCurrentIp)
+        if ip not in _devices:
+            return MV_E_PARAMETER
+        self.ip = ip
+        self.device = _devices[ip]
+        self._init_nodes()
+        return 0
+
+    def MV_CC_DestroyHandle(self):
+        if self.device is None:
+            return MV_E_HANDLE
+        self.MV_CC_CloseDevice()
+        self.device = None
+        return 0
+
+    def MV_CC_OpenDevice(self, nAccessMode=MV_ACCESS_Exclusive, nSwitchoverKey=0):
+        if self.device is None:
+            return MV_E_HANDLE
+        with _registry_lock:
+            owner = _opened.get(self.ip)
+            if owner is not None and owner is not self and not owner.lost:
+                return MV_E_ACCESS_DENIED
+            _opened[self.ip] = self
+        self.opened = True
+        self.lost = False
+        return 0
+
+    def MV_CC_CloseDevice(self):
+        if not self.opened:
+            return MV_E_CALLORDER
+        self.MV_CC_StopGrabbing()
+        with _registry_lock:
+            if _opened.get(self.ip) is self:
+                del _opened[self.ip]
+        self.opened = False
+        return 0
+
+    def MV_CC_IsDeviceConnected(self):
+        return self.opened and not self.lost
+
+    def MV_CC_RegisterExceptionCallBack(self, callBackFun, pUser):
+        self._exception_callback = callBackFun
+        self._exception_user = pUser
+        return 0
+
+    def _lose_device(self):
+        self.lost = True
+        with self._lock:
+            self._pending.clear()
+            self._lock.notify_all()
+        if self._exception_callback is not None:
+            self._exception_callback(MV_EXCEPTION_DEV_DISCONNECT, self._exception_user)
+
+    # ---------- 特征节点 ----------
+
+    def _init_nodes(self):
+        sensor_w, sensor_h = self.device['sensor_size']
+        self.int_nodes = {
+            # 名称: [当前值, 最小值, 最大值, 步长]
+            'WidthMax': [sensor_w, sensor_w, sensor_w, 1],
+            'HeightMax': [sensor_h, sensor_h, sensor_h, 1],
+            'Width': [sensor_w, 8, sensor_w, 8],
+            'Height': [sensor_h, 2, sensor_h, 2],
+            'OffsetX': [0, 0, 0, 8],
+            'OffsetY': [0, 0, 0, 2],
+            'GevSCPSPacketSize': [1500, 576, 9000, 4],
+            'GevSCPD': [0, 0, 100000, 1],
+            'GevTimestampTickFrequency': [_TICK_HZ, _TICK_HZ, _TICK_HZ, 1],
+        }
+        self.enum_nodes = {
+            'TriggerMode': MV_TRIGGER_MODE_ON,
+            'TriggerSource': MV_TRIGGER_SOURCE_SOFTWARE,
+            'TriggerActivation': 'RisingEdge',
+            'ExposureAuto': 0,
+            'GainAuto': 0,
+            'BinningHorizontal': 1,
+            'BinningVertical': 1,
+            'DecimationHorizontal': 1,
+            'DecimationVertical': 1,
+        }
+        self.float_nodes = {'ExposureTime': 5000.0, 'Gain': 0.0, 'AcquisitionFrameRate': 30.0}
+        self.bool_nodes = {'AcquisitionFrameRateEnable': False}
+
+    def _scale(self) -> int:
+        return (self.enum_nodes['BinningHorizontal']
+                * self.enum_nodes['DecimationHorizontal'])
+
+    def _update_geometry(self):
+        """合并/抽样或宽高改变后，重新计算宽高和偏移的取值范围"""
+        sensor_w, sensor_h = self.device['sensor_size']
+        scale = self._scale()
+        max_w, max_h = sensor_w // scale // 8 * 8, sensor_h // scale // 2 * 2
+        nodes = self.int_nodes
+        nodes['WidthMax'][:3] = [max_w, max_w, max_w]
+        nodes['HeightMax'][:3] = [max_h, max_h, max_h]
+        nodes['Width'][2] = max_w - nodes['OffsetX'][0]
+        nodes['Height'][2] = max_h - nodes['OffsetY'][0]
+        nodes['Width'][0] = min(nodes['Width'][0], nodes['Width'][2])
+        nodes['Height'][0] = min(nodes['Height'][0], nodes['Height'][2])
+        nodes['OffsetX'][2] = max_w - nodes['Width'][0]
+        nodes['OffsetY'][2] = max_h - nodes['Height'][0]
+
+    def _payload_size(self) -> int:
+        bpp = PIXEL_FORMATS[self.device['pixel_format']][1]
+        return self.int_nodes['Width'][0] * self.int_nodes['Height'][0] * bpp
+
+    def MV_CC_GetIntValue(self, strKey, stIntValue):
+        if self.device is None:
+            return MV_E_HANDLE
+        if strKey == 'PayloadSize':
+            payload = self._payload_size()
+            node = [payload, payload, payload, 1]
+        elif strKey in self.int_nodes:
+            node = self.int_nodes[strKey]
+        else:
+            return MV_E_SUPPORT
+        stIntValue.nCurValue, stIntValue.nMin, stIntValue.nMax, stIntValue.nInc = (
+            node[0], node[1], node[2], node[3])
+        return 0
+
+    def MV_CC_SetIntValue(self, strKey, nValue):
+        node = self.int_nodes.get(strKey)
+        if node is None or strKey in ('WidthMax', 'HeightMax', 'GevTimestampTickFrequency'):
+            return MV_E_SUPPORT
+        if strKey in ('Width', 'Height', 'OffsetX', 'OffsetY') and self.grabbing:
+            return MV_E_CALLORDER
+        value = int(nValue)
+        if not node[1] <= value <= node[2] or (value - node[1]) % node[3]:
+            return MV_E_PARAMETER
+        node[0] = value
+        if strKey in ('Width', 'Height', 'OffsetX', 'OffsetY'):
+            self._update_geometry()
+        return 0
+
+    def MV_CC_SetEnumValue(self, strKey, nValue):
+        if strKey not in self.enum_nodes:
+            return MV_E_SUPPORT
+        if strKey.startswith(('Binning', 'Decimation')):
+            if int(nValue) not in (1, 2, 4):
+                return MV_E_PARAMETER
+            if self.grabbing:
+                return MV_E_CALLORDER
+        self.enum_nodes[strKey] = int(nValue)
+        if strKey.startswith(('Binning', 'Decimation')):
+            self._update_geometry()
+        return 0
+
+    def MV_CC_SetEnumValueByString(self, strKey, strValue):
+        if strKey not in self.enum_nodes:
+            return MV_E_SUPPORT
+        self.enum_nodes[strKey] = strValue
+        return 0
+
+    def MV_CC_SetFloatValue(self, strKey, fValue):
+        if strKey not in self.float_nodes:
+            return MV_E_SUPPORT
+        self.float_nodes[strKey] = float(fValue)
+        return 0
+
+    def MV_CC_SetBoolValue(self, strKey, bValue):
+        if strKey not in self.bool_nodes:
+            return MV_E_SUPPORT
+        self.bool_nodes[strKey] = bool(bValue)
+        return 0
+
+    def MV_CC_SetCommandValue(self, strKey):
+        if strKey != 'TriggerSoftware':
+            return MV_E_SUPPORT
+        if not self.grabbing:
+            return MV_E_CALLORDER
+        if (self.enum_nodes['TriggerMode'] != MV_TRIGGER_MODE_ON
+                or self.enum_nodes['TriggerSource'] != MV_TRIGGER_SOURCE_SOFTWARE):
+            return MV_E_PRECONDITION
+        self._trigger(hardware=False)
+        return 0
+
+    def MV_CC_FeatureSave(self, strFileName):
+        """把节点值保存为JSON（真实SDK保存的是GenICam特征文件）"""
+        state = {
+            'int': {k: v[0] for k, v in self.int_nodes.items()},
+            'enum': self.enum_nodes,
+            'float': self.float_nodes,
+            'bool': self.bool_nodes,
+        }
+        try:
+            Path(strFileName).write_text(json.dumps(state), encoding='utf-8')
+        except OSError:
+            return MV_E_RESOURCE
+        return 0
+
+    def MV_CC_FeatureLoad(self, strFileName):
+        try:
+            state = json.loads(Path(strFileName).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return MV_E_PARAMETER
+        self.enum_nodes.update(state['enum'])
+        self.float_nodes.update(state['float'])
+        self.bool_nodes.update(state['bool'])
+        # 与相机端一致：先清零偏移，再设宽高，最后设偏移
+        self.int_nodes['OffsetX'][0] = self.int_nodes['OffsetY'][0] = 0
+        self._update_geometry()
+        for key in ('Width', 'Height', 'OffsetX', 'OffsetY', 'GevSCPSPacketSize', 'GevSCPD'):
+            self.int_nodes[key][0] = state['int'][key]
+            self._update_geometry()
+        return 0
+
+    # ---------- GigE传输 ----------
+
+    def MV_CC_GetOptimalPacketSize(self):
+        return 8164
+
+    def MV_GIGE_SetResend(self, bEnable, nMaxResendPercent=10, nResendTimeout=50):
+        self.resend = (bEnable, nMaxResendPercent, nResendTimeout)
+        return 0
+
+    def MV_GIGE_SetGvcpTimeout(self, nMillisec):
+        self.gvcp_timeout_ms = nMillisec
+        return 0
+
+    def MV_GIGE_GetNetTransInfo(self, stInfo):
+        if not self.opened:
+            return MV_E_CALLORDER
+        stInfo.nReceiveDataSize = self.net_stats['bytes']
+        stInfo.nNetRecvFrameCount = self.net_stats['frames']
+        stInfo.nThrowFrameCount = self.net_stats['lost_frames']
+        stInfo.nRequestResendPacketCount = 0
+        stInfo.nResendPacketCount = 0
+        return 0
+
+    # ---------- 取流 ----------
+
+    def MV_CC_SetGrabStrategy(self, enGrabStrategy):
+        self.grab_strategy = enGrabStrategy
+        return 0
+
+    def MV_CC_SetOutputQueueSize(self, nOutputQueueSize):
+        self.output_queue_size = max(1, int(nOutputQueueSize))
+        return 0
+
+    def MV_CC_StartGrabbing(self):
+        if not self.opened:
+            return MV_E_CALLORDER
+        self.grabbing = True
+        self._grab_start = time.monotonic()
+        self._last_free_run_index = -1
+        return 0
+
+    def MV_CC_StopGrabbing(self):
+        with self._lock:
+            self.grabbing = False
+            self._pending.clear()
+            self._lock.notify_all()
+        return 0
+
+    def _transfer_s(self) -> float:
+        """每帧从触发到数据到达主机的耗时"""
+        bits = self._payload_size() * 8
+        return (self.float_nodes['ExposureTime'] / 1e6
+                + self.device['latency_ms'] / 1000.0
+                + bits / (self.device['transfer_mbps'] * 1e6))
+
+    def _free_running(self) -> bool:
+        return self.enum_nodes['TriggerMode'] == MV_TRIGGER_MODE_OFF
+
+    def _trigger(self, hardware: bool):
+        if not self.grabbing or self.lost or self._free_running():
+            return
+        if hardware == (self.enum_nodes['TriggerSource'] == MV_TRIGGER_SOURCE_SOFTWARE):
+            return
+        with self._lock:
+            self._trigger_index += 1
+            self._pending.append((time.monotonic() + self._transfer_s(), self._trigger_index))
+            self._lock.notify_all()
+
+    def _next_frame_time(self, timeout_s: float) -> Optional[tuple]:
+        """
+        等待下一帧就绪
+
+        Returns:
+            (就绪时刻, 触发序号)，超时返回None
+        """
+        deadline = time.monotonic() + timeout_s
+        if self._free_running():
+            fps = self.float_nodes['AcquisitionFrameRate'] if self.bool_nodes[
+                'AcquisitionFrameRateEnable'] else 30.0
+            period = 1.0 / max(fps, 0.1)
+            # 第n帧在 start + n*period 曝光，加传输耗时后到达
+            offset = self._grab_start + self._transfer_s()
+            now = time.monotonic()
+            latest = int((now - offset) / period) if now >= offset else -1
+            if self.grab_strategy == MV_GrabStrategy_OneByOne:
+                index = self._last_free_run_index + 1
+            else:
+                index = max(latest, self._last_free_run_index + 1)
+            ready = offset + index * period
+            if ready > deadline:
+                return None
+            self._last_free_run_index = index
+            return ready, 0
+
+        with self._lock:
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.grabbing or self.lost:
+                    return None
+                self._lock.wait(remaining)
+            ready, trigger_index = self._pending[0]
+            if ready > deadline:
+                return None
+            self._pending.popleft()
+            return ready, trigger_index
+
+    def _render(self) -> bytes:
+        """按当前ROI、合并倍数和像素格式生成下一帧的原始数据"""
+        images = self.device['images']
+        path = images[self._frame_num % len(images)] if images else None
+        nodes = self.int_nodes
+        roi = (nodes['OffsetX'][0], nodes['OffsetY'][0], nodes['Width'][0], nodes['Height'][0])
+        pixel_format = self.device['pixel_format']
+        key = (path, roi, self._scale(), pixel_format)
+
+        raw = self._raw_cache.get(key)
+        if raw is not None:
+            return raw
+
+        source = self._source_cache.get(path)
+        if source is None:
+            sensor_w, sensor_h = self.device['sensor_size']
+            source = cv2.imread(str(path)) if path is not None else None
+            if source is None:
+                source = np.full((sensor_h, sensor_w, 3), 128, dtype=np.uint8)
+            source = cv2.resize(source, (sensor_w, sensor_h), interpolation=cv2.INTER_AREA)
+            self._source_cache[path] = source
+
+        scale = self._scale()
+        if scale > 1:
+            source = cv2.resize(source, (source.shape[1] // scale, source.shape[0] // scale),
+                                interpolation=cv2.INTER_AREA)
+        x, y, w, h = roi
+        bgr = source[y:y + h, x:x + w]
+
+        if pixel_format == 'Mono8':
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        elif pixel_format == 'RGB8':
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        elif pixel_format == 'BGR8':
+            frame = bgr
+        else:
+            (ry, rx), (by, bx) = _BAYER_LAYOUT[pixel_format]
+            frame = bgr[:, :, 1].copy()
+            frame[ry::2, rx::2] = bgr[ry::2, rx::2, 2]
+            frame[by::2, bx::2] = bgr[by::2, bx::2, 0]
+
+        raw = np.ascontiguousarray(frame).tobytes()
+        self._raw_cache[key] = raw
+        return raw
+
+    def _fill_frame(self, pData, nDataSize: int, stFrameInfo, timeout_ms: int) -> int:
+        if not self.grabbing:
+            return MV_E_CALLORDER
+        if self.lost:
+            return MV_E_NODATA
+
+        frame = self._next_frame_time(timeout_ms / 1000.0)
+        if frame is None:
+            return MV_E_NODATA
+        ready, trigger_index = frame
+        delay = ready - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        raw = self._render()
+        if pData is not None:
+            if nDataSize < len(raw):
+                return MV_E_BUFOVER
+            memmove(pData, raw, len(raw))
+
+        self._frame_num += 1
+        lost_packets = 0
+        if self.device['lost_packet_rate'] and np.random.random() < self.device['lost_packet_rate']:
+            lost_packets = 1
+
+        ticks = int(time.monotonic() * _TICK_HZ)
+        stFrameInfo.nWidth = self.int_nodes['Width'][0]
+        stFrameInfo.nHeight = self.int_nodes['Height'][0]
+        stFrameInfo.enPixelType = PIXEL_FORMATS[self.device['pixel_format']][0]
+        stFrameInfo.nFrameNum = self._frame_num
+        stFrameInfo.nDevTimeStampHigh = (ticks >> 32) & 0xffffffff
+        stFrameInfo.nDevTimeStampLow = ticks & 0xffffffff
+        stFrameInfo.nHostTimeStamp = int(time.time() * 1000)
+        stFrameInfo.nFrameLen = len(raw)
+        stFrameInfo.nTriggerIndex = trigger_index
+        stFrameInfo.nLostPacket = lost_packets
+
+        self.net_stats['bytes'] += len(raw)
+        self.net_stats['frames'] += 1
+        return 0
+
+    def MV_CC_GetOneFrameTimeout(self, pData, nDataSize, stFrameInfo, nMsec=1000):
+        return self._fill_frame(pData, nDataSize, stFrameInfo, nMsec)
+
+    def MV_CC_GetImageBuffer(self, pstFrame, nMsec):
+        """使用内部缓存取帧，数据地址写入pstFrame.pBufAddr"""
+        size = self._payload_size()
+        if self._frame_buffer is None or sizeof(self._frame_buffer) < size:
+            self._frame_buffer = (c_ubyte * size)()
+        ret = self._fill_frame(self._frame_buffer, size, pstFrame.stFrameInfo, nMsec)
+        if ret == 0:
+            pstFrame.pBufAddr = cast(self._frame_buffer, POINTER(c_ubyte))
+        return ret
+
+    def MV_CC_FreeImageBuffer(self, stFrameInfo):
+        return 0
@@ -0,0 +1,447 @@
+"""
+原始帧归档文件（.bnfa）
+把图片/录像帧以未压缩的固定尺寸原始数据顺序存放，回放时用numpy.memmap直接映射，
+取帧不需要解码，也不需要复制。
+
+文件布局:
+    [文件头 4096字节] [帧0] [帧1] ... [帧N-1] [索引: N × (时间戳 float64, 相机ID uint16)]
+
+用法:
+    python frame_archive.py convert test_img replay.bnfa --camera-id 1
+    python frame_archive.py info replay.bnfa
+    python frame_archive.py detect replay.bnfa --batch 16 --csv results.csv
+    python frame_archive.py detect replay.bnfa --cache cache/results.sqlite   # 重跑时只重算变化的帧
+    python frame_archive.py detect replay.bnfa --batch 1 --timing             # 各阶段耗时分布
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import cv2
+
+logger = logging.getLogger('BetelNutVision.frame_archive')
+
+MAGIC = b'BNFA'
+VERSION = 1
+# 帧数据从4096字节处开始，保证memmap的每一帧都按页对齐（帧大小也是4096的倍数时）
+DATA_OFFSET = 4096
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('channels', '<u2'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('frame_count', '<u8'),
+    ('index_offset', '<u8'),
+])
+
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('camera_id', '<u2'),
+])
+
+
+class FrameArchiveWriter:
+    """
+    顺序写入归档文件，所有帧尺寸必须相同。close()时写入索引并更新文件头。
+    """
+
+    def __init__(self, path, width: int, height: int, channels: int = 3):
+        self.path = Path(path)
+        self.width = int(width)
+        self.height = int(height)
+        self.channels = int(channels)
+        self.frame_bytes = self.width * self.height * self.channels
+        self._index = []
+        self._file = open(self.path, 'wb')
+        self._file.write(b'\0' * DATA_OFFSET)
+
+    def append(self, image: np.ndarray, timestamp: Optional[float] = None, camera_id: int = 0):
+        """
+        追加一帧
+
+        Args:
+            image: 图像（尺寸须与归档一致，单通道归档可传入HxW）
+            timestamp: 采集时刻（time.time()），缺省为当前时刻
+            camera_id: 相机编号，0表示不区分相机
+        """
+        expected = (self.height, self.width) if self.channels == 1 else (self.height, self.width, self.channels)
+        if image.shape != expected or image.dtype != np.uint8:
+            raise ValueError(f'帧尺寸 {image.shape}/{image.dtype} 与归档 {expected}/uint8 不一致')
+        self._file.write(np.ascontiguousarray(image).tobytes())
+        self._index.append((time.time() if timestamp is None else timestamp, camera_id))
+
+    def close(self):
+        if self._file.closed:
+            return
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        index_offset = DATA_OFFSET + len(self._index) * self.frame_bytes
+        self._file.write(index.tobytes())
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['channels'] = self.channels
+        header['height'] = self.height
+        header['width'] = self.width
+        header['frame_count'] = len(self._index)
+        header['index_offset'] = index_offset
+        self._file.seek(0)
+        self._file.write(header.tobytes())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameArchive:
+    """
+    只读打开归档文件
+
+    Attributes:
+        frames: memmap数组 (N, H, W, C)，只读
+        timestamps: 每帧时间戳 (N,)
+        camera_ids: 每帧相机编号 (N,)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC:
+            raise ValueError(f'{self.path} 不是帧归档文件')
+        if header['version'][0] > VERSION:
+            raise ValueError(f'{self.path} 版本 {header["version"][0]} 不受支持')
+
+        self.height = int(header['height'][0])
+        self.width = int(header['width'][0])
+        self.channels = int(header['channels'][0])
+        count = int(header['frame_count'][0])
+
+        if count:
+            # 转为普通ndarray视图（仍指向映射内存），下游拿到的不是memmap子类
+            self.frames = np.asarray(np.memmap(self.path, dtype=np.uint8, mode='r', offset=DATA_OFFSET,
+                                               shape=(count, self.height, self.width, self.channels)))
+        else:
+            self.frames = np.zeros((0, self.height, self.width, self.channels), dtype=np.uint8)
+        index = np.fromfile(self.path, dtype=INDEX_DTYPE, count=count,
+                            offset=int(header['index_offset'][0]))
+        self.timestamps = index['timestamp']
+        self.camera_ids = index['camera_id']
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def frame(self, i: int) -> np.ndarray:
+        """第i帧（零拷贝视图，单通道归档返回HxW）"""
+        frame = self.frames[i]
+        return frame[:, :, 0] if self.channels == 1 else frame
+
+    def indices_for_camera(self, camera_id: int) -> np.ndarray:
+        """某台相机的帧序号；camera_id为0时返回全部帧"""
+        if camera_id == 0:
+            return np.arange(len(self))
+        return np.flatnonzero(self.camera_ids == camera_id)
+
+
+def convert_folder(folder, output, camera_id: int = 0, size: Optional[tuple] = None,
+                   grayscale: bool = False) -> int:
+    """
+    把图片文件夹转换为归档文件，时间戳取文件修改时间
+
+    Args:
+        folder: 图片文件夹
+        output: 输出的.bnfa文件
+        camera_id: 写入索引的相机编号
+        size: 输出尺寸 (宽, 高)，缺省取第一张图片的尺寸，尺寸不同的图片会缩放
+        grayscale: 保存为单通道
+
+    Returns:
+        int: 写入的帧数
+    """
+    folder = Path(folder)
+    files = []
+    for ext in ('*.bmp', '*.jpg', '*.jpeg', '*.png'):
+        files.extend(p for p in folder.glob(ext) if p.is_file())
+    files.sort(key=lambda p: (p.stat().st_mtime, p.name))
+    if not files:
+        raise FileNotFoundError(f'{folder} 中没有图片')
+
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    writer = None
+    count = 0
+    try:
+        for path in files:
+            image = cv2.imread(str(path), flag)
+            if image is None:
+                logger.warning(f'无法读取 {path}，跳过')
+                continue
+            if writer is None:
+                width, height = size or (image.shape[1], image.shape[0])
+                writer = FrameArchiveWriter(output, width, height, 1 if grayscale else 3)
+            if (image.shape[1], image.shape[0]) != (writer.width, writer.height):
+                image = cv2.resize(image, (writer.width, writer.height), interpolation=cv2.INTER_AREA)
+            writer.append(image, timestamp=path.stat().st_mtime, camera_id=camera_id)
+            count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+class ArchiveReplayCamera:
+    """
+    从归档文件回放帧的测试相机，接口与ImageFolderCamera一致
+
+    capture()返回memmap中的只读视图，不解码也不复制。realtime为True时按录制的
+    时间戳间隔出帧，否则尽快出帧（用于超实时的长时间压力测试）。
+    """
+
+    def __init__(self, camera_ip: str, archive_path, camera_id: int = 0,
+                 realtime: bool = False, loop: bool = True):
+        """
+        Args:
+            camera_ip: 相机IP（用于日志）
+            archive_path: 归档文件路径
+            camera_id: 只回放该相机编号的帧，0表示全部帧
+            realtime: 按录制时间间隔出帧
+            loop: 回放到末尾后从头开始
+        """
+        self.camera_ip = camera_ip
+        self.archive_path = archive_path
+        self.camera_id = camera_id
+        self.realtime = realtime
+        self.loop = loop
+        self.connected = False
+        self.archive = None
+        self.last_frame_info = {}
+        self._indices = None
+        self._position = 0
+        self._replay_start = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> bool:
+        try:
+            self.archive = FrameArchive(self.archive_path)
+        except (OSError, ValueError) as e:
+            logger.error(f'ArchiveReplayCamera {self.camera_ip}: 打开归档失败: {e}')
+            return False
+
+        self._indices = self.archive.indices_for_camera(self.camera_id)
+        if len(self._indices) == 0:
+            # 归档中没有本相机的帧时回放全部帧
+            self._indices = self.archive.indices_for_camera(0)
+        if len(self._indices) == 0:
+            logger.error(f'ArchiveReplayCamera {self.camera_ip}: 归档 {self.archive_path} 为空')
+            return False
+
+        self._position = 0
+        self._replay_start = None
+        self.connected = True
+        logger.info(f'ArchiveReplayCamera {self.camera_ip}: 回放 {len(self._indices)} 帧 '
+                    f'{self.archive.width}x{self.archive.height} from {self.archive_path}')
+        return True
+
+    def disconnect(self):
+        self.connected = False
+        self.archive = None
+        logger.info(f'ArchiveReplayCamera {self.camera_ip} disconnected')
+
+    def capture(self) -> Optional[np.ndarray]:
+        if not self.connected:
+            logger.error(f'ArchiveReplayCamera {self.camera_ip} not connected')
+            return None
+
+        with self._lock:
+            if self._position >= len(self._indices):
+                if not self.loop:
+                    return None
+                self._position = 0
+                self._replay_start = None
+            i = int(self._indices[self._position])
+            self._position += 1
+
+        timestamp = float(self.archive.timestamps[i])
+        if self.realtime:
+            # 第一帧作为时间原点，之后按录制的时间差等待
+            now = time.monotonic()
+            if self._replay_start is None:
+                self._replay_start = (now, timestamp)
+            start_mono, start_ts = self._replay_start
+            delay = (timestamp - start_ts) - (now - start_mono)
+            if delay > 0:
+                time.sleep(delay)
+
+        self.last_frame_info = {
+            'frame_num': i,
+            'timestamp': timestamp,
+            'camera_id': int(self.archive.camera_ids[i]),
+        }
+        return self.archive.frame(i)
+
+
+def detect_archive(archive: FrameArchive, detector, batch: int = 16, camera_id: int = 0,
+                   cache=None, cache_version: str = ''):
+    """
+    用检测器重新检测归档中的帧（离线复评），按批调用 detect_batch
+
+    Args:
+        archive: 已打开的彩色归档
+        detector: VisionDetector
+        batch: 每批帧数
+        camera_id: 只检测该相机的帧，0表示全部帧
+        cache: ResultCache，命中的帧不再检测，None表示不缓存
+        cache_version: 检测配置版本（result_cache.detector_version），作为缓存键的一部分
+
+    Yields:
+        (帧序号, DetectionResult)
+    """
+    if archive.channels != 3:
+        raise ValueError('只能检测彩色(BGR)归档')
+    indices = archive.indices_for_camera(camera_id)
+    context = f'{cache_version}|batch'
+    for start in range(0, len(indices), batch):
+        chunk = indices[start:start + batch]
+        cached = {}
+        keys = {}
+        if cache is not None:
+            for i in chunk:
+                keys[i] = cache.frame_key(archive.frames[i], context)
+                result = cache.get(keys[i])
+                if result is not None:
+                    cached[i] = result
+            pending = [i for i in chunk if i not in cached]
+        else:
+            pending = chunk
+
+        if len(pending) == 0:
+            results = []
+        elif pending[-1] - pending[0] == len(pending) - 1:
+            # 连续帧直接取memmap切片，整批一次灰度化
+            results = detector.detect_batch(archive.frames[pending[0]:pending[-1] + 1])
+        else:
+            results = detector.detect_batch([archive.frames[i] for i in pending])
+        for i, result in zip(pending, results):
+            if cache is not None:
+                cache.put(keys[i], result)
+            cached[i] = result
+        for i in chunk:
+            yield int(i), cached[i]
+
+
+def print_stage_timing(stage_stats):
+    """打印各阶段耗时统计和直方图（每格为落在该耗时区间的帧数）"""
+    from stage_timer import HISTOGRAM_EDGES_MS
+
+    labels = [f'<{edge:g}' for edge in HISTOGRAM_EDGES_MS] + [f'>{HISTOGRAM_EDGES_MS[-1]:g}']
+    print(f'分阶段耗时（{stage_stats.frames} 帧，毫秒）:')
+    print(f'{"阶段":<16}{"均值":>8}{"p50":>8}{"p95":>8}{"最大":>8}  ' + ' '.join(f'{l:>5}' for l in labels))
+    for stage, s in stage_stats.summary().items():
+        counts = stage_stats.histogram(stage)
+        print(f'{stage:<16}{s["mean"]:>8.2f}{s["p50"]:>8.2f}{s["p95"]:>8.2f}{s["max"]:>8.2f}  '
+              + ' '.join(f'{c:>5}' for c in counts))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='原始帧归档工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help='把图片文件夹转换为归档文件')
+    convert.add_argument('folder', help='图片文件夹，如 test_img')
+    convert.add_argument('output', help='输出文件，如 replay.bnfa')
+    convert.add_argument('--camera-id', type=int, default=0, help='写入索引的相机编号')
+    convert.add_argument('--size', help='输出尺寸，如 1280x1024，缺省取第一张图片尺寸')
+    convert.add_argument('--gray', action='store_true', help='保存为单通道')
+
+    info = sub.add_parser('info', help='查看归档文件信息')
+    info.add_argument('archive')
+
+    detect = sub.add_parser('detect', help='用传统CV检测器重新检测归档中的帧')
+    detect.add_argument('archive')
+    detect.add_argument('--batch', type=int, default=16, help='每批帧数')
+    detect.add_argument('--camera-id', type=int, default=0, help='只检测该相机的帧，0为全部')
+    detect.add_argument('--csv', help='把每帧结果写入CSV文件')
+    detect.add_argument('--cache', help='结果缓存文件（SQLite），检测配置和帧都未变的帧直接取缓存结果')
+    detect.add_argument('--timing', action='store_true',
+                        help='分阶段计时并打印各阶段耗时分布（--batch 1 时为逐帧耗时）')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'convert':
+        size = tuple(int(v) for v in args.size.lower().split('x')) if args.size else None
+        start = time.perf_counter()
+        count = convert_folder(args.folder, args.output, args.camera_id, size, args.gray)
+        print(f'已写入 {count} 帧到 {args.output} '
+              f'({os.path.getsize(args.output) / 1024 / 1024:.1f}MB, {time.perf_counter() - start:.1f}s)')
+    elif args.command == 'detect':
+        import csv
+        from config import CAMERA_CONFIGS, DETECTOR_CONFIG, MODEL_CONFIG
+        from detector_factory import create_detector
+
+        logging.getLogger('vision_detector').setLevel(logging.WARNING)
+        logging.getLogger('onnx_obb_detector').setLevel(logging.WARNING)
+        archive = FrameArchive(args.archive)
+        # 标定比例取对应相机的配置，不区分相机时取第一台
+        camera_config = next((c for c in CAMERA_CONFIGS if c.get('id') == args.camera_id),
+                             CAMERA_CONFIGS[0] if CAMERA_CONFIGS else {})
+        pixel_to_mm = camera_config.get('pixel_to_mm', 0.1)
+        detector_config = dict(DETECTOR_CONFIG, stage_timing=True) if args.timing else DETECTOR_CONFIG
+        detector = create_detector(pixel_to_mm, detector_config, MODEL_CONFIG)
+        stage_stats = None
+        if args.timing:
+            from stage_timer import StageHistogram
+            stage_stats = StageHistogram(window=len(archive) or 1)
+        cache = None
+        cache_version = ''
+        if args.cache:
+            from result_cache import ResultCache, detector_version
+            # 归档按顺序只读一遍，内存层只需容纳一批
+            cache = ResultCache(max_entries=args.batch, path=args.cache)
+            cache_version = detector_version(pixel_to_mm, detector_config, MODEL_CONFIG)
+        rows = []
+        start = time.perf_counter()
+        for i, r in detect_archive(archive, detector, args.batch, args.camera_id, cache, cache_version):
+            if stage_stats is not None and r.timings is not None:
+                stage_stats.add(r.timings)
+            rows.append((i, int(archive.camera_ids[i]), r.classification, r.x_offset, r.y_offset,
+                         r.r_angle, r.length, r.height, r.head_direction, r.confidence))
+        elapsed = time.perf_counter() - start
+        detected = sum(1 for row in rows if row[2] == 2)
+        print(f'检测 {len(rows)} 帧，检出 {detected} 帧，'
+              f'{elapsed:.1f}s ({len(rows) / elapsed if elapsed > 0 else 0:.1f} 帧/秒)')
+        if cache is not None:
+            stats = cache.stats()
+            print(f'结果缓存: 命中 {stats["hits"]} 帧，重新检测 {stats["misses"]} 帧')
+            cache.close()
+        if stage_stats is not None:
+            print_stage_timing(stage_stats)
+        if args.csv:
+            with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame', 'camera_id', 'classification', 'x_offset', 'y_offset',
+                                 'r_angle', 'length', 'height', 'head_direction', 'confidence'])
+                writer.writerows(rows)
+    else:
+        archive = FrameArchive(args.archive)
+        print(f'帧数: {len(archive)}  尺寸: {archive.width}x{archive.height}x{archive.channels}')
+        if len(archive):
+            cameras, counts = np.unique(archive.camera_ids, return_counts=True)
+            print('相机: ' + ', '.join(f'{c}:{n}帧' for c, n in zip(cameras, counts)))
+            span = archive.timestamps.max() - archive.timestamps.min()
+            print(f'时间跨度: {span:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,276 @@
+"""
+共享内存帧环形缓冲区
+SharedFrameRing: 基于 multiprocessing.shared_memory 的固定槽位帧缓冲，
+采集、检测、界面可以分属不同进程，进程之间只传递槽位序号（通过Queue/Pipe），
+图像数据不经过pickle，也不复制。
+
+内存布局:
+    [环头 64字节] [槽位头 × N（每个64字节）] [槽位数据 × N（每个slot_bytes，按4096对齐）]
+
+槽位状态: FREE → WRITING（写入方占用）→ READY（可读）→ READING（读取方占用）→ FREE
+
+用法:
+    # 主进程
+    ring = SharedFrameRing.create('betel_frames', slots=16, max_frame_bytes=2448 * 2048 * 3)
+    slot = ring.write(image, camera_id=1)
+    queue.put(slot)
+
+    # 检测进程
+    ring = SharedFrameRing.attach('betel_frames')
+    slot = queue.get()
+    header, frame = ring.read(slot)   # frame是共享内存上的视图
+    ...
+    ring.release(slot)
+"""
+
+import sys
+import time
+import logging
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('BetelNutVision.frame_ring')
+
+MAGIC = 0x474E5246  # 'FRNG'
+SLOT_FREE = 0
+SLOT_WRITING = 1
+SLOT_READY = 2
+SLOT_READING = 3
+
+_ALIGN = 4096
+
+RING_HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('slots', '<u4'),
+    ('slot_bytes', '<u8'),
+    ('next_seq', '<u8'),
+    ('cursor', '<u4'),
+    ('dropped', '<u4'),
+], align=True)
+
+SLOT_HEADER_DTYPE = np.dtype([
+    ('state', '<u4'),
+    ('camera_id', '<u4'),
+    ('seq', '<u8'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('nbytes', '<u4'),
+    ('timestamp', '<f8'),
+], align=True)
+
+_RING_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 64
+
+
+def _data_offset(slots: int) -> int:
+    offset = _RING_HEADER_SIZE + slots * _SLOT_HEADER_SIZE
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class SharedFrameRing:
+    """
+    共享内存帧环
+
+    多个写入方（多个采集进程写同一个环）时，创建和附加都要传入同一个
+    multiprocessing.Lock，用于分配槽位；单写入方可以不传。
+    读取方按写入方传来的槽位序号读取，读完必须release，否则槽位一直被占用。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool, lock=None):
+        self._shm = shm
+        self._owner = owner
+        self._lock = lock
+
+        self._header = np.ndarray((1,), dtype=RING_HEADER_DTYPE, buffer=shm.buf, offset=0)
+        if int(self._header['magic'][0]) != MAGIC:
+            raise ValueError(f'共享内存 {shm.name} 不是帧环')
+        self.slots = int(self._header['slots'][0])
+        self.slot_bytes = int(self._header['slot_bytes'][0])
+        self._slot_headers = np.ndarray((self.slots,), dtype=SLOT_HEADER_DTYPE, buffer=shm.buf,
+                                        offset=_RING_HEADER_SIZE)
+        self._data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8, buffer=shm.buf,
+                                offset=_data_offset(self.slots))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def create(cls, name: Optional[str], slots: int, max_frame_bytes: int, lock=None) -> 'SharedFrameRing':
+        """
+        创建帧环
+
+        Args:
+            name: 共享内存名称，None时由系统生成（通过ring.name传给其他进程）
+            slots: 槽位数
+            max_frame_bytes: 单帧最大字节数（H*W*C）
+            lock: 多写入方时共用的multiprocessing.Lock
+        """
+        slot_bytes = (int(max_frame_bytes) + _ALIGN - 1) // _ALIGN * _ALIGN
+        size = _data_offset(slots) + slots * slot_bytes
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((1,), dtype=RING_HEADER_DTYPE, buffer=shm.buf, offset=0)
+        header[0] = (MAGIC, slots, slot_bytes, 1, 0, 0)
+        slot_headers = np.ndarray((slots,), dtype=SLOT_HEADER_DTYPE, buffer=shm.buf,
+                                  offset=_RING_HEADER_SIZE)
+        slot_headers[:] = 0
+        del header, slot_headers
+
+        logger.info(f'帧环 {shm.name}: {slots} 个槽位 × {slot_bytes / 1024 / 1024:.1f}MB')
+        return cls(shm, owner=True, lock=lock)
+
+    @classmethod
+    def attach(cls, name: str, lock=None) -> 'SharedFrameRing':
+        """在其他进程中按名称附加到已创建的帧环"""
+        # 附加方由创建方通过multiprocessing启动时共用同一个resource_tracker，
+        # 不会在附加方退出时删除共享内存；3.13起可直接关闭跟踪
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, create=False, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name, create=False)
+        return cls(shm, owner=False, lock=lock)
+
+    # ------------------------------------------------------------ 写入
+
+    def reserve(self, shape: Tuple[int, ...], camera_id: int) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        占用一个空闲槽位，返回可直接写入的视图（采集代码可以把帧直接解码/拷贝到这里）
+
+        Args:
+            shape: 帧形状 (H, W) 或 (H, W, C)，uint8
+            camera_id: 相机编号
+
+        Returns:
+            (槽位序号, 视图)，没有空闲槽位时返回None（计入dropped）
+        """
+        height, width = int(shape[0]), int(shape[1])
+        channels = int(shape[2]) if len(shape) > 2 else 1
+        nbytes = height * width * channels
+        if nbytes > self.slot_bytes:
+            raise ValueError(f'帧大小 {nbytes} 超过槽位大小 {self.slot_bytes}')
+
+        if self._lock is not None:
+            self._lock.acquire()
+        try:
+            header = self._header[0]
+            states = self._slot_headers['state']
+            cursor = int(header['cursor'])
+            # 从游标开始找第一个空闲槽位，按写入顺序循环使用
+            order = (np.arange(self.slots) + cursor) % self.slots
+            free = order[states[order] == SLOT_FREE]
+            if len(free) == 0:
+                self._header['dropped'] += 1
+                return None
+            slot = int(free[0])
+            self._slot_headers['state'][slot] = SLOT_WRITING
+            self._header['cursor'] = (slot + 1) % self.slots
+            seq = int(header['next_seq'])
+            self._header['next_seq'] = seq + 1
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+
+        slot_header = self._slot_headers[slot:slot + 1]
+        slot_header['camera_id'] = camera_id
+        slot_header['seq'] = seq
+        slot_header['height'] = height
+        slot_header['width'] = width
+        slot_header['channels'] = channels
+        slot_header['nbytes'] = nbytes
+        return slot, self._view(slot, height, width, channels)
+
+    def commit(self, slot: int, timestamp: Optional[float] = None):
+        """写入完成，槽位对读取方可见"""
+        self._slot_headers['timestamp'][slot] = time.time() if timestamp is None else timestamp
+        self._slot_headers['state'][slot] = SLOT_READY
+
+    def write(self, image: np.ndarray, camera_id: int, timestamp: Optional[float] = None) -> Optional[int]:
+        """
+        拷贝一帧到空闲槽位
+
+        Returns:
+            槽位序号，没有空闲槽位时返回None
+        """
+        if image.dtype != np.uint8:
+            raise ValueError(f'只支持uint8图像，收到 {image.dtype}')
+        reserved = self.reserve(image.shape, camera_id)
+        if reserved is None:
+            return None
+        slot, view = reserved
+        view[...] = image
+        self.commit(slot, timestamp)
+        return slot
+
+    # ------------------------------------------------------------ 读取
+
+    def read(self, slot: int) -> Optional[Tuple[dict, np.ndarray]]:
+        """
+        读取槽位（零拷贝），用完必须release
+
+        Returns:
+            (槽位头字典, 图像视图)，槽位未就绪时返回None
+        """
+        states = self._slot_headers['state']
+        if states[slot] != SLOT_READY:
+            return None
+        states[slot] = SLOT_READING
+        return self.header(slot), self._view(slot)
+
+    def header(self, slot: int) -> dict:
+        h = self._slot_headers[slot]
+        return {
+            'slot': slot,
+            'state': int(h['state']),
+            'camera_id': int(h['camera_id']),
+            'seq': int(h['seq']),
+            'height': int(h['height']),
+            'width': int(h['width']),
+            'channels': int(h['channels']),
+            'timestamp': float(h['timestamp']),
+        }
+
+    def release(self, slot: int):
+        """归还槽位"""
+        self._slot_headers['state'][slot] = SLOT_FREE
+
+    def _view(self, slot: int, height: int = None, width: int = None, channels: int = None) -> np.ndarray:
+        if height is None:
+            h = self._slot_headers[slot]
+            height, width, channels = int(h['height']), int(h['width']), int(h['channels'])
+        data = self._data[slot, :height * width * channels]
+        if channels == 1:
+            return data.reshape(height, width)
+        return data.reshape(height, width, channels)
+
+    # ------------------------------------------------------------ 统计 / 关闭
+
+    def stats(self) -> dict:
+        states = self._slot_headers['state']
+        return {
+            'slots': self.slots,
+            'free': int(np.count_nonzero(states == SLOT_FREE)),
+            'ready': int(np.count_nonzero(states == SLOT_READY)),
+            'in_use': int(np.count_nonzero((states == SLOT_WRITING) | (states == SLOT_READING))),
+            'written': int(self._header['next_seq'][0]) - 1,
+            'dropped': int(self._header['dropped'][0]),
+        }
+
+    def close(self):
+        """断开映射；创建方同时删除共享内存。调用前应丢弃所有read()得到的视图"""
+        self._header = self._slot_headers = self._data = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -13,6 +13,8 @@ import random
 from ctypes import *
 from typing import Optional
 
+from camera_profile import profile_params, profile_hash, snapshot_path
+
 # 尝试导入海康SDK
 try:
     from MvImport.MvCameraControl_class import *
@@ -25,6 +27,13 @@ except (ImportError, NameError, OSError) as e:
 # 获取logger（确保已经过setup_logger配置）
 logger = logging.getLogger('BetelNutVision.hikvision_camera')
 
+# 异常回调函数类型 void(*cbException)(unsigned int nMsgType, void* pUser)
+# Windows下SDK使用stdcall约定
+try:
+    EXCEPTION_CALLBACK_TYPE = WINFUNCTYPE(None, c_uint, c_void_p)
+except NameError:
+    EXCEPTION_CALLBACK_TYPE = CFUNCTYPE(None, c_uint, c_void_p)
+
 
 class HikvisionCamera:
     """
@@ -37,21 +46,59 @@ class HikvisionCamera:
     4. 断开连接: camera.disconnect()
     """
     
-    def __init__(self, camera_ip: str):
+    def __init__(self, camera_ip: str, camera_params: Optional[dict] = None,
+                 stagger_index: int = 0):
         """
         初始化相机
         
         Args:
             camera_ip: 相机IP地址
+            camera_params: 相机参数（config.json中的camera_params，可被单相机配置覆盖）
+            stagger_index: 相机序号（从0开始），用于错开各相机的包间延时
         """
         self.camera_ip = camera_ip
+        self.stagger_index = stagger_index
         self.cam = None
         self.connected = False
         self.device_info = None
+        self._set_params(camera_params or {})
+        
+        # 当前相机上已生效的参数快照哈希，参数未变时不重复写入
+        self.applied_profile_hash = None
+        
+        self.timestamp_tick_hz = None   # 相机时间戳频率（GevTimestampTickFrequency）
+        self.last_frame_info = None     # 最近一帧的帧号/时间戳等信息
+        # 实际生效的ROI（连接后由相机回读），坐标单位为合并/抽样后的像素
+        self.roi = None
+        
+        # 网络统计：逐帧累计的丢包数，以及计算带宽用的上次采样
+        self.lost_packet_total = 0
+        self.incomplete_frames = 0
+        self._last_stats_sample = None
+        
+        # 掉线检测：SDK异常回调置位device_lost；io_lock保证取图与重连互斥
+        self.device_lost = False
+        self._exception_callback = None
+        self._io_lock = threading.Lock()
         
         if HIKVISION_SDK_AVAILABLE:
             self.cam = MvCamera()
         
+    def _set_params(self, camera_params: dict):
+        """解析相机参数中与采集流程相关的设置"""
+        self.camera_params = camera_params
+        
+        # 触发源: "software"=软触发, "line0"~"line3"=硬件IO触发（PLC/光电开关脉冲）
+        self.trigger_source = str(camera_params.get('trigger_source', 'software')).lower()
+        self.hardware_trigger = self.trigger_source != 'software'
+        self.timeout_ms = int(camera_params.get('timeout', 2000))
+        # 硬触发时，帧时间戳早于"PLC触发时刻 - 匹配窗口"的帧视为过期帧丢弃
+        self.match_window_ms = float(camera_params.get('trigger_match_window_ms', 500))
+        # 连续采集（free-run）模式：相机持续出图，SDK只保留最新一帧，
+        # 触发时直接取最新帧，早于触发时刻超过max_frame_age_ms的帧视为过旧
+        self.free_run = bool(camera_params.get('free_run', False))
+        self.max_frame_age_ms = float(camera_params.get('max_frame_age_ms', 100))
+    
     def connect(self) -> bool:
         """
         连接相机
@@ -133,6 +180,13 @@ class HikvisionCamera:
                 self.cam.MV_CC_DestroyHandle()
                 return False
             
+            # 注册异常回调，相机掉线时由SDK通知
+            self.device_lost = False
+            self._exception_callback = EXCEPTION_CALLBACK_TYPE(self._on_exception)
+            ret = self.cam.MV_CC_RegisterExceptionCallBack(self._exception_callback, None)
+            if ret != 0:
+                logger.warning(f'注册异常回调失败 ret[0x{ret:x}]，仅依靠轮询检测掉线')
+            
             # 5. 设置网络最佳包大小
             logger.debug("设置网络参数...")
             if stDeviceList.nTLayerType == MV_GIGE_DEVICE:
@@ -141,31 +195,33 @@ class HikvisionCamera:
                     ret = self.cam.MV_CC_SetIntValue("GevSCPSPacketSize", nPacketSize)
                     if ret != 0:
                         logger.warning(f'设置包大小失败 ret[0x{ret:x}]')
+                self._apply_transport_params()
             
-            # 6. 设置触发模式为软触发
-            logger.debug("设置触发模式...")
-            ret = self.cam.MV_CC_SetEnumValue("TriggerMode", MV_TRIGGER_MODE_ON)
-            if ret != 0:
-                logger.error(f'设置触发模式失败 ret[0x{ret:x}]')
-                self.disconnect()
+            # 6. 相机特征参数（曝光/增益/ROI/触发等，必须在开始取流前设置）
+            self.applied_profile_hash = None
+            if not self._apply_features():
+                self._close_device()
                 return False
+            self._configure_grab_strategy()
             
-            ret = self.cam.MV_CC_SetEnumValue("TriggerSource", MV_TRIGGER_SOURCE_SOFTWARE)
-            if ret != 0:
-                logger.error(f'设置触发源失败 ret[0x{ret:x}]')
-                self.disconnect()
-                return False
+            # 读取时间戳频率，用于把设备时间戳换算为秒（部分型号不支持）
+            stTick = MVCC_INTVALUE()
+            memset(byref(stTick), 0, sizeof(MVCC_INTVALUE))
+            ret = self.cam.MV_CC_GetIntValue("GevTimestampTickFrequency", stTick)
+            if ret == 0 and stTick.nCurValue > 0:
+                self.timestamp_tick_hz = int(stTick.nCurValue)
             
             # 7. 开始取流
             logger.debug("开始取流...")
             ret = self.cam.MV_CC_StartGrabbing()
             if ret != 0:
                 logger.error(f'开始取流失败 ret[0x{ret:x}]')
-                self.disconnect()
+                self._close_device()
                 return False
             
             self.connected = True
-            logger.info(f'✓ 相机 {self.camera_ip} 连接成功')
+            mode = 'free-run' if self.free_run else self.trigger_source
+            logger.info(f'✓ 相机 {self.camera_ip} 连接成功 (采集模式: {mode})')
             return True
             
         except Exception as e:
@@ -186,10 +242,411 @@ class HikvisionCamera:
         except Exception as e:
             logger.error(f'Disconnect camera {self.camera_ip} exception: {e}')
     
-    def capture(self) -> Optional[np.ndarray]:
+    def _apply_features(self) -> bool:
+        """
+        写入相机特征参数。
+        
+        参数快照（按参数哈希命名的.mfs特征文件）已存在时，用一次MV_CC_FeatureLoad
+        整体导入；否则逐项设置后用MV_CC_FeatureSave保存快照，供下次连接使用。
+        
+        Returns:
+            bool: 设置成功返回True
+        """
+        params_hash = profile_hash(profile_params(self.camera_params, self.stagger_index))
+        path = snapshot_path(self.camera_params, self.camera_ip, params_hash)
+        
+        loaded = False
+        if path.exists():
+            start = time.perf_counter()
+            ret = self.cam.MV_CC_FeatureLoad(str(path))
+            if ret == 0:
+                loaded = True
+                logger.info(f'Camera {self.camera_ip}: 已导入参数快照 {path.name} '
+                            f'({(time.perf_counter() - start) * 1000:.0f}ms)')
+            else:
+                logger.warning(f'导入参数快照 {path.name} 失败 ret[0x{ret:x}]，改为逐项设置')
+        
+        if not loaded:
+            logger.debug("设置图像参数...")
+            self._apply_image_params()
+            if not self._configure_trigger():
+                return False
+            self._apply_packet_delay()
+            
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                ret = self.cam.MV_CC_FeatureSave(str(path))
+                if ret != 0:
+                    logger.warning(f'保存参数快照失败 ret[0x{ret:x}]')
+                else:
+                    logger.info(f'Camera {self.camera_ip}: 参数快照已保存 {path.name}')
+            except OSError as e:
+                logger.warning(f'创建快照目录失败: {e}')
+        
+        self._read_back_roi()
+        self.applied_profile_hash = params_hash
+        return True
+    
+    def apply_profile(self, camera_params: dict) -> bool:
+        """
+        运行中切换相机参数（配方切换）。参数哈希与当前一致时直接返回。
+        
+        需要停止取流才能修改ROI等节点，期间取图会立即返回None。
+        新参数写入失败时恢复原参数和快照；恢复失败或重新取流失败时标记掉线，由看门狗重连。
+        
+        Args:
+            camera_params: 新的完整相机参数
+        
+        Returns:
+            bool: 成功返回True
+        """
+        if not self.connected or not HIKVISION_SDK_AVAILABLE:
+            return False
+        
+        params_hash = profile_hash(profile_params(camera_params, self.stagger_index))
+        with self._io_lock:
+            if params_hash == self.applied_profile_hash:
+                logger.info(f'Camera {self.camera_ip}: 参数未变化 ({params_hash})，跳过')
+                self._set_params(camera_params)
+                return True
+            
+            previous_params = self.camera_params
+            self.cam.MV_CC_StopGrabbing()
+            self._set_params(camera_params)
+            ok = self._apply_features()
+            if not ok:
+                logger.error(f'Camera {self.camera_ip}: 新参数写入失败，恢复原参数')
+                self._set_params(previous_params)
+                if not self._apply_features():
+                    logger.error(f'Camera {self.camera_ip}: 恢复原参数失败，标记掉线等待看门狗重连')
+                    self.device_lost = True
+                    return False
+            self._configure_grab_strategy()
+            ret = self.cam.MV_CC_StartGrabbing()
+            if ret != 0:
+                logger.error(f'重新开始取流失败 ret[0x{ret:x}]，标记掉线等待看门狗重连')
+                self.device_lost = True
+                return False
+            return ok
+    
+    def _configure_trigger(self) -> bool:
+        """
+        设置触发模式
+        
+        - free_run: 关闭触发，相机按free_run_fps连续出图
+        - 否则打开触发，触发源为软触发或LineN硬触发
+        
+        Returns:
+            bool: 设置成功返回True
+        """
+        if self.free_run:
+            logger.debug("设置连续采集模式...")
+            ret = self.cam.MV_CC_SetEnumValue("TriggerMode", MV_TRIGGER_MODE_OFF)
+            if ret != 0:
+                logger.error(f'关闭触发模式失败 ret[0x{ret:x}]')
+                return False
+            
+            fps = self.camera_params.get('free_run_fps')
+            if fps:
+                self.cam.MV_CC_SetBoolValue("AcquisitionFrameRateEnable", True)
+                ret = self.cam.MV_CC_SetFloatValue("AcquisitionFrameRate", float(fps))
+                if ret != 0:
+                    logger.warning(f'设置采集帧率 {fps} 失败 ret[0x{ret:x}]')
+            return True
+        
+        logger.debug(f"设置触发模式: {self.trigger_source}")
+        ret = self.cam.MV_CC_SetEnumValue("TriggerMode", MV_TRIGGER_MODE_ON)
+        if ret != 0:
+            logger.error(f'设置触发模式失败 ret[0x{ret:x}]')
+            return False
+        
+        trigger_sources = {
+            'software': MV_TRIGGER_SOURCE_SOFTWARE,
+            'line0': MV_TRIGGER_SOURCE_LINE0,
+            'line1': MV_TRIGGER_SOURCE_LINE1,
+            'line2': MV_TRIGGER_SOURCE_LINE2,
+            'line3': MV_TRIGGER_SOURCE_LINE3,
+        }
+        if self.trigger_source not in trigger_sources:
+            logger.error(f'不支持的触发源: {self.trigger_source}，可选: {", ".join(trigger_sources)}')
+            return False
+        
+        ret = self.cam.MV_CC_SetEnumValue("TriggerSource", trigger_sources[self.trigger_source])
+        if ret != 0:
+            logger.error(f'设置触发源失败 ret[0x{ret:x}]')
+            return False
+        
+        if self.hardware_trigger:
+            activation = self.camera_params.get('trigger_activation', 'RisingEdge')
+            ret = self.cam.MV_CC_SetEnumValueByString("TriggerActivation", activation)
+            if ret != 0:
+                logger.warning(f'设置触发沿 {activation} 失败 ret[0x{ret:x}]')
+        return True
+    
+    def _configure_grab_strategy(self):
+        """
+        设置SDK取流策略（不属于相机特征参数，不在快照内）
+        
+        连续采集时设为LatestImages且输出队列为1，SDK只保留最新一帧，
+        触发时无需等待触发和曝光；触发模式下逐帧取图。
+        """
+        if self.free_run:
+            ret = self.cam.MV_CC_SetGrabStrategy(MV_GrabStrategy_LatestImages)
+            if ret != 0:
+                logger.warning(f'设置取流策略失败 ret[0x{ret:x}]')
+            ret = self.cam.MV_CC_SetOutputQueueSize(1)
+            if ret != 0:
+                logger.warning(f'设置输出队列大小失败 ret[0x{ret:x}]')
+        else:
+            self.cam.MV_CC_SetGrabStrategy(MV_GrabStrategy_OneByOne)
+    
+    def _apply_transport_params(self):
+        """
+        GigE传输调优：重发策略、GVCP超时（SDK层设置，每次连接都需要）
+        """
+        params = self.camera_params
+        
+        resend = bool(params.get('gige_resend', True))
+        ret = self.cam.MV_GIGE_SetResend(
+            1 if resend else 0,
+            int(params.get('gige_max_resend_percent', 10)),
+            int(params.get('gige_resend_timeout_ms', 50))
+        )
+        if ret != 0:
+            logger.warning(f'设置重发策略失败 ret[0x{ret:x}]')
+        
+        gvcp_timeout = params.get('gige_gvcp_timeout_ms')
+        if gvcp_timeout:
+            ret = self.cam.MV_GIGE_SetGvcpTimeout(int(gvcp_timeout))
+            if ret != 0:
+                logger.warning(f'设置GVCP超时失败 ret[0x{ret:x}]')
+    
+    def _apply_packet_delay(self):
+        """
+        包间延时(GevSCPD)：8台相机共用一块网卡，同时触发时数据包会挤在一起造成丢包；
+        按相机序号递增包间延时，让各相机的数据流错开。
+        """
+        params = self.camera_params
+        packet_delay = (int(params.get('gige_packet_delay', 0))
+                        + self.stagger_index * int(params.get('gige_packet_delay_stagger', 0)))
+        if packet_delay > 0:
+            actual = self._set_int_node("GevSCPD", packet_delay)
+            if actual is not None:
+                logger.info(f'Camera {self.camera_ip}: 包间延时 GevSCPD={actual}')
+    
+    def get_network_stats(self) -> Optional[dict]:
+        """
+        读取网络传输统计（MV_GIGE_GetNetTransInfo）并计算自上次调用以来的带宽。
+        
+        Returns:
+            dict: received_frames / lost_frames / lost_packets / incomplete_frames /
+                  resend_requested / resent_packets / received_bytes / bandwidth_mbps，
+                  失败返回None
+        """
+        if not self.connected or self.device_lost or not HIKVISION_SDK_AVAILABLE:
+            return None
+        
+        if not self._io_lock.acquire(blocking=False):
+            return None
+        
+        try:
+            stInfo = MV_NETTRANS_INFO()
+            memset(byref(stInfo), 0, sizeof(MV_NETTRANS_INFO))
+            ret = self.cam.MV_GIGE_GetNetTransInfo(stInfo)
+            if ret != 0:
+                logger.warning(f'Get net trans info failed. ret[0x{ret:x}]')
+                return None
+            
+            now = time.monotonic()
+            received_bytes = int(stInfo.nReceiveDataSize)
+            bandwidth_mbps = 0.0
+            if self._last_stats_sample is not None:
+                last_time, last_bytes = self._last_stats_sample
+                if now > last_time and received_bytes >= last_bytes:
+                    bandwidth_mbps = (received_bytes - last_bytes) * 8 / (now - last_time) / 1e6
+            self._last_stats_sample = (now, received_bytes)
+            
+            return {
+                'received_frames': int(stInfo.nNetRecvFrameCount),
+                'lost_frames': int(stInfo.nThrowFrameCount),
+                'lost_packets': self.lost_packet_total,
+                'incomplete_frames': self.incomplete_frames,
+                'resend_requested': int(stInfo.nRequestResendPacketCount),
+                'resent_packets': int(stInfo.nResendPacketCount),
+                'received_bytes': received_bytes,
+                'bandwidth_mbps': bandwidth_mbps,
+            }
+        except Exception as e:
+            logger.error(f'Get network stats from {self.camera_ip} exception: {e}')
+            return None
+        finally:
+            self._io_lock.release()
+    
+    def _apply_image_params(self):
+        """
+        按camera_params设置曝光、增益、Binning、Decimation和ROI。
+        
+        ROI越小、合并倍数越大，每帧传输量越少，分割计算也越快。
+        设置顺序：先清零偏移 → 合并/抽样 → 宽高 → 偏移，避免中间状态越界。
+        不支持的节点只记录警告，不影响连接。
+        """
+        params = self.camera_params
+        
+        if params.get('exposure') is not None:
+            self.cam.MV_CC_SetEnumValue("ExposureAuto", 0)
+            ret = self.cam.MV_CC_SetFloatValue("ExposureTime", float(params['exposure']))
+            if ret != 0:
+                logger.warning(f'设置曝光时间失败 ret[0x{ret:x}]')
+        
+        if params.get('gain') is not None:
+            self.cam.MV_CC_SetEnumValue("GainAuto", 0)
+            ret = self.cam.MV_CC_SetFloatValue("Gain", float(params['gain']))
+            if ret != 0:
+                logger.warning(f'设置增益失败 ret[0x{ret:x}]')
+        
+        self._set_int_node("OffsetX", 0)
+        self._set_int_node("OffsetY", 0)
+        
+        binning = int(params.get('binning', 1))
+        decimation = int(params.get('decimation', 1))
+        for key, value in (("BinningHorizontal", binning), ("BinningVertical", binning),
+                           ("DecimationHorizontal", decimation), ("DecimationVertical", decimation)):
+            ret = self.cam.MV_CC_SetEnumValue(key, value)
+            if ret != 0 and value != 1:
+                logger.warning(f'设置{key}={value}失败 ret[0x{ret:x}]')
+        
+        sensor_width = self._get_int_node("WidthMax")
+        sensor_height = self._get_int_node("HeightMax")
+        
+        # 宽高/偏移按合并后的像素计算，0或缺省表示使用全部传感器
+        self._set_int_node("Width", int(params.get('width') or sensor_width or 0))
+        self._set_int_node("Height", int(params.get('height') or sensor_height or 0))
+        self._set_int_node("OffsetX", int(params.get('offset_x', 0)))
+        self._set_int_node("OffsetY", int(params.get('offset_y', 0)))
+    
+    def _read_back_roi(self):
+        """回读实际生效的ROI（逐项设置或导入快照后调用）"""
+        binning = int(self.camera_params.get('binning', 1))
+        decimation = int(self.camera_params.get('decimation', 1))
+        sensor_width = self._get_int_node("WidthMax")
+        sensor_height = self._get_int_node("HeightMax")
+        width = self._get_int_node("Width")
+        height = self._get_int_node("Height")
+        offset_x = self._get_int_node("OffsetX")
+        offset_y = self._get_int_node("OffsetY")
+        
+        if None in (width, height, sensor_width, sensor_height):
+            logger.warning(f'Camera {self.camera_ip}: 无法回读ROI，按整幅图像计算偏移')
+            self.roi = None
+            return
+        
+        self.roi = {
+            'offset_x': offset_x or 0,
+            'offset_y': offset_y or 0,
+            'width': width,
+            'height': height,
+            'sensor_width': sensor_width,
+            'sensor_height': sensor_height,
+            'scale': binning * decimation,
+        }
+        logger.info(
+            f'Camera {self.camera_ip}: ROI=({self.roi["offset_x"]},{self.roi["offset_y"]}) '
+            f'{width}x{height} / 传感器 {sensor_width}x{sensor_height}, '
+            f'binning={binning}, decimation={decimation}'
+        )
+    
+    def _get_int_node(self, key: str) -> Optional[int]:
+        """读取Integer型节点，失败返回None"""
+        stParam = MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
+        ret = self.cam.MV_CC_GetIntValue(key, stParam)
+        if ret != 0:
+            return None
+        return int(stParam.nCurValue)
+    
+    def _set_int_node(self, key: str, value: int) -> Optional[int]:
+        """
+        设置Integer型节点，自动按节点步长对齐并限制在[min, max]内。
+        
+        Returns:
+            int: 实际写入的值，失败返回None
+        """
+        stParam = MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
+        ret = self.cam.MV_CC_GetIntValue(key, stParam)
+        if ret != 0:
+            logger.warning(f'读取{key}失败 ret[0x{ret:x}]')
+            return None
+        
+        inc = max(1, int(stParam.nInc))
+        value = max(int(stParam.nMin), min(int(stParam.nMax), int(value)))
+        value = int(stParam.nMin) + (value - int(stParam.nMin)) // inc * inc
+        
+        ret = self.cam.MV_CC_SetIntValue(key, value)
+        if ret != 0:
+            logger.warning(f'设置{key}={value}失败 ret[0x{ret:x}]')
+            return None
+        return value
+    
+    def _on_exception(self, nMsgType, pUser):
+        """SDK异常回调（在SDK线程中执行，只置标志位）"""
+        if nMsgType == MV_EXCEPTION_DEV_DISCONNECT:
+            self.device_lost = True
+            logger.error(f'Camera {self.camera_ip}: 设备掉线 (异常回调 0x{nMsgType:x})')
+        else:
+            logger.warning(f'Camera {self.camera_ip}: SDK异常 0x{nMsgType:x}')
+    
+    def is_alive(self) -> bool:
+        """
+        检查相机是否在线：异常回调未报告掉线，且MV_CC_IsDeviceConnected为真
+        """
+        if not self.connected or self.device_lost or not HIKVISION_SDK_AVAILABLE:
+            return False
+        try:
+            return bool(self.cam.MV_CC_IsDeviceConnected())
+        except Exception as e:
+            logger.error(f'Check camera {self.camera_ip} connection exception: {e}')
+            return False
+    
+    def reconnect(self) -> bool:
+        """
+        释放旧句柄后重新连接相机（由看门狗在后台线程调用，可能耗时数秒）
+        
+        Returns:
+            bool: 重连成功返回True
+        """
+        if not HIKVISION_SDK_AVAILABLE:
+            return False
+        
+        with self._io_lock:
+            # 掉线后StopGrabbing/CloseDevice可能返回错误，忽略即可
+            try:
+                self.cam.MV_CC_StopGrabbing()
+            except Exception:
+                pass
+            self._close_device()
+            self.connected = False
+            self.device_info = None
+            self.cam = MvCamera()
+            self._last_stats_sample = None
+            return self.connect()
+    
+    def _close_device(self):
+        """连接过程中失败时关闭已打开的设备（此时connected仍为False）"""
+        try:
+            self.cam.MV_CC_CloseDevice()
+            self.cam.MV_CC_DestroyHandle()
+        except Exception as e:
+            logger.error(f'Close camera {self.camera_ip} exception: {e}')
+    
+    def capture(self, trigger_time: Optional[float] = None) -> Optional[np.ndarray]:
         """
         拍照获取图像
         
+        Args:
+            trigger_time: PLC触发时刻（time.time()），仅硬触发模式使用，
+                          用于把相机已采集的帧与本次PLC触发对应起来
+        
         Returns:
             np.ndarray: BGR格式图像，失败返回None
         """
@@ -197,70 +654,294 @@ class HikvisionCamera:
             logger.error(f'Camera {self.camera_ip} not connected')
             return None
         
+        if self.device_lost:
+            logger.error(f'Camera {self.camera_ip} 已掉线，等待重连')
+            return None
+        
+        # 重连进行中时立即返回，不阻塞触发处理
+        if not self._io_lock.acquire(blocking=False):
+            logger.error(f'Camera {self.camera_ip} 正在重连')
+            return None
+        
         try:
+            if self.free_run:
+                return self._capture_latest(trigger_time)
+            if self.hardware_trigger:
+                return self._capture_hardware_triggered(trigger_time)
+            
             # 1. 发送软触发命令
             ret = self.cam.MV_CC_SetCommandValue("TriggerSoftware")
             if ret != 0:
                 logger.error(f'Trigger software failed. ret[0x{ret:x}]')
                 return None
             
-            # 2. 获取payload大小
-            stParam = MVCC_INTVALUE()
-            memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
-            ret = self.cam.MV_CC_GetIntValue("PayloadSize", stParam)
-            if ret != 0:
-                logger.error(f'Get payload size failed. ret[0x{ret:x}]')
+            return self._grab_frame(self.timeout_ms)
+                
+        except Exception as e:
+            logger.error(f'Capture image from {self.camera_ip} exception: {e}')
+            return None
+        finally:
+            self._io_lock.release()
+    
+    def _capture_latest(self, trigger_time: Optional[float]) -> Optional[np.ndarray]:
+        """
+        连续采集模式取帧：取SDK中最新的一帧。
+        
+        帧的主机时间戳早于参考时刻（PLC触发时刻，未知时为当前时刻）超过
+        max_frame_age_ms 时丢弃，等待下一帧。帧龄记录在last_frame_info['age_ms']，
+        用于权衡运动模糊与触发到出图的延时。
+        """
+        reference_ms = (trigger_time if trigger_time is not None else time.time()) * 1000.0
+        
+        deadline = time.monotonic() + self.timeout_ms / 1000.0
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                logger.error(f'Camera {self.camera_ip}: 等待新鲜帧超时')
                 return None
             
-            nDataSize = stParam.nCurValue
-            pData = (c_ubyte * nDataSize)()
-            stFrameInfo = MV_FRAME_OUT_INFO_EX()
-            memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
+            image = self._grab_frame(remaining_ms)
+            if image is None:
+                return None
             
-            # 3. 获取一帧图像
-            ret = self.cam.MV_CC_GetOneFrameTimeout(pData, nDataSize, stFrameInfo, 2000)
-            if ret == 0:
-                logger.info(f'Camera {self.camera_ip}: Get frame Width[{stFrameInfo.nWidth}], Height[{stFrameInfo.nHeight}]')
-                
-                # 4. 转换为numpy数组
-                image = np.asarray(pData)
-                image = image.reshape(stFrameInfo.nHeight, stFrameInfo.nWidth, -1)
-                
-                # 5. 颜色空间转换（根据相机配置调整）
-                # 如果是BayerRG8格式
-                # image = cv2.cvtColor(image, cv2.COLOR_BayerRG2RGB)
-                # 如果是RGB8格式
-                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-                
-                return image
-            else:
-                logger.error(f'Get one frame timeout. ret[0x{ret:x}]')
+            host_ms = self.last_frame_info['host_timestamp_ms']
+            self.last_frame_info['age_ms'] = time.time() * 1000.0 - host_ms
+            if reference_ms - host_ms > self.max_frame_age_ms:
+                logger.debug(
+                    f'Camera {self.camera_ip}: 丢弃过旧帧 #{self.last_frame_info["frame_num"]} '
+                    f'(早于参考时刻 {reference_ms - host_ms:.0f}ms)'
+                )
+                continue
+            return image
+    
+    def _capture_hardware_triggered(self, trigger_time: Optional[float]) -> Optional[np.ndarray]:
+        """
+        硬触发模式取帧：曝光已由IO脉冲触发，这里只从SDK缓存中取出匹配本次触发的帧。
+        主机时间戳早于 trigger_time - match_window 的帧是之前的残留帧，直接丢弃。
+        """
+        earliest_ms = None
+        if trigger_time is not None:
+            earliest_ms = trigger_time * 1000.0 - self.match_window_ms
+        
+        deadline = time.monotonic() + self.timeout_ms / 1000.0
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                logger.error(f'Camera {self.camera_ip}: 等待硬触发帧超时')
                 return None
-                
-        except Exception as e:
-            logger.error(f'Capture image from {self.camera_ip} exception: {e}')
+            
+            image = self._grab_frame(remaining_ms)
+            if image is None:
+                return None
+            
+            host_ms = self.last_frame_info['host_timestamp_ms']
+            if earliest_ms is not None and host_ms < earliest_ms:
+                logger.warning(
+                    f'Camera {self.camera_ip}: 丢弃过期帧 #{self.last_frame_info["frame_num"]} '
+                    f'(早于触发 {trigger_time * 1000.0 - host_ms:.0f}ms)'
+                )
+                continue
+            return image
+    
+    def _grab_frame(self, timeout_ms: int) -> Optional[np.ndarray]:
+        """从SDK取一帧图像并记录帧信息（帧号、设备/主机时间戳）"""
+        # 1. 获取payload大小
+        stParam = MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
+        ret = self.cam.MV_CC_GetIntValue("PayloadSize", stParam)
+        if ret != 0:
+            logger.error(f'Get payload size failed. ret[0x{ret:x}]')
+            return None
+        
+        nDataSize = stParam.nCurValue
+        pData = (c_ubyte * nDataSize)()
+        stFrameInfo = MV_FRAME_OUT_INFO_EX()
+        memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
+        
+        # 2. 获取一帧图像
+        ret = self.cam.MV_CC_GetOneFrameTimeout(pData, nDataSize, stFrameInfo, timeout_ms)
+        if ret != 0:
+            logger.error(f'Get one frame timeout. ret[0x{ret:x}]')
+            return None
+        
+        logger.info(f'Camera {self.camera_ip}: Get frame Width[{stFrameInfo.nWidth}], Height[{stFrameInfo.nHeight}]')
+        
+        if stFrameInfo.nLostPacket > 0:
+            self.lost_packet_total += stFrameInfo.nLostPacket
+            self.incomplete_frames += 1
+            logger.warning(f'Camera {self.camera_ip}: 帧#{stFrameInfo.nFrameNum} 丢包 {stFrameInfo.nLostPacket} 个')
+        
+        device_ticks = (stFrameInfo.nDevTimeStampHigh << 32) | stFrameInfo.nDevTimeStampLow
+        self.last_frame_info = {
+            'frame_num': stFrameInfo.nFrameNum,
+            'trigger_index': stFrameInfo.nTriggerIndex,
+            'device_timestamp': device_ticks,
+            'device_time_s': device_ticks / self.timestamp_tick_hz if self.timestamp_tick_hz else None,
+            'host_timestamp_ms': stFrameInfo.nHostTimeStamp,
+            'lost_packets': stFrameInfo.nLostPacket,
+            'width': stFrameInfo.nWidth,
+            'height': stFrameInfo.nHeight,
+        }
+        
+        # 3. 转换为numpy数组并按像素格式转换为BGR
+        return self._to_bgr(pData, stFrameInfo)
+    
+    @staticmethod
+    def _to_bgr(pData, stFrameInfo) -> np.ndarray:
+        """
+        按帧的像素格式把原始数据转换为BGR图像
+        
+        注意OpenCV的Bayer命名以第二行第二列为准：
+        海康BayerRG8（左上角为R）对应 cv2.COLOR_BayerBG2BGR，其余依此类推。
+        """
+        height, width = stFrameInfo.nHeight, stFrameInfo.nWidth
+        pixel_type = stFrameInfo.enPixelType
+        data = np.frombuffer(pData, dtype=np.uint8)
+        
+        if pixel_type == PixelType_Gvsp_Mono8:
+            return cv2.cvtColor(data[:height * width].reshape(height, width), cv2.COLOR_GRAY2BGR)
+        
+        bayer_codes = {
+            PixelType_Gvsp_BayerRG8: cv2.COLOR_BayerBG2BGR,
+            PixelType_Gvsp_BayerBG8: cv2.COLOR_BayerRG2BGR,
+            PixelType_Gvsp_BayerGB8: cv2.COLOR_BayerGR2BGR,
+            PixelType_Gvsp_BayerGR8: cv2.COLOR_BayerGB2BGR,
+        }
+        if pixel_type in bayer_codes:
+            return cv2.cvtColor(data[:height * width].reshape(height, width), bayer_codes[pixel_type])
+        
+        if pixel_type == PixelType_Gvsp_BGR8_Packed:
+            return data[:height * width * 3].reshape(height, width, 3).copy()
+        
+        # RGB8及其他未列出的格式按RGB处理
+        frame_len = stFrameInfo.nFrameLen or data.size
+        image = data[:frame_len].reshape(height, width, -1)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+
+class DecodedImageCache:
+    """
+    已解码图片的LRU缓存（按字节数限制大小），供多个ImageFolderCamera共享
+    
+    图片测试模式下8台相机都从同一文件夹随机取图，每次cv2.imread解码BMP/PNG的
+    耗时会掩盖检测本身的耗时。缓存的图像设为只读，防止被下游修改后污染缓存。
+    """
+    
+    def __init__(self, max_bytes: int):
+        from collections import OrderedDict
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path: str) -> Optional[np.ndarray]:
+        """取图片，未命中时解码并放入缓存"""
+        with self._lock:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+                self.hits += 1
+                return image
+            self.misses += 1
+        
+        # 解码不持锁，其他相机可并发读取
+        image = cv2.imread(path)
+        if image is None:
             return None
+        image.flags.writeable = False
+        self._put(path, image)
+        return image
+    
+    def _put(self, path: str, image: np.ndarray):
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if path in self._images:
+                return
+            self._images[path] = image
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.nbytes
+    
+    def warm(self, paths, stop_event: Optional[threading.Event] = None):
+        """按顺序预解码图片，缓存已满时停止（继续解码只会挤掉刚放入的图片）"""
+        for path in paths:
+            if stop_event is not None and stop_event.is_set():
+                return
+            with self._lock:
+                if path in self._images:
+                    continue
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            if self._bytes + image.nbytes > self.max_bytes:
+                return
+            image.flags.writeable = False
+            self._put(path, image)
+    
+    def resize(self, max_bytes: int):
+        """调整容量上限，超出的部分按LRU淘汰"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._bytes > self.max_bytes and self._images:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.nbytes
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
 
 
 class ImageFolderCamera:
     """
     从test_img文件夹读取图片的测试相机
     用于在无真实相机时进行测试
+    
+    解码后的图片放在所有实例共享的LRU缓存中，cache_mb为0时每次都从磁盘读取。
     """
     
-    def __init__(self, camera_ip: str, test_img_folder: str = "test_img"):
+    _shared_cache: Optional[DecodedImageCache] = None
+    _shared_cache_lock = threading.Lock()
+    
+    def __init__(self, camera_ip: str, test_img_folder: str = "test_img",
+                 cache_mb: int = 0, warm_cache: bool = False):
         """
         初始化图片测试相机
         
         Args:
             camera_ip: 相机IP（用于区分不同相机）
             test_img_folder: 测试图片文件夹路径
+            cache_mb: 共享解码缓存大小（MB），0表示不缓存
+            warm_cache: connect()时在后台线程预解码图片
         """
         self.camera_ip = camera_ip
         self.test_img_folder = test_img_folder
         self.connected = False
         self.image_files = []
         self.current_index = 0
+        self.warm_cache = warm_cache
+        self.cache = self._get_shared_cache(cache_mb) if cache_mb > 0 else None
+        self._warm_stop = threading.Event()
+    
+    @classmethod
+    def _get_shared_cache(cls, cache_mb: int) -> DecodedImageCache:
+        """获取共享缓存，容量按最后一次配置调整"""
+        max_bytes = int(cache_mb * 1024 * 1024)
+        with cls._shared_cache_lock:
+            if cls._shared_cache is None:
+                cls._shared_cache = DecodedImageCache(max_bytes)
+            elif cls._shared_cache.max_bytes != max_bytes:
+                cls._shared_cache.resize(max_bytes)
+            return cls._shared_cache
         
     def connect(self) -> bool:
         """
@@ -290,10 +971,19 @@ class ImageFolderCamera:
         self.image_files.sort()
         self.connected = True
         logger.info(f'ImageFolderCamera {self.camera_ip}: Loaded {len(self.image_files)} images')
+        
+        if self.cache is not None and self.warm_cache:
+            # 各相机从不同位置开始预热，8个线程并发解码不同的图片
+            offset = random.randrange(len(self.image_files))
+            paths = self.image_files[offset:] + self.image_files[:offset]
+            self._warm_stop.clear()
+            threading.Thread(target=self.cache.warm, args=(paths, self._warm_stop),
+                             name=f'ImageCacheWarm-{self.camera_ip}', daemon=True).start()
         return True
     
     def disconnect(self):
         """断开连接"""
+        self._warm_stop.set()
         self.connected = False
         logger.info(f'ImageFolderCamera {self.camera_ip} disconnected')
     
@@ -309,7 +999,10 @@ class ImageFolderCamera:
         # 随机选择图片
         image_path = random.choice(self.image_files)
         
-        image = cv2.imread(image_path)
+        if self.cache is not None:
+            image = self.cache.get(image_path)
+        else:
+            image = cv2.imread(image_path)
         if image is None:
             logger.error(f'Failed to read image: {image_path}')
             return None
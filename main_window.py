@@ -5,20 +5,23 @@ MainWindow: 显示8个相机的实时状态, 图片和数据
 
 import sys
 import logging
+import threading
 import traceback
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QGridLayout, QLabel, QPushButton, QTextEdit, QGroupBox,
     QLineEdit, QSpinBox, QStatusBar, QDialog, QDialogButtonBox,
-    QFormLayout, QMessageBox
+    QFormLayout, QMessageBox, QComboBox
 )
-from PyQt5.QtCore import Qt, QTimer, pyqtSlot
+from PyQt5.QtCore import Qt, QTimer, QEvent, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QImage, QPixmap
 import numpy as np
 
-from config import CAMERA_CONFIGS, PLC_CONFIG, CAMERA_PARAMS
+from config import CAMERA_CONFIGS, PLC_CONFIG, CAMERA_PARAMS, CAMERA_RECIPES, DETECTOR_CONFIG, MODEL_CONFIG
 from plc_manager import PlcManager
 from camera_worker import CameraWorker
+from detection_engine import DetectionEngine
+from camera_profile import apply_recipe
 from vision_detector import DetectionResult
 
 # 获取日志记录器
@@ -46,6 +49,11 @@ class CameraWidget(QGroupBox):
         self.ip_label.setStyleSheet("color: #666; font-size: 10pt;")
         layout.addWidget(self.ip_label)
         
+        # 网络统计标签（仅海康GigE相机）
+        self.net_label = QLabel("网络: --")
+        self.net_label.setStyleSheet("color: #666; font-size: 9pt;")
+        layout.addWidget(self.net_label)
+        
         # 图像显示区域
         self.image_label = QLabel()
         self.image_label.setFixedSize(320, 180)
@@ -124,6 +132,37 @@ class CameraWidget(QGroupBox):
         except Exception as e:
             print(f"更新图像失败: {e}")
     
+    def update_network_stats(self, stats: dict):
+        """更新网络统计、相机可用率和ROI命中率"""
+        parts = []
+        if 'lost_frames' in stats:
+            parts.append(
+                f"丢帧 {stats['lost_frames']} 丢包 {stats['lost_packets']} "
+                f"重发 {stats['resent_packets']} {stats['bandwidth_mbps']:.1f}Mbps"
+            )
+        if 'availability' in stats:
+            parts.append(f"可用率 {stats['availability'] * 100:.1f}% 掉线 {stats['disconnects']}")
+        if 'roi_hit_rate' in stats:
+            parts.append(f"ROI命中 {stats['roi_hit_rate'] * 100:.0f}% 像素 {stats['roi_pixel_fraction'] * 100:.0f}%")
+        if 'cascade_rate' in stats:
+            parts.append(f"复检 {stats['cascade_rate'] * 100:.1f}% "
+                         f"({stats['cascade_fast_ms']:.0f}/{stats['cascade_heavy_ms']:.0f}ms)")
+        if stats.get('stage_timing'):
+            # 总耗时和平均最慢的阶段（summary 中 total 在前，其余按平均耗时降序）
+            stages = list(stats['stage_timing'].items())
+            total = stats['stage_timing'].get('total')
+            slowest = next(((name, s) for name, s in stages if name != 'total'), None)
+            text = f"耗时 {total['p50']:.1f}ms" if total else "耗时"
+            if slowest:
+                text += f" 最慢 {slowest[0]} {slowest[1]['p50']:.1f}ms"
+            parts.append(text)
+        self.net_label.setText("网络: " + (" | ".join(parts) or "--"))
+        
+        bad = (stats.get('lost_frames') or stats.get('lost_packets')
+               or not stats.get('available', True))
+        color = "red" if bad else "#666"
+        self.net_label.setStyleSheet(f"color: {color}; font-size: 9pt;")
+    
     def update_result(self, result: DetectionResult):
         """更新检测结果"""
         self.data_labels['x'].setText(f"{result.x_offset:.1f}")
@@ -143,6 +182,8 @@ class CameraWidget(QGroupBox):
         """清空数据显示"""
         for label in self.data_labels.values():
             label.setText("--")
+        self.net_label.setText("网络: --")
+        self.net_label.setStyleSheet("color: #666; font-size: 9pt;")
 
 
 class SettingsDialog(QDialog):
@@ -195,6 +236,9 @@ class SettingsDialog(QDialog):
 class MainWindow(QMainWindow):
     """主窗口"""
     
+    # 配方切换完成（配方名称, 成功相机数, 相机总数），由后台线程发出
+    recipe_switched = pyqtSignal(str, int, int)
+    
     def __init__(self):
         super().__init__()
         try:
@@ -207,6 +251,7 @@ class MainWindow(QMainWindow):
             self.plc_manager = PlcManager()
             self.camera_workers = []
             self.camera_widgets = []
+            self.detection_engine = None
             
             logger.info("初始化界面...")
             self.init_ui()
@@ -244,6 +289,23 @@ class MainWindow(QMainWindow):
         self.settings_btn.clicked.connect(self.open_settings)
         button_layout.addWidget(self.settings_btn)
         
+        # 相机参数配方（config.json中的camera_recipes）
+        if CAMERA_RECIPES:
+            self.recipe_combo = QComboBox()
+            self.recipe_combo.addItems(list(CAMERA_RECIPES.keys()))
+            button_layout.addWidget(self.recipe_combo)
+            
+            self.recipe_btn = QPushButton("切换配方")
+            self.recipe_btn.clicked.connect(self.switch_recipe)
+            self.recipe_switched.connect(self.on_recipe_switched)
+            button_layout.addWidget(self.recipe_btn)
+        
+        # 背景模型标定（config.json中detector.background_model为true时）
+        if DETECTOR_CONFIG.get('background_model'):
+            self.background_btn = QPushButton("标定背景")
+            self.background_btn.clicked.connect(self.calibrate_background)
+            button_layout.addWidget(self.background_btn)
+        
         button_layout.addStretch()
         
         self.plc_status_label = QLabel("PLC: 未连接")
@@ -325,6 +387,9 @@ class MainWindow(QMainWindow):
                 logger.error("PLC未连接，无法启动系统")
                 return
             
+            # 配置了检测进程数时启动检测进程池，所有相机共用
+            self._start_detection_engine()
+            
             # 创建并启动8个相机工作线程
             self.add_log(f"开始创建 {len(CAMERA_CONFIGS)} 个相机工作线程...")
             logger.info(f"开始创建 {len(CAMERA_CONFIGS)} 个相机工作线程")
@@ -333,7 +398,7 @@ class MainWindow(QMainWindow):
                 self.add_log(f"创建相机 {i+1} 工作线程: {cam_config.get('name', f'Camera{i+1}')}")
                 logger.info(f"创建相机 {i+1} 工作线程")
                 
-                worker = CameraWorker(cam_config, self.plc_manager)
+                worker = CameraWorker(cam_config, self.plc_manager, engine=self.detection_engine)
                 
                 # 连接信号
                 worker.status_changed.connect(
@@ -345,11 +410,15 @@ class MainWindow(QMainWindow):
                 worker.result_computed.connect(
                     lambda result, idx=i: self.camera_widgets[idx].update_result(result)
                 )
+                worker.stats_updated.connect(
+                    lambda stats, idx=i: self.camera_widgets[idx].update_network_stats(stats)
+                )
                 worker.log_message.connect(self.add_log)
                 worker.error_occurred.connect(
                     lambda msg: self.add_log(f"错误: {msg}")
                 )
                 
+                worker.set_display(self._display_size(i))
                 self.camera_workers.append(worker)
                 worker.start()
                 self.add_log(f"相机 {i+1} 工作线程已启动")
@@ -366,6 +435,26 @@ class MainWindow(QMainWindow):
             logger.error(error_msg)
             logger.error(traceback.format_exc())
     
+    def _start_detection_engine(self):
+        """按 detector.engine_processes 启动检测进程池，0 表示各相机线程自行检测"""
+        processes = int(DETECTOR_CONFIG.get('engine_processes', 0) or 0)
+        if processes <= 0 or self.detection_engine is not None:
+            return
+        try:
+            self.detection_engine = DetectionEngine(
+                processes=min(processes, len(CAMERA_CONFIGS)),
+                slots=int(DETECTOR_CONFIG.get('engine_slots', 0) or 0),
+                max_frame_bytes=int(float(DETECTOR_CONFIG.get('engine_max_frame_mb', 16)) * 1024 * 1024),
+                detector_config=DETECTOR_CONFIG,
+                model_config=MODEL_CONFIG,
+            )
+            self.detection_engine.start()
+            self.add_log(f"检测进程池已启动: {self.detection_engine.processes} 个进程")
+        except Exception as e:
+            self.detection_engine = None
+            self.add_log(f"检测进程池启动失败，改为相机线程内检测: {e}")
+            logger.error(traceback.format_exc())
+    
     def stop_system(self):
         """停止系统 - 停止所有相机工作线程"""
         self.add_log("=== 停止系统 ===")
@@ -376,6 +465,10 @@ class MainWindow(QMainWindow):
         
         self.camera_workers.clear()
         
+        if self.detection_engine is not None:
+            self.detection_engine.shutdown()
+            self.detection_engine = None
+        
         # 清空相机显示
         for widget in self.camera_widgets:
             widget.update_status("离线")
@@ -394,6 +487,51 @@ class MainWindow(QMainWindow):
             self.add_log(f"设置已更新: PLC={settings['plc_ip']}:{settings['plc_port']}")
             # TODO: 应用新设置（需要重启连接）
     
+    def switch_recipe(self):
+        """把选中的配方一次性应用到所有相机"""
+        if not self.camera_workers:
+            self.add_log("系统未启动，无法切换配方")
+            return
+        
+        name = self.recipe_combo.currentText()
+        self.add_log(f"切换配方: {name}")
+        self.recipe_btn.setEnabled(False)
+        # 导入参数快照需要停止取流，耗时数百毫秒，放到后台线程避免界面卡顿
+        threading.Thread(target=self._run_recipe_switch, args=(name, list(self.camera_workers)),
+                         name='RecipeSwitch', daemon=True).start()
+    
+    def _run_recipe_switch(self, name: str, workers: list):
+        """后台线程：并行切换配方，完成后通过信号回到界面线程"""
+        results = {}
+        try:
+            results = apply_recipe(workers, CAMERA_RECIPES[name])
+        except Exception as e:
+            logger.error(f"切换配方 {name} 异常: {e}")
+        finally:
+            self.recipe_switched.emit(name, sum(results.values()), len(workers))
+    
+    @pyqtSlot(str, int, int)
+    def on_recipe_switched(self, name: str, ok: int, total: int):
+        """配方切换完成（界面线程）"""
+        self.recipe_btn.setEnabled(True)
+        self.add_log(f"配方 {name} 切换完成: {ok}/{total} 台相机成功")
+    
+    def calibrate_background(self):
+        """请求所有相机标定背景（各相机线程在空闲时执行，标定前需清空视野）"""
+        if not self.camera_workers:
+            self.add_log("系统未启动，无法标定背景")
+            return
+        reply = QMessageBox.question(
+            self, "标定背景",
+            "标定期间所有相机视野内不能有槟榔。\n确认已清空传送带并开始标定？",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            return
+        for worker in self.camera_workers:
+            worker.request_background_calibration()
+        self.add_log(f"已请求 {len(self.camera_workers)} 台相机标定背景")
+    
     def add_log(self, message: str):
         """添加日志"""
         from datetime import datetime
@@ -408,6 +546,20 @@ class MainWindow(QMainWindow):
         """清空日志"""
         self.log_text.clear()
     
+    def _display_size(self, index: int):
+        """相机显示区域大小，窗口最小化时返回None（工作线程不再绘制显示图）"""
+        if self.isMinimized():
+            return None
+        label = self.camera_widgets[index].image_label
+        return (label.width(), label.height())
+    
+    def changeEvent(self, event):
+        """窗口最小化/还原时通知工作线程停止/恢复绘制显示图"""
+        if event.type() == QEvent.WindowStateChange:
+            for i, worker in enumerate(self.camera_workers):
+                worker.set_display(self._display_size(i))
+        super().changeEvent(event)
+    
     def closeEvent(self, event):
         """窗口关闭事件"""
         if self.camera_workers:
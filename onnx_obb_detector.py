@@ -0,0 +1,361 @@
+"""
+视觉检测算法 - ONNX Runtime OBB版
+加载 train_yolo_obb.py --export onnx 导出的 YOLOv8-OBB 模型，用 onnxruntime 在CPU上推理，
+不依赖 PyTorch / ultralytics（打包的exe中排除了torch）。
+
+流程: letterbox缩放 → 推理 → 旋转框解码 → ProbIoU旋转NMS → 在框内分割轮廓判断尖头朝向
+输出与传统CV版相同的 DetectionResult。
+
+YOLOv8-OBB 导出模型的输出为 (1, 4 + nc + 1, N)：
+    每列 [cx, cy, w, h, 各类别分数..., 角度(弧度)]，坐标为letterbox后输入图上的像素。
+"""
+
+import math
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from stage_timer import StageTimer
+from vision_detector import (
+    VisionDetector, DetectionResult, _NutGeometry, rank_targets,
+    _segment_nut_with_threshold, _background_mask, _largest_contour, _determine_head_direction,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+    logger.warning("onnxruntime 未安装，ONNX OBB 检测不可用")
+
+
+# ---------------------------------------------------------------------------
+# 前处理 / 后处理
+# ---------------------------------------------------------------------------
+
+def letterbox_params(shape: Tuple[int, int], size: Tuple[int, int]):
+    """
+    等比缩放到 size 并居中填充（与 ultralytics LetterBox 一致）
+
+    Args:
+        shape: 原图 (H, W)
+        size: 模型输入 (H, W)
+
+    Returns:
+        (缩放比例, (新宽, 新高), (左, 上, 右, 下) 填充像素)
+    """
+    h, w = shape[:2]
+    ratio = min(size[0] / h, size[1] / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    dw, dh = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    return ratio, (new_w, new_h), (left, top, right, bottom)
+
+
+def letterbox_blob(image: np.ndarray, size: Tuple[int, int], canvas: Optional[np.ndarray] = None):
+    """
+    letterbox并转换为模型输入（BGR→RGB、HWC→CHW、/255，float32 NCHW）
+
+    Args:
+        image: BGR图像
+        size: 模型输入 (H, W)
+        canvas: (H, W, 3) 画布，边框须已填充114；原图尺寸不变时各帧只覆盖中间区域
+
+    Returns:
+        (NCHW输入, 缩放比例, (左, 上))
+    """
+    ratio, (new_w, new_h), (left, top, _, _) = letterbox_params(image.shape, size)
+    if canvas is None:
+        canvas = np.full((*size, 3), 114, dtype=np.uint8)
+    cv2.resize(image, (new_w, new_h), dst=canvas[top:top + new_h, left:left + new_w],
+               interpolation=cv2.INTER_LINEAR)
+    return cv2.dnn.blobFromImage(canvas, 1.0 / 255, swapRB=True), ratio, (left, top)
+
+
+def _covariance(boxes: np.ndarray):
+    """旋转框 (cx, cy, w, h, r) 对应高斯分布的协方差分量 (a, b, c)"""
+    a = boxes[:, 2] ** 2 / 12
+    b = boxes[:, 3] ** 2 / 12
+    cos, sin = np.cos(boxes[:, 4]), np.sin(boxes[:, 4])
+    return a * cos ** 2 + b * sin ** 2, a * sin ** 2 + b * cos ** 2, (a - b) * cos * sin
+
+
+def probiou(boxes1: np.ndarray, boxes2: np.ndarray, eps: float = 1e-7) -> np.ndarray:
+    """
+    旋转框两两之间的ProbIoU (N, M)，把旋转框看作二维高斯分布，用Bhattacharyya距离衡量重叠，
+    与 ultralytics.utils.metrics.batch_probiou 相同
+
+    Args:
+        boxes1: (N, 5) [cx, cy, w, h, 弧度]
+        boxes2: (M, 5)
+    """
+    x1, y1 = boxes1[:, 0:1], boxes1[:, 1:2]
+    x2, y2 = boxes2[None, :, 0], boxes2[None, :, 1]
+    a1, b1, c1 = (v[:, None] for v in _covariance(boxes1))
+    a2, b2, c2 = (v[None, :] for v in _covariance(boxes2))
+
+    a, b, c = a1 + a2, b1 + b2, c1 + c2
+    denom = a * b - c ** 2 + eps
+    t1 = (a * (y1 - y2) ** 2 + b * (x1 - x2) ** 2) / denom * 0.25
+    t2 = (c * (x2 - x1) * (y1 - y2)) / denom * 0.5
+    det1 = np.clip(a1 * b1 - c1 ** 2, 0, None)
+    det2 = np.clip(a2 * b2 - c2 ** 2, 0, None)
+    t3 = np.log((a * b - c ** 2) / (4 * np.sqrt(det1 * det2) + eps) + eps) * 0.5
+    bd = np.clip(t1 + t2 + t3, eps, 100.0)
+    hd = np.sqrt(1.0 - np.exp(-bd) + eps)
+    return 1 - hd
+
+
+def nms_rotated(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45) -> np.ndarray:
+    """
+    旋转框NMS，返回保留的下标（按分数从高到低）
+
+    一次算出分数排序后的ProbIoU上三角矩阵，与任何更高分框的重叠超过阈值即去掉
+    （与 ultralytics nms_rotated 相同的矩阵式做法，没有逐框循环）。
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.intp)
+    order = np.argsort(-scores, kind='stable')
+    ious = np.triu(probiou(boxes[order], boxes[order]), k=1)
+    return order[ious.max(axis=0) < iou_threshold]
+
+
+def decode_obb(output: np.ndarray, conf_threshold: float = 0.25, iou_threshold: float = 0.45,
+               max_candidates: int = 300):
+    """
+    解码YOLOv8-OBB原始输出
+
+    Args:
+        output: (4 + nc + 1, N) 或 (1, 4 + nc + 1, N)
+        conf_threshold: 分数阈值
+        iou_threshold: 旋转NMS的ProbIoU阈值
+        max_candidates: 参与NMS的最高分候选数
+
+    Returns:
+        (boxes (K, 5) [cx, cy, w, h, 弧度], scores (K,), class_ids (K,))，按分数从高到低
+    """
+    pred = output[0] if output.ndim == 3 else output
+    nc = pred.shape[0] - 5
+    class_scores = pred[4:4 + nc]
+    if nc == 1:
+        scores = class_scores[0]
+        class_ids = np.zeros(pred.shape[1], dtype=np.intp)
+    else:
+        class_ids = class_scores.argmax(axis=0)
+        scores = class_scores.max(axis=0)
+
+    keep = np.flatnonzero(scores > conf_threshold)
+    if len(keep) > max_candidates:
+        keep = keep[np.argpartition(-scores[keep], max_candidates)[:max_candidates]]
+    boxes = np.stack([pred[0, keep], pred[1, keep], pred[2, keep], pred[3, keep], pred[-1, keep]], axis=1)
+    scores, class_ids = scores[keep], class_ids[keep]
+
+    picked = nms_rotated(boxes.astype(np.float64), scores, iou_threshold)
+    return boxes[picked], scores[picked], class_ids[picked]
+
+
+# ---------------------------------------------------------------------------
+# 检测器
+# ---------------------------------------------------------------------------
+
+class OnnxObbDetector(VisionDetector):
+    """
+    ONNX Runtime OBB 检测器
+
+    继承 VisionDetector 的ROI换算、绘图和背景模型接口，只替换检测部分：
+    位置、角度、长宽来自模型的旋转框，尖头朝向在框内分割出轮廓后用传统方法判断。
+    """
+
+    def __init__(self, onnx_path: str, pixel_to_mm: float = 0.1, conf_threshold: float = 0.25,
+                 iou_threshold: float = 0.45, imgsz: int = 640, intra_op_threads: int = 0, **kwargs):
+        """
+        Args:
+            onnx_path: 导出的ONNX模型文件
+            pixel_to_mm: 像素到毫米的转换比例
+            conf_threshold: 分数阈值
+            iou_threshold: 旋转NMS的ProbIoU阈值
+            imgsz: 模型输入尺寸（模型输入为动态尺寸时使用）
+            intra_op_threads: onnxruntime单次推理的线程数，0 表示由onnxruntime决定
+                （8台相机同时推理时建议设为1~2，避免线程争抢）
+            **kwargs: 传给 VisionDetector 的检测参数（head_slices等）
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime 未安装: pip install onnxruntime")
+        super().__init__(pixel_to_mm=pixel_to_mm, **kwargs)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        self.session = ort.InferenceSession(str(onnx_path), sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.onnx_path = str(onnx_path)
+        self.conf_threshold = float(conf_threshold)
+        self.iou_threshold = float(iou_threshold)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        dims = model_input.shape[2:4]
+        # 导出时未指定dynamic则为固定尺寸，否则是字符串/None
+        self.input_size = tuple(int(d) if isinstance(d, int) else int(imgsz) for d in dims)
+        self.input_dtype = np.float16 if 'float16' in model_input.type else np.float32
+        self._canvas = np.full((*self.input_size, 3), 114, dtype=np.uint8)
+        self._letterbox_key = None
+
+        logger.info(f"OnnxObbDetector: {self.onnx_path}, 输入 {self.input_size[1]}x{self.input_size[0]} "
+                    f"{self.input_dtype.__name__}, conf={self.conf_threshold}, iou={self.iou_threshold}")
+
+    # ------------------------------------------------------------------ infer
+    def _preprocess(self, image: np.ndarray):
+        """letterbox到模型输入尺寸，返回 (NCHW输入, 缩放比例, (左, 上))"""
+        key = (image.shape[:2], self.input_size)
+        if key != self._letterbox_key:
+            # 原图尺寸变化时重新填充边框，之后只覆盖中间区域
+            self._canvas[...] = 114
+            self._letterbox_key = key
+        blob, ratio, pad = letterbox_blob(image, self.input_size, self._canvas)
+        if self.input_dtype is not np.float32:
+            blob = blob.astype(self.input_dtype)
+        return blob, ratio, pad
+
+    def predict(self, image: np.ndarray, timer: Optional[StageTimer] = None):
+        """
+        推理并解码为原图坐标下的旋转框
+
+        Args:
+            timer: 分阶段计时器，给出时记录 preprocess / inference / decode_nms
+
+        Returns:
+            (boxes (K, 5) [cx, cy, w, h, 弧度], scores (K,), class_ids (K,))，按分数从高到低
+        """
+        blob, ratio, (left, top) = self._preprocess(image)
+        if timer is not None:
+            timer.mark('preprocess')
+        output = self.session.run(None, {self.input_name: blob})[0]
+        if timer is not None:
+            timer.mark('inference')
+        boxes, scores, class_ids = decode_obb(output.astype(np.float32, copy=False),
+                                              self.conf_threshold, self.iou_threshold)
+        boxes = boxes.astype(np.float64)
+        boxes[:, 0] = (boxes[:, 0] - left) / ratio
+        boxes[:, 1] = (boxes[:, 1] - top) / ratio
+        boxes[:, 2:4] /= ratio
+        if timer is not None:
+            timer.mark('decode_nms')
+        return boxes, scores, class_ids
+
+    # ------------------------------------------------------------------ detect
+    def detect_betel_nut(self, image: np.ndarray) -> DetectionResult:
+        """
+        检测图像中的槟榔（取分数最高的旋转框）并计算全部参数。
+        检测后 self._last_contour 保存框内分割出的轮廓供绘图使用（分割失败时为None）。
+        """
+        self._last_contour = None
+        timer = StageTimer() if self.stage_timing else None
+        boxes, scores, _ = self.predict(image, timer)
+        if len(boxes) == 0:
+            logger.warning("No betel nut detected (ONNX OBB)")
+            return self._attach_timings([DetectionResult(0, 0, 0, 0, 0, 0, 1, 0.0)], timer)[0]
+        result = self._box_result(image, boxes[0], float(scores[0]))
+        if timer is not None:
+            timer.mark('box_result')
+        return self._attach_timings([result], timer)[0]
+
+    def detect_all(self, image: np.ndarray) -> List[DetectionResult]:
+        """
+        所有旋转框（NMS后）按切割优先级排序，最多 max_targets 个；
+        self._last_contours 与返回结果一一对应（框内分割失败的为None）
+        """
+        self._last_contour = None
+        self._last_contours = []
+        timer = StageTimer() if self.stage_timing else None
+        boxes, scores, _ = self.predict(image, timer)
+        if len(boxes) == 0:
+            logger.warning("No betel nut detected (ONNX OBB)")
+            return []
+
+        results, contours = [], []
+        for box, score in zip(boxes, scores):
+            self._last_contour = None
+            results.append(self._box_result(image, box, float(score)))
+            contours.append(self._last_contour)
+        if timer is not None:
+            timer.mark('box_result')
+        order = rank_targets(results, image.shape, self.target_order)[:self.max_targets]
+        self._last_contours = [contours[i] for i in order]
+        self._last_contour = self._last_contours[0]
+        return self._attach_timings([results[i] for i in order], timer)
+
+    def detect_batch(self, frames) -> List[DetectionResult]:
+        """逐帧推理（导出的模型输入批大小固定为1）"""
+        return [self.detect_betel_nut(frame) for frame in frames]
+
+    def _box_result(self, image: np.ndarray, box: np.ndarray, score: float) -> DetectionResult:
+        cx, cy, w, h, theta = (float(v) for v in box)
+        angle_deg = math.degrees(theta)
+        if w >= h:
+            geometry = self._make_geometry(cx, cy, w, h, angle_deg, image.shape)
+        else:
+            geometry = self._make_geometry(cx, cy, h, w, angle_deg + 90, image.shape)
+
+        contour = self._contour_in_box(image, cx, cy, w, h, angle_deg)
+        head_dir = 0
+        if contour is not None and len(contour) >= 5:
+            head_dir = _determine_head_direction(contour, geometry.center, geometry.major_vec,
+                                                 geometry.major_len_px, slices=self.head_slices)
+            self._last_contour = contour
+
+        box_points = cv2.boxPoints(((cx, cy), (w, h), angle_deg))
+        logger.info(
+            f"OBB Detection: center=({cx:.1f},{cy:.1f})px, "
+            f"offset=({geometry.x_offset_mm:.2f},{geometry.y_offset_mm:.2f})mm, "
+            f"angle={geometry.major_angle:.1f}°, length={geometry.length_mm:.1f}mm, "
+            f"height={geometry.height_mm:.1f}mm, head={head_dir}, conf={score:.2f}"
+        )
+        return self._geometry_result(geometry, head_dir, score, box_points)
+
+    @staticmethod
+    def _geometry_result(geometry: _NutGeometry, head_dir: int, score: float,
+                         box_points: np.ndarray) -> DetectionResult:
+        cx, cy = geometry.center
+        return DetectionResult(
+            x_offset=geometry.x_offset_mm,
+            y_offset=geometry.y_offset_mm,
+            r_angle=geometry.major_angle,
+            height=geometry.height_mm,
+            length=geometry.length_mm,
+            head_direction=int(head_dir),
+            classification=2,
+            confidence=score,
+            box_coords=tuple(box_points.flatten().tolist()),
+            center_point=(float(cx), float(cy))
+        )
+
+    def _contour_in_box(self, image: np.ndarray, cx: float, cy: float, w: float, h: float,
+                        angle_deg: float, margin: float = 0.15):
+        """在旋转框外接矩形（外扩margin）内分割，返回原图坐标下的最大轮廓"""
+        img_h, img_w = image.shape[:2]
+        corners = cv2.boxPoints(((cx, cy), (w * (1 + margin), h * (1 + margin)), angle_deg))
+        x0, y0 = np.maximum(np.floor(corners.min(axis=0)).astype(int), 0)
+        x1, y1 = np.minimum(np.ceil(corners.max(axis=0)).astype(int) + 1, (img_w, img_h))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+
+        crop = image[y0:y1, x0:x1]
+        # 裁剪区域每帧大小不同，灰度图不进缓冲区（中间图仍用缓冲区左上角的视图）
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        background = self._active_background(image)
+        if background is not None:
+            binary = _background_mask(gray, background, (x0, y0), buffers=self._buffers)
+        else:
+            binary, _ = _segment_nut_with_threshold(gray, buffers=self._buffers)
+        contour = _largest_contour(binary, min_area_ratio=0.0)
+        if contour is None:
+            return None
+        return contour + np.array([[[x0, y0]]], dtype=contour.dtype)
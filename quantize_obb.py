@@ -0,0 +1,373 @@
+"""
+YOLO OBB 模型 INT8 量化工具
+对 train_yolo_obb.py 导出的ONNX模型做静态INT8量化（onnxruntime.quantization，QDQ格式），
+并在验证集上对比FP32和INT8模型的推理耗时、mAP和角度误差，用于按节拍选择模型。
+
+用法:
+    # 量化并对比（校准图片默认取数据集train/images，没有时取test_img下的图片）
+    python quantize_obb.py models/obb_best_m.onnx
+
+    # 只对比已有的两个模型
+    python quantize_obb.py models/obb_best_m.onnx --int8 models/obb_best_m.int8.onnx --skip-quantize
+
+输出:
+    <模型名>.int8.onnx       量化后的模型（model.onnx_path 指向它即可使用）
+    <模型名>.int8.report.md  对比报告（同时打印到控制台）
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    DEPENDENCIES_AVAILABLE = True
+except ImportError:
+    DEPENDENCIES_AVAILABLE = False
+    print("Error: onnx or onnxruntime not installed")
+    print("Install with: pip install onnx onnxruntime")
+    sys.exit(1)
+
+from onnx_obb_detector import OnnxObbDetector, letterbox_blob, probiou
+
+IMAGE_SUFFIXES = ('.bmp', '.jpg', '.jpeg', '.png')
+
+
+# ---------------------------------------------------------------------------
+# 数据
+# ---------------------------------------------------------------------------
+
+def load_dataset_dirs(data_yaml: str):
+    """从数据集配置（betel_nut_obb.yaml）读取 (train图片目录, val图片目录)"""
+    import yaml
+
+    yaml_path = Path(data_yaml)
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path', '.'))
+    if not root.is_absolute():
+        root = yaml_path.parent / root
+    return root / data['train'], root / data['val']
+
+
+def list_images(folder: Path, limit: int = 0):
+    """目录下（含子目录）的图片，按文件名排序"""
+    images = sorted(p for p in Path(folder).rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    return images[:limit] if limit else images
+
+
+def read_labels(image_path: Path, shape):
+    """
+    读取YOLO OBB标签（class x1 y1 x2 y2 x3 y3 x4 y4，归一化坐标）
+
+    Returns:
+        (boxes (K, 5) [cx, cy, w, h, 弧度] 像素坐标, class_ids (K,))
+    """
+    label_path = image_path.parent.parent / 'labels' / (image_path.stem + '.txt')
+    boxes, classes = [], []
+    if label_path.exists():
+        h, w = shape[:2]
+        for line in label_path.read_text().split('\n'):
+            values = line.split()
+            if len(values) != 9:
+                continue
+            points = (np.array(values[1:], dtype=np.float64).reshape(4, 2) * (w, h)).astype(np.float32)
+            (cx, cy), (bw, bh), angle = cv2.minAreaRect(points)
+            boxes.append((cx, cy, bw, bh, np.radians(angle)))
+            classes.append(int(values[0]))
+    return np.array(boxes, dtype=np.float64).reshape(-1, 5), np.array(classes, dtype=np.intp)
+
+
+class ObbCalibrationReader(CalibrationDataReader):
+    """按推理时相同的letterbox前处理逐张提供校准输入"""
+
+    def __init__(self, images, input_name: str, input_size):
+        self.images = list(images)
+        self.input_name = input_name
+        self.input_size = input_size
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.images):
+            image = cv2.imread(str(self.images[self._index]))
+            self._index += 1
+            if image is not None:
+                blob, _, _ = letterbox_blob(image, self.input_size)
+                return {self.input_name: blob}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+# ---------------------------------------------------------------------------
+# 量化
+# ---------------------------------------------------------------------------
+
+def head_node_names(model_path: str):
+    """
+    检测头解码部分的节点名（最后一个 /model.N/ 模块中 cv2/cv3/cv4 卷积分支以外的节点：
+    DFL、框坐标和角度换算、拼接）
+
+    解码输出的框坐标和角度直接决定切割位置和角度，量化误差影响最大，默认保持FP32；
+    检测头的卷积分支计算量大，仍然量化。
+    """
+    graph = onnx.load(model_path, load_external_data=False).graph
+    indices = {}
+    for node in graph.node:
+        parts = node.name.split('/')
+        if len(parts) > 2 and parts[1].startswith('model.') and parts[1][6:].isdigit():
+            indices.setdefault(int(parts[1][6:]), []).append(parts)
+    if not indices:
+        return []
+    return ['/'.join(parts) for parts in indices[max(indices)]
+            if not parts[2].startswith(('cv2', 'cv3', 'cv4'))]
+
+
+def quantize_model(fp32_path: str, int8_path: str, calib_images, method: str = 'minmax',
+                   per_channel: bool = True, exclude_head: bool = True):
+    """
+    静态INT8量化
+
+    Args:
+        fp32_path: 导出的FP32模型
+        int8_path: 输出模型
+        calib_images: 校准图片列表
+        method: 校准方法 minmax / entropy / percentile
+        per_channel: 卷积权重按输出通道量化（精度更好）
+        exclude_head: 检测头解码部分保持FP32
+    """
+    session = onnxruntime.InferenceSession(fp32_path, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    input_size = tuple(d if isinstance(d, int) else 640 for d in model_input.shape[2:4])
+    del session
+
+    # 形状推断 + 图优化（算子融合后再量化，量化节点更少）
+    prep_path = str(Path(int8_path).with_suffix('.prep.onnx'))
+    quant_pre_process(fp32_path, prep_path, skip_symbolic_shape=True)
+
+    excluded = head_node_names(prep_path) if exclude_head else []
+    methods = {
+        'minmax': CalibrationMethod.MinMax,
+        'entropy': CalibrationMethod.Entropy,
+        'percentile': CalibrationMethod.Percentile,
+    }
+    print(f"Calibrating with {len(calib_images)} images ({method}), "
+          f"{len(excluded)} head decode nodes kept in FP32")
+    start = time.perf_counter()
+    quantize_static(
+        prep_path,
+        int8_path,
+        ObbCalibrationReader(calib_images, model_input.name, input_size),
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=methods[method],
+        nodes_to_exclude=excluded,
+    )
+    Path(prep_path).unlink(missing_ok=True)
+    print(f"INT8 model saved: {int8_path} ({time.perf_counter() - start:.1f}s)")
+
+
+# ---------------------------------------------------------------------------
+# 评估
+# ---------------------------------------------------------------------------
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """101点插值AP（COCO方式，与ultralytics相同）"""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return float(np.trapz(np.interp(x, mrec, mpre), x))
+
+
+def _major_angle_deg(box) -> float:
+    """旋转框长轴角度（度，0~180）"""
+    angle = np.degrees(box[4]) + (0.0 if box[2] >= box[3] else 90.0)
+    return angle % 180.0
+
+
+def evaluate(detector: OnnxObbDetector, images, repeats: int = 3, warmup: int = 3) -> dict:
+    """
+    在验证集上评估一个模型
+
+    Returns:
+        延时（predict全流程：前处理+推理+解码，毫秒）、mAP50、mAP50-95、
+        角度误差（与标注长轴夹角，度）、中心误差（像素）
+    """
+    iou_thresholds = np.linspace(0.5, 0.95, 10)
+    frames = [(p, cv2.imread(str(p))) for p in images]
+    frames = [(p, f) for p, f in frames if f is not None]
+
+    for _, frame in frames[:warmup]:
+        detector.predict(frame)
+    latencies = []
+    for _ in range(repeats):
+        for _, frame in frames:
+            start = time.perf_counter()
+            detector.predict(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # 逐类收集 (分数, 各IoU阈值下是否命中)
+    records, gt_counts = {}, {}
+    angle_errors, center_errors = [], []
+    for path, frame in frames:
+        gt_boxes, gt_classes = read_labels(path, frame.shape)
+        boxes, scores, classes = detector.predict(frame)
+        for c in set(gt_classes.tolist()) | set(classes.tolist()):
+            gt = gt_boxes[gt_classes == c]
+            pred_mask = classes == c
+            pred, pred_scores = boxes[pred_mask], scores[pred_mask]
+            gt_counts[c] = gt_counts.get(c, 0) + len(gt)
+            hits = np.zeros((len(pred), len(iou_thresholds)), dtype=bool)
+            if len(gt) and len(pred):
+                ious = probiou(pred, gt)
+                # 按分数从高到低贪心匹配，每个标注在每个阈值下只匹配一次
+                for t, threshold in enumerate(iou_thresholds):
+                    taken = np.zeros(len(gt), dtype=bool)
+                    for i in range(len(pred)):
+                        candidates = np.where(~taken & (ious[i] >= threshold), ious[i], -1.0)
+                        j = int(candidates.argmax())
+                        if candidates[j] >= 0:
+                            taken[j] = hits[i, t] = True
+                # 角度/中心误差：每个标注取IoU≥0.5中分数最高的检测
+                for j in range(len(gt)):
+                    matched = np.flatnonzero(ious[:, j] >= 0.5)
+                    if len(matched):
+                        box = pred[matched[0]]
+                        diff = abs(_major_angle_deg(box) - _major_angle_deg(gt[j]))
+                        angle_errors.append(min(diff, 180.0 - diff))
+                        center_errors.append(float(np.hypot(*(box[:2] - gt[j][:2]))))
+            records.setdefault(c, []).append((pred_scores, hits))
+
+    aps = []
+    for c, items in records.items():
+        if not gt_counts.get(c):
+            continue
+        scores = np.concatenate([s for s, _ in items])
+        hits = np.concatenate([h for _, h in items])
+        order = np.argsort(-scores, kind='stable')
+        tp = np.cumsum(hits[order], axis=0)
+        fp = np.cumsum(~hits[order], axis=0)
+        recall = tp / gt_counts[c]
+        precision = tp / np.maximum(tp + fp, 1)
+        aps.append([average_precision(recall[:, t], precision[:, t]) for t in range(len(iou_thresholds))])
+    aps = np.array(aps).reshape(-1, len(iou_thresholds))
+
+    return {
+        'images': len(frames),
+        'latency_ms_median': statistics.median(latencies) if latencies else 0.0,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else 0.0,
+        'map50': float(aps[:, 0].mean()) if len(aps) else 0.0,
+        'map50_95': float(aps.mean()) if len(aps) else 0.0,
+        'angle_err_mean': float(np.mean(angle_errors)) if angle_errors else float('nan'),
+        'angle_err_p95': float(np.percentile(angle_errors, 95)) if angle_errors else float('nan'),
+        'center_err_px': float(np.mean(center_errors)) if center_errors else float('nan'),
+        'matched': len(angle_errors),
+    }
+
+
+def format_report(fp32_path: str, int8_path: str, fp32: dict, int8: dict, cameras: int, threads: int) -> str:
+    rows = [
+        ('模型文件', Path(fp32_path).name, Path(int8_path).name, ''),
+        ('文件大小 (MB)', f"{Path(fp32_path).stat().st_size / 1e6:.1f}", f"{Path(int8_path).stat().st_size / 1e6:.1f}", ''),
+        ('单帧耗时中位数 (ms)', f"{fp32['latency_ms_median']:.1f}", f"{int8['latency_ms_median']:.1f}",
+         f"{fp32['latency_ms_median'] / max(int8['latency_ms_median'], 1e-9):.2f}x"),
+        ('单帧耗时P95 (ms)', f"{fp32['latency_ms_p95']:.1f}", f"{int8['latency_ms_p95']:.1f}", ''),
+        (f'{cameras}台相机串行 (ms)', f"{fp32['latency_ms_median'] * cameras:.0f}",
+         f"{int8['latency_ms_median'] * cameras:.0f}", ''),
+        ('mAP50', f"{fp32['map50']:.4f}", f"{int8['map50']:.4f}", f"{int8['map50'] - fp32['map50']:+.4f}"),
+        ('mAP50-95', f"{fp32['map50_95']:.4f}", f"{int8['map50_95']:.4f}",
+         f"{int8['map50_95'] - fp32['map50_95']:+.4f}"),
+        ('角度误差均值 (°)', f"{fp32['angle_err_mean']:.2f}", f"{int8['angle_err_mean']:.2f}",
+         f"{int8['angle_err_mean'] - fp32['angle_err_mean']:+.2f}"),
+        ('角度误差P95 (°)', f"{fp32['angle_err_p95']:.2f}", f"{int8['angle_err_p95']:.2f}", ''),
+        ('中心误差 (px)', f"{fp32['center_err_px']:.2f}", f"{int8['center_err_px']:.2f}", ''),
+    ]
+    lines = [
+        '# OBB模型 FP32 / INT8 对比',
+        '',
+        f"验证图片 {fp32['images']} 张，IoU≥0.5 匹配 {fp32['matched']} / {int8['matched']} 个标注；"
+        f"耗时为 predict 全流程（letterbox + 推理 + 解码），intra_op_threads={threads or '默认'}",
+        '',
+        '| 指标 | FP32 | INT8 | 变化 |',
+        '|---|---|---|---|',
+    ]
+    lines += [f'| {name} | {a} | {b} | {d} |' for name, a, b, d in rows]
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Static INT8 quantization of the exported YOLO OBB model')
+    parser.add_argument('model', help='FP32 ONNX model exported by train_yolo_obb.py')
+    parser.add_argument('--int8', default=None, help='INT8 output path (default: <model>.int8.onnx)')
+    parser.add_argument('--data', default='betel_nut_obb.yaml', help='Dataset YAML config file')
+    parser.add_argument('--calib', default=None,
+                        help='Calibration image folder (default: dataset train images, then test_img)')
+    parser.add_argument('--calib-count', type=int, default=100, help='Max calibration images')
+    parser.add_argument('--method', choices=('minmax', 'entropy', 'percentile'), default='minmax',
+                        help='Calibration method')
+    parser.add_argument('--no-per-channel', action='store_true', help='Per-tensor weight quantization')
+    parser.add_argument('--quantize-head', action='store_true', help='Also quantize the detection head decode nodes')
+    parser.add_argument('--skip-quantize', action='store_true', help='Only compare existing models')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='intra_op_threads for latency (1 approximates one camera per core)')
+    parser.add_argument('--repeats', type=int, default=3, help='Latency passes over the val images')
+    parser.add_argument('--cameras', type=int, default=8, help='Cameras sharing the CPU (for the report)')
+    args = parser.parse_args()
+
+    fp32_path = args.model
+    int8_path = args.int8 or str(Path(fp32_path).with_suffix('.int8.onnx'))
+    try:
+        train_dir, val_dir = load_dataset_dirs(args.data)
+    except (OSError, KeyError) as e:
+        print(f"Warning: cannot read dataset config {args.data}: {e}")
+        train_dir = val_dir = None
+
+    if not args.skip_quantize:
+        calib_dir = Path(args.calib) if args.calib else None
+        if calib_dir is None:
+            calib_dir = train_dir if train_dir is not None and train_dir.exists() else Path('test_img')
+        calib_images = list_images(calib_dir, args.calib_count)
+        if not calib_images:
+            print(f"Error: no calibration images in {calib_dir}")
+            return
+        quantize_model(fp32_path, int8_path, calib_images, args.method,
+                       per_channel=not args.no_per_channel, exclude_head=not args.quantize_head)
+
+    if val_dir is None or not val_dir.exists():
+        print(f"Error: validation images not found: {val_dir}")
+        return
+    val_images = list_images(val_dir)
+    print(f"Evaluating on {len(val_images)} validation images...")
+
+    results = {}
+    for name, path in (('fp32', fp32_path), ('int8', int8_path)):
+        # conf取0.001与ultralytics验证一致，mAP需要低分检测
+        detector = OnnxObbDetector(path, conf_threshold=0.001, iou_threshold=0.7,
+                                   intra_op_threads=args.threads)
+        results[name] = evaluate(detector, val_images, repeats=args.repeats)
+        print(f"  {name}: {json.dumps(results[name], ensure_ascii=False)}")
+
+    report = format_report(fp32_path, int8_path, results['fp32'], results['int8'], args.cameras, args.threads)
+    report_path = Path(int8_path).with_suffix('.report.md')
+    report_path.write_text(report, encoding='utf-8')
+    print('\n' + report)
+    print(f"Report saved: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+检测结果缓存（测试/回放模式）
+图片测试模式和归档回放会反复送入相同的帧，检测器每次都重算出相同的结果。
+ResultCache 以帧内容哈希 + 检测配置版本为键缓存检测结果：
+    - 内存层: LRU，按条目数淘汰
+    - 磁盘层: SQLite文件，跨次运行保留，回归测试重跑时只重算配置或图片变化的帧
+
+帧哈希对抽样后的数据计算（每 stride 行、每行每 stride 个8字节字取一个），安装了 xxhash 时用 xxh3_128，
+否则用 hashlib.blake2b。检测参数、标定比例、模型文件或 CACHE_FORMAT 改变时
+配置版本随之改变，旧条目自然不再命中；删除缓存文件即清空磁盘层。
+"""
+
+import json
+import time
+import pickle
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from config_manager import get_exe_dir
+
+logger = logging.getLogger('BetelNutVision.result_cache')
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# 检测算法或缓存内容格式改变时加1，使已有的磁盘缓存全部失效
+CACHE_FORMAT = 1
+
+# 不影响检测结果的检测参数，不计入配置版本
+_VERSION_IGNORED_KEYS = ('stage_timing', 'stage_timing_window')
+
+
+def _hasher():
+    return xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=16)
+
+
+def detector_version(pixel_to_mm: float, detector_config: dict, model_config: Optional[dict] = None) -> str:
+    """
+    检测配置版本：标定比例、检测参数、模型参数和所用ONNX模型文件（大小、修改时间）的哈希
+
+    Returns:
+        str: 16位十六进制
+    """
+    model_config = model_config or {}
+    detector_config = {k: v for k, v in detector_config.items() if k not in _VERSION_IGNORED_KEYS}
+    model_file = None
+    uses_onnx = (str(model_config.get('backend', 'cv')).lower() == 'onnx'
+                 or (detector_config.get('cascade')
+                     and str(detector_config.get('cascade_backend', 'onnx')).lower() == 'onnx'))
+    if uses_onnx:
+        from detector_factory import resolve_model_path
+        path = resolve_model_path(model_config.get('onnx_path', 'models/obb_best_m.onnx'))
+        if path.exists():
+            stat = path.stat()
+            model_file = [str(path), stat.st_size, int(stat.st_mtime)]
+    text = json.dumps([CACHE_FORMAT, pixel_to_mm, detector_config, model_config, model_file],
+                      sort_keys=True, ensure_ascii=True, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ResultCache:
+    """
+    内存LRU + 可选SQLite磁盘层的检测结果缓存，多线程共用
+
+    值为任意可pickle的对象（相机线程存 (结果列表, 轮廓列表)）。
+    """
+
+    def __init__(self, max_entries: int = 2048, path=None, stride: int = 4):
+        """
+        Args:
+            max_entries: 内存层最多条目数，0表示不用内存层
+            path: 磁盘层SQLite文件，None表示只用内存层
+            stride: 帧哈希的抽样间隔（行/8字节字），1表示对全部像素哈希
+        """
+        self.max_entries = max(0, int(max_entries))
+        self.stride = max(1, int(stride))
+        self.path = Path(path) if path else None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute('PRAGMA synchronous=NORMAL')
+                self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                                 '(key BLOB PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)')
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f'结果缓存文件 {self.path} 无法打开({e})，只使用内存缓存')
+                self._db = None
+        logger.info(f'ResultCache: 内存 {self.max_entries} 条, 磁盘 {self.path if self._db else "无"}, '
+                    f'抽样间隔 {self.stride}, 哈希 {"xxh3_128" if XXHASH_AVAILABLE else "blake2b"}')
+
+    def frame_key(self, image: np.ndarray, context: str = '') -> bytes:
+        """
+        帧的缓存键：抽样像素 + 尺寸/类型 + 上下文（配置版本、ROI等）的16字节哈希
+        """
+        hasher = _hasher()
+        hasher.update(f'{image.shape}|{image.dtype}|{self.stride}|{context}'.encode('utf-8'))
+        image = np.ascontiguousarray(image)
+        rows = image.reshape(image.shape[0], -1).view(np.uint8)
+        words = rows.shape[1] // 8
+        if self.stride > 1 and words > 0:
+            # 按8字节字抽样比逐像素抽样的拷贝快一个数量级（5MP彩色图约0.3ms）
+            sample = rows[::self.stride, :words * 8].view(np.uint64)[:, ::self.stride]
+            hasher.update(np.ascontiguousarray(sample).data)
+        else:
+            hasher.update(rows.data)
+        return hasher.digest()
+
+    def get(self, key: bytes):
+        """查找缓存，未命中返回None（磁盘层命中的条目会放回内存层）"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            if self._db is not None:
+                row = self._db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    try:
+                        value = pickle.loads(row[0])
+                    except Exception as e:
+                        logger.warning(f'结果缓存条目损坏({type(e).__name__})，重新检测')
+                    else:
+                        self._remember(key, value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, value):
+        """写入内存层和磁盘层"""
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                try:
+                    self._db.execute('INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)',
+                                     (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time()))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f'结果缓存写入失败: {e}')
+
+    def _remember(self, key: bytes, value):
+        if self.max_entries == 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._memory),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_shared_cache: Optional[ResultCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache(camera_params: dict) -> ResultCache:
+    """
+    按 camera_params 获取本进程共用的结果缓存（8个相机线程共用一个内存层和磁盘文件）
+
+    相对路径按exe同目录解析，result_cache_path 为空时只用内存层。
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            path = camera_params.get('result_cache_path') or None
+            if path is not None and not Path(path).is_absolute():
+                path = get_exe_dir() / path
+            _shared_cache = ResultCache(
+                max_entries=int(camera_params.get('result_cache_entries', 2048)),
+                path=path,
+                stride=int(camera_params.get('result_cache_stride', 4)),
+            )
+        return _shared_cache
@@ -7,6 +7,7 @@ Betel Nut Vision Detection and Cutting System
 import sys
 import os
 import traceback
+import multiprocessing
 
 # 处理打包后的路径
 if getattr(sys, 'frozen', False):
@@ -21,39 +22,44 @@ else:
 # 添加当前目录到Python路径
 sys.path.insert(0, application_path)
 
-# 导入日志配置
-from logger_config import setup_logger, setup_global_exception_handler
+if __name__ == "__main__":
+    # 检测进程池（detection_engine）用spawn方式启动子进程，子进程会重新导入本文件，
+    # 启动代码必须放在这里；打包后的exe由freeze_support把子进程引到multiprocessing入口
+    multiprocessing.freeze_support()
 
-# 设置日志
-logger = setup_logger('BetelNutVision')
-setup_global_exception_handler(logger)
+    # 导入日志配置
+    from logger_config import setup_logger, setup_global_exception_handler
 
-logger.info("="*60)
-logger.info("槟榔视觉检测与切割定位系统启动")
-logger.info("="*60)
-logger.info(f"Python版本: {sys.version}")
-logger.info(f"工作目录: {os.getcwd()}")
+    # 设置日志
+    logger = setup_logger('BetelNutVision')
+    setup_global_exception_handler(logger)
 
-try:
-    from main_window import main
-    logger.info("导入主窗口模块成功")
+    logger.info("="*60)
+    logger.info("槟榔视觉检测与切割定位系统启动")
+    logger.info("="*60)
+    logger.info(f"Python版本: {sys.version}")
+    logger.info(f"工作目录: {os.getcwd()}")
+
+    try:
+        from main_window import main
+        logger.info("导入主窗口模块成功")
     
-    logger.info("启动主程序...")
-    main()
+        logger.info("启动主程序...")
+        main()
     
-except Exception as e:
-    logger.critical("程序启动失败!")
-    logger.critical(f"错误类型: {type(e).__name__}")
-    logger.critical(f"错误信息: {str(e)}")
-    logger.critical("详细错误追踪:")
-    logger.critical(traceback.format_exc())
+    except Exception as e:
+        logger.critical("程序启动失败!")
+        logger.critical(f"错误类型: {type(e).__name__}")
+        logger.critical(f"错误信息: {str(e)}")
+        logger.critical("详细错误追踪:")
+        logger.critical(traceback.format_exc())
     
-    # 显示错误对话框
-    try:
-        from PyQt5.QtWidgets import QApplication, QMessageBox
-        app = QApplication.instance() or QApplication(sys.argv)
+        # 显示错误对话框
+        try:
+            from PyQt5.QtWidgets import QApplication, QMessageBox
+            app = QApplication.instance() or QApplication(sys.argv)
         
-        error_msg = f"""程序启动失败！
+            error_msg = f"""程序启动失败！
 
 错误类型: {type(e).__name__}
 错误信息: {str(e)}
@@ -61,8 +67,8 @@ except Exception as e:
 详细信息已记录到日志文件。
 请查看 logs 文件夹中的日志文件。"""
         
-        QMessageBox.critical(None, "启动错误", error_msg)
-    except:
-        print(f"\n\n!!! 严重错误 !!!\n{traceback.format_exc()}")
+            QMessageBox.critical(None, "启动错误", error_msg)
+        except:
+            print(f"\n\n!!! 严重错误 !!!\n{traceback.format_exc()}")
     
-    sys.exit(1)
+        sys.exit(1)
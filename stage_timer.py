@@ -0,0 +1,111 @@
+"""
+检测分阶段计时
+StageTimer: 一帧检测内的分阶段计时（perf_counter_ns），每次 mark() 把距上一次标记的耗时
+    记到该阶段，各阶段之和即总耗时（未单独标记的开销并入下一个阶段）
+StageHistogram: 每台相机最近N帧各阶段耗时的滚动统计（均值/分位数/直方图）
+
+检测器开启 detector.stage_timing 后，DetectionResult.timings 为 {阶段: 毫秒}，
+经检测进程池返回时随结果一起传回相机线程。
+"""
+
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+# 直方图分箱上沿（毫秒），最后一箱为 >500ms
+HISTOGRAM_EDGES_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class StageTimer:
+    """一帧（或一批）检测的分阶段计时器，每个标记约0.1微秒"""
+
+    __slots__ = ('stages', '_start', '_last')
+
+    def __init__(self):
+        self.stages: Dict[str, int] = {}
+        self._start = self._last = time.perf_counter_ns()
+
+    def mark(self, stage: str):
+        """把距上一次标记（或开始）的耗时记到 stage，同名阶段累加"""
+        now = time.perf_counter_ns()
+        self.stages[stage] = self.stages.get(stage, 0) + now - self._last
+        self._last = now
+
+    def timings(self, frames: int = 1) -> Dict[str, float]:
+        """
+        各阶段耗时（毫秒）和 'total'，批量检测时按帧数平均
+
+        Args:
+            frames: 本计时器覆盖的帧数
+        """
+        frames = max(1, frames)
+        result = {stage: ns / 1e6 / frames for stage, ns in self.stages.items()}
+        result['total'] = (self._last - self._start) / 1e6 / frames
+        return result
+
+
+class StageHistogram:
+    """
+    最近 window 帧各阶段耗时的滚动统计（相机线程内使用，不加锁）
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = max(1, int(window))
+        self._samples: Dict[str, deque] = {}
+        self.frames = 0
+
+    def add(self, timings: Optional[dict]):
+        """加入一帧的 {阶段: 毫秒}，None 忽略"""
+        if not timings:
+            return
+        self.frames += 1
+        for stage, ms in timings.items():
+            self.record(stage, ms)
+
+    def record(self, stage: str, ms: float):
+        """单独加入一个阶段的耗时（如检测之后才进行的绘制），不计帧数"""
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = deque(maxlen=self.window)
+        samples.append(ms)
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        各阶段统计，按平均耗时从大到小排列（'total' 在最前）
+
+        Returns:
+            {阶段: {'count', 'mean', 'p50', 'p95', 'max'}}，单位毫秒
+        """
+        stats = {}
+        for stage, samples in self._samples.items():
+            values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+            p50, p95 = np.percentile(values, (50, 95))
+            stats[stage] = {
+                'count': len(values),
+                'mean': float(values.mean()),
+                'p50': float(p50),
+                'p95': float(p95),
+                'max': float(values.max()),
+            }
+        return dict(sorted(stats.items(), key=lambda item: (item[0] != 'total', -item[1]['mean'])))
+
+    def histogram(self, stage: str) -> list:
+        """某阶段耗时落在各分箱（HISTOGRAM_EDGES_MS，末箱为超出上限）的帧数"""
+        samples = self._samples.get(stage)
+        if not samples:
+            return [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        edges = (0.0,) + HISTOGRAM_EDGES_MS + (float('inf'),)
+        counts, _ = np.histogram(np.fromiter(samples, dtype=np.float64, count=len(samples)), bins=edges)
+        return counts.tolist()
+
+    def format(self, top: int = 5) -> str:
+        """日志用一行摘要: total 和平均耗时最大的 top 个阶段的 p50/p95"""
+        parts = [f"{stage} {s['p50']:.2f}/{s['p95']:.2f}"
+                 for stage, s in list(self.summary().items())[:top + 1]]
+        return ' | '.join(parts)
+
+    def reset(self):
+        self._samples.clear()
+        self.frames = 0
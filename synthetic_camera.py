@@ -0,0 +1,330 @@
+"""
+合成槟榔图像相机
+SyntheticNutCamera: 按随机位姿渲染带尖头的槟榔（光照渐变、纹理、噪声），
+每帧同时给出精确的真值（中心、角度、长度、宽度、尖头朝向），用于吞吐测试和
+VisionDetector 的批量精度检查。
+
+用法:
+    python synthetic_camera.py --frames 500 --size 1280x1024
+"""
+
+import math
+import time
+import logging
+from typing import Optional
+
+import numpy as np
+import cv2
+
+logger = logging.getLogger('BetelNutVision.synthetic_camera')
+
+# 轮廓采样点数（每侧），越多边缘越平滑
+_PROFILE_POINTS = 90
+# 预生成的噪声图数量，取图时随机挑选并平移，避免每帧生成整幅随机数
+_NOISE_BANK = 4
+
+
+def nut_outline(length: float, height: float, taper: float = 0.45) -> np.ndarray:
+    """
+    生成尖头朝+x方向、中心在原点的槟榔轮廓（局部坐标）
+
+    半宽剖面为 sin(pi*t)^0.8 乘以从钝端到尖端线性减小的锥度系数，
+    钝端圆润、尖端收窄。输出已缩放到最大宽度恰为height。
+
+    Args:
+        length: 长度（像素），即尖端到钝端的距离
+        height: 最大宽度（像素）
+        taper: 尖端一侧的收窄程度 0~1
+
+    Returns:
+        np.ndarray: (2*_PROFILE_POINTS, 2) 轮廓点，逆时针
+    """
+    t = np.linspace(0.0, 1.0, _PROFILE_POINTS)
+    profile = np.sin(np.pi * t) ** 0.8 * (1.0 - taper * t)
+    profile *= (height / 2) / profile.max()
+    x = (t - 0.5) * length
+    upper = np.stack([x, profile], axis=1)
+    lower = np.stack([x[::-1], -profile[::-1]], axis=1)
+    return np.concatenate([upper, lower[1:-1]])
+
+
+class SyntheticNutCamera:
+    """
+    合成图像测试相机，接口与ImageFolderCamera一致
+
+    Attributes:
+        last_ground_truth: 最近一帧的真值字典:
+            center: 尖端与钝端连线中点 (x, y) 像素
+            centroid: 轮廓面积重心 (x, y) 像素（椭圆拟合的中心更接近重心）
+            angle: 长轴角度（度，-90~90，与DetectionResult.r_angle同一约定）
+            length / height: 长度 / 最大宽度（像素）
+            head_direction: 1=尖头朝左, 2=尖头朝右
+            x_offset_mm / y_offset_mm / length_mm / height_mm: 按pixel_to_mm换算，
+                偏移相对图片中心（未设ROI时与VisionDetector一致）
+    """
+
+    def __init__(self, camera_ip: str, width: int = 1280, height: int = 1024, fps: float = 0,
+                 pixel_to_mm: float = 0.1, length_range: tuple = (0.35, 0.55),
+                 aspect_range: tuple = (0.38, 0.5), max_angle: float = 70.0,
+                 noise_sigma: float = 6.0, position_spread: float = 1.0, fixed_lighting: bool = False,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            camera_ip: 相机IP（用于日志）
+            width, height: 输出分辨率
+            fps: 出帧速率，0表示不限速
+            pixel_to_mm: 像素到毫米换算，用于真值的毫米值
+            length_range: 槟榔长度占图像宽高较小值的比例范围
+            aspect_range: 宽度/长度比例范围
+            max_angle: 长轴角度的最大绝对值（度），接近90°时左右朝向没有意义
+            noise_sigma: 传感器噪声标准差（灰度级）
+            position_spread: 中心位置的分布范围占可用范围的比例（以图像中心为准），
+                小于1时模拟槟榔总落在视野中相近位置
+            fixed_lighting: 光照（亮度和渐变）在connect时确定后不再变化，模拟固定工位的
+                真实相机，可用render_background()生成空背景帧标定背景模型
+            seed: 随机种子，相同种子生成相同序列
+        """
+        self.camera_ip = camera_ip
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.pixel_to_mm = pixel_to_mm
+        self.length_range = length_range
+        self.aspect_range = aspect_range
+        self.max_angle = max_angle
+        self.noise_sigma = noise_sigma
+        self.position_spread = float(position_spread)
+        self.fixed_lighting = bool(fixed_lighting)
+        self._lighting = None
+        self.rng = np.random.default_rng(seed)
+        self.connected = False
+        self.frame_count = 0
+        self.last_ground_truth = None
+        self._next_frame_time = None
+        self._noise_bank = []
+        self._coords = None
+
+    def connect(self) -> bool:
+        # 预生成噪声（比图像大一圈，取图时随机偏移裁切）
+        pad = 64
+        self._noise_bank = [
+            self.rng.normal(0, self.noise_sigma, (self.height + pad, self.width + pad)).astype(np.float32)
+            for _ in range(_NOISE_BANK)
+        ]
+        ys, xs = np.mgrid[0:self.height, 0:self.width].astype(np.float32)
+        self._coords = (xs / self.width - 0.5, ys / self.height - 0.5)
+        self._lighting = self._draw_lighting() if self.fixed_lighting else None
+        self._next_frame_time = None
+        self.connected = True
+        logger.info(f'SyntheticNutCamera {self.camera_ip}: {self.width}x{self.height}, fps={self.fps or "不限"}')
+        return True
+
+    def disconnect(self):
+        self.connected = False
+        self._noise_bank = []
+        self._coords = None
+        logger.info(f'SyntheticNutCamera {self.camera_ip} disconnected')
+
+    def capture(self) -> Optional[np.ndarray]:
+        if not self.connected:
+            logger.error(f'SyntheticNutCamera {self.camera_ip} not connected')
+            return None
+
+        if self.fps > 0:
+            now = time.monotonic()
+            if self._next_frame_time is None:
+                self._next_frame_time = now
+            delay = self._next_frame_time - now
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_time = max(self._next_frame_time, now) + 1.0 / self.fps
+
+        image, truth = self.render()
+        self.frame_count += 1
+        self.last_ground_truth = truth
+        return image
+
+    def _draw_lighting(self):
+        """随机光照：基础亮度和x/y方向的线性渐变"""
+        base = self.rng.uniform(205, 240)
+        gx, gy = self.rng.uniform(-40, 40, 2)
+        return float(base), float(gx), float(gy)
+
+    def _render_background_gray(self):
+        """背景灰度图（float32）及所用噪声图和裁切偏移"""
+        rng = self.rng
+        w, h = self.width, self.height
+        xs, ys = self._coords
+        base, gx, gy = self._lighting or self._draw_lighting()
+        gray = cv2.addWeighted(xs, gx, ys, gy, base)
+
+        noise = self._noise_bank[int(rng.integers(len(self._noise_bank)))]
+        ox, oy = rng.integers(0, noise.shape[1] - w + 1), rng.integers(0, noise.shape[0] - h + 1)
+        gray += noise[oy:oy + h, ox:ox + w]
+        return gray, noise, ox, oy
+
+    def render_background(self) -> np.ndarray:
+        """渲染一帧没有槟榔的空背景（BGR），用于标定背景模型"""
+        gray, _, _, _ = self._render_background_gray()
+        return cv2.cvtColor(np.clip(gray, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+    def render(self):
+        """
+        渲染一帧
+
+        Returns:
+            (BGR图像, 真值字典)
+        """
+        rng = self.rng
+        w, h = self.width, self.height
+        scale = min(w, h)
+
+        length = rng.uniform(*self.length_range) * scale
+        nut_height = length * rng.uniform(*self.aspect_range)
+        taper = rng.uniform(0.35, 0.55)
+        axis_angle = rng.uniform(-self.max_angle, self.max_angle)
+        tip_right = rng.random() < 0.5
+        # 尖头朝左时轮廓旋转180°，长轴角度不变
+        draw_angle = axis_angle if tip_right else axis_angle + 180.0
+
+        margin = length / 2 + 10
+        spread_x = max(0.0, w / 2 - margin) * self.position_spread
+        spread_y = max(0.0, h / 2 - margin) * self.position_spread
+        cx = w / 2 + rng.uniform(-spread_x, spread_x)
+        cy = h / 2 + rng.uniform(-spread_y, spread_y)
+
+        rad = math.radians(draw_angle)
+        rot = np.array([[math.cos(rad), -math.sin(rad)], [math.sin(rad), math.cos(rad)]])
+        outline = nut_outline(length, nut_height, taper) @ rot.T + (cx, cy)
+
+        # --- 背景：白底 + 线性光照渐变 ---
+        gray, noise, ox, oy = self._render_background_gray()
+
+        # --- 目标：只在外接矩形内合成，棕色，边缘渐暗模拟曲面 ---
+        x0, y0 = np.maximum(np.floor(outline.min(axis=0)).astype(int) - 2, 0)
+        x1, y1 = np.minimum(np.ceil(outline.max(axis=0)).astype(int) + 3, (w, h))
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        shift = 4
+        pts = np.round((outline - (x0, y0)) * (1 << shift)).astype(np.int32)
+        cv2.fillPoly(mask, [pts], 255, lineType=cv2.LINE_AA, shift=shift)
+        alpha = mask.astype(np.float32) / 255.0
+
+        dist = cv2.distanceTransform((mask > 127).astype(np.uint8), cv2.DIST_L2, 5)
+        shade = np.clip(dist / max(nut_height * 0.25, 1.0), 0, 1)
+        nut_level = rng.uniform(55, 95)
+        nut_gray = nut_level * (0.75 + 0.35 * shade)
+        noise_roi = noise[oy + y0:oy + y1, ox + x0:ox + x1]
+
+        region = gray[y0:y1, x0:x1]
+        region[:] = region * (1 - alpha) + (nut_gray + noise_roi) * alpha
+
+        # 颜色：背景中性，目标偏棕（B<G<R）
+        image = cv2.cvtColor(np.clip(gray, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+        tint = np.array([0.75, 0.9, 1.15], dtype=np.float32)
+        factor = 1 + alpha[:, :, None] * (tint - 1)
+        patch = image[y0:y1, x0:x1]
+        patch[:] = np.clip(patch * factor, 0, 255).astype(np.uint8)
+
+        # --- 真值 ---
+        tip = np.array([cx, cy]) + rot @ np.array([length / 2, 0.0])
+        tail = 2 * np.array([cx, cy]) - tip
+        moments = cv2.moments(outline.astype(np.float32))
+        centroid = (moments['m10'] / moments['m00'], moments['m01'] / moments['m00'])
+        truth = {
+            'center': (float(cx), float(cy)),
+            'centroid': (float(centroid[0]), float(centroid[1])),
+            'angle': float(axis_angle),
+            'length': float(length),
+            'height': float(nut_height),
+            'head_direction': 1 if tip[0] < tail[0] else 2,
+            'x_offset_mm': (centroid[0] - w / 2) * self.pixel_to_mm,
+            'y_offset_mm': (centroid[1] - h / 2) * self.pixel_to_mm,
+            'length_mm': length * self.pixel_to_mm,
+            'height_mm': nut_height * self.pixel_to_mm,
+        }
+        return image, truth
+
+
+def _angle_error(a: float, b: float) -> float:
+    """长轴角度差（度），考虑±90°等价"""
+    diff = (a - b) % 180.0
+    return min(diff, 180.0 - diff)
+
+
+def evaluate(detector, camera: SyntheticNutCamera, frames: int = 200) -> dict:
+    """
+    用合成图像批量检查检测器精度
+
+    Returns:
+        dict: 检出率、尖头朝向正确率、各量误差的均值/P95、平均检测耗时
+    """
+    errors = {'offset_mm': [], 'angle_deg': [], 'length_mm': [], 'height_mm': []}
+    detected = head_correct = 0
+    detect_time = 0.0
+
+    for _ in range(frames):
+        image = camera.capture()
+        truth = camera.last_ground_truth
+        start = time.perf_counter()
+        result = detector.detect_betel_nut(image)
+        detect_time += time.perf_counter() - start
+
+        if result.classification != 2:
+            continue
+        detected += 1
+        head_correct += int(result.head_direction == truth['head_direction'])
+        errors['offset_mm'].append(math.hypot(result.x_offset - truth['x_offset_mm'],
+                                              result.y_offset - truth['y_offset_mm']))
+        errors['angle_deg'].append(_angle_error(result.r_angle, truth['angle']))
+        errors['length_mm'].append(abs(result.length - truth['length_mm']))
+        errors['height_mm'].append(abs(result.height - truth['height_mm']))
+
+    report = {
+        'frames': frames,
+        'detection_rate': detected / frames if frames else 0.0,
+        'head_accuracy': head_correct / detected if detected else 0.0,
+        'detect_ms': detect_time / frames * 1000 if frames else 0.0,
+    }
+    for key, values in errors.items():
+        values = np.array(values) if values else np.zeros(1)
+        report[f'{key}_mean'] = float(values.mean())
+        report[f'{key}_p95'] = float(np.percentile(values, 95))
+    return report
+
+
+def main():
+    import argparse
+    from vision_detector import VisionDetector
+
+    parser = argparse.ArgumentParser(description='用合成图像检查VisionDetector精度和吞吐')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--size', default='1280x1024', help='图像尺寸，如 1280x1024')
+    parser.add_argument('--pixel-to-mm', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    camera = SyntheticNutCamera('synthetic', width, height, pixel_to_mm=args.pixel_to_mm, seed=args.seed)
+    camera.connect()
+    detector = VisionDetector(pixel_to_mm=args.pixel_to_mm)
+
+    start = time.perf_counter()
+    report = evaluate(detector, camera, args.frames)
+    elapsed = time.perf_counter() - start
+
+    print('=' * 60)
+    print(f'帧数: {report["frames"]}  检出率: {report["detection_rate"]:.1%}  '
+          f'尖头朝向正确率: {report["head_accuracy"]:.1%}')
+    print(f'中心误差: 平均 {report["offset_mm_mean"]:.2f}mm  P95 {report["offset_mm_p95"]:.2f}mm')
+    print(f'角度误差: 平均 {report["angle_deg_mean"]:.2f}°  P95 {report["angle_deg_p95"]:.2f}°')
+    print(f'长度误差: 平均 {report["length_mm_mean"]:.2f}mm  P95 {report["length_mm_p95"]:.2f}mm')
+    print(f'宽度误差: 平均 {report["height_mm_mean"]:.2f}mm  P95 {report["height_mm_p95"]:.2f}mm')
+    print(f'检测耗时: 平均 {report["detect_ms"]:.1f}ms  总吞吐 {args.frames / elapsed:.1f} 帧/秒（含渲染）')
+    print('=' * 60)
+    camera.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())